@@ -0,0 +1,147 @@
+from pymongo import MongoClient, ReplaceOne
+from pymongo.errors import CollectionInvalid
+from dotenv import load_dotenv
+from datetime import date
+import argparse
+import os
+import sys
+import time
+
+from utils.partitions import (
+    ARCHIVE_COMPRESSOR, PARTITIONED_COLLECTIONS, PARTITIONED_STORAGE, PARTITION_CATALOG_TTL, PARTITION_INDEXES,
+    month_filter, partition_catalog, partition_name, shift_month,
+)
+
+load_dotenv()
+
+# Moves closed months of cases/calendar out of the hot collections into
+# compressed per-month partitions (see utils/partitions.py), or back with
+# --restore. Reruns are safe: copies are upserts by _id and the hot documents
+# are only deleted once the partition holds all of them and every API process
+# has re-read the catalog (PARTITION_CATALOG_TTL). Archived months are only
+# visible with PARTITIONED_STORAGE=1, so the script refuses to run without it.
+# Regenerate a closed month only after restoring it.
+
+ARCHIVE_HOT_MONTHS = int(os.getenv("ARCHIVE_HOT_MONTHS", "3"))
+
+client = MongoClient(os.getenv("MONGODB_URI"))
+db = client["surgical-analytics"]
+
+def copy_documents(source, target, query, batch_size) -> int:
+    copied = 0
+    batch = []
+    for doc in source.find(query):
+        batch.append(ReplaceOne({"_id": doc["_id"]}, doc, upsert=True))
+        if len(batch) >= batch_size:
+            target.bulk_write(batch, ordered=False)
+            copied += len(batch)
+            batch = []
+    if batch:
+        target.bulk_write(batch, ordered=False)
+        copied += len(batch)
+    return copied
+
+def create_partition(base: str, month: str):
+    name = partition_name(base, month)
+    try:
+        db.create_collection(name, storageEngine={"wiredTiger": {"configString": f"block_compressor={ARCHIVE_COMPRESSOR}"}})
+    except CollectionInvalid:
+        pass  # left by an earlier, interrupted run
+    partition = db[name]
+    for keys in PARTITION_INDEXES[base]:
+        partition.create_index(keys)
+    return partition
+
+def archive_month(base: str, month: str, batch_size=1000, dry_run=False) -> int:
+    """Copy one month into its partition and record it; the hot copies stay until delete_archived_hot()."""
+    hot = db[base]
+    query = month_filter(base, month)
+    count = hot.count_documents(query)
+    if not count:
+        return 0
+    if dry_run:
+        print(f"📦 Would archive {count} {base} documents of {month} to {partition_name(base, month)}")
+        return count
+
+    partition = create_partition(base, month)
+    copy_documents(hot, partition, query, batch_size)
+    if partition.count_documents(query) < count:
+        print(f"❌ {partition.name} is missing documents; {base} {month} left in place")
+        return 0
+
+    # Readers pick the partition up within PARTITION_CATALOG_TTL; until then they still read the hot copies
+    partition_catalog(db).record(base, month, partition.count_documents({}))
+    print(f"📦 Copied {count} {base} documents of {month} to {partition.name}")
+    return count
+
+def delete_archived_hot(archived) -> int:
+    """Drop the hot copies of the (base, month) pairs archived by this run."""
+    if not archived:
+        return 0
+    print(f"⏳ Waiting {PARTITION_CATALOG_TTL:g}s for API processes to re-read the partition catalog")
+    time.sleep(PARTITION_CATALOG_TTL)
+    deleted = 0
+    for base, month in archived:
+        deleted += db[base].delete_many(month_filter(base, month)).deleted_count
+        print(f"🧹 Removed the hot copies of {base} {month}")
+    return deleted
+
+def restore_month(base: str, month: str, batch_size=1000, dry_run=False) -> int:
+    name = partition_name(base, month)
+    if name not in db.list_collection_names():
+        return 0
+    partition = db[name]
+    count = partition.count_documents({})
+    if dry_run:
+        print(f"♻️ Would restore {count} {base} documents of {month} from {name}")
+        return count
+
+    copy_documents(partition, db[base], {}, batch_size)
+    partition_catalog(db).remove(base, month)
+    partition.drop()
+    print(f"♻️ Restored {count} {base} documents of {month} from {name}")
+    return count
+
+def closed_months(base: str, before: str) -> list:
+    """Months of the hot collection older than `before`."""
+    if base == "calendar":
+        months = {date_str[:7] for date_str in db[base].distinct("date", {"date": {"$lt": f"{before}-01"}})}
+    else:
+        before_start = month_filter(base, before)["procedureDate"]["$gte"]
+        months = {
+            row["_id"] for row in db[base].aggregate([
+                {"$match": {"procedureDate": {"$lt": before_start}}},
+                {"$group": {"_id": {"$dateToString": {"format": "%Y-%m", "date": "$procedureDate"}}}}
+            ])
+        }
+    return sorted(months)
+
+# CLI
+if __name__ == "__main__":
+    default_before = shift_month(date.today().strftime("%Y-%m"), -(ARCHIVE_HOT_MONTHS - 1))
+    arg_parser = argparse.ArgumentParser(description="Archive closed months of cases/calendar into monthly partitions.")
+    arg_parser.add_argument("--before", default=default_before,
+                            help=f"Archive months before this YYYY-MM (default {default_before}: keeps {ARCHIVE_HOT_MONTHS} hot)")
+    arg_parser.add_argument("--restore", metavar="YYYY-MM", help="Move one archived month back into the hot collections")
+    arg_parser.add_argument("--collections", nargs="+", default=list(PARTITIONED_COLLECTIONS), choices=PARTITIONED_COLLECTIONS)
+    arg_parser.add_argument("--batch-size", type=int, default=1000)
+    arg_parser.add_argument("--dry-run", action="store_true")
+    args = arg_parser.parse_args()
+
+    if not PARTITIONED_STORAGE:
+        print("❌ Set PARTITIONED_STORAGE=1 (here and for the API and jobs) first: without it archived months are not read")
+        sys.exit(1)
+
+    moved = 0
+    archived = []
+    for base in args.collections:
+        if args.restore:
+            moved += restore_month(base, args.restore, args.batch_size, args.dry_run)
+            continue
+        for month in closed_months(base, args.before):
+            count = archive_month(base, month, args.batch_size, args.dry_run)
+            if count and not args.dry_run:
+                archived.append((base, month))
+            moved += count
+    delete_archived_hot(archived)
+    print(f"✅ {moved} documents {'restored' if args.restore else 'archived'}")
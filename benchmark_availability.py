@@ -0,0 +1,84 @@
+import argparse
+import json
+import random
+import time
+from datetime import date, timedelta
+
+from utils.availability import AvailabilityEngine
+from utils.latency import percentiles
+from utils.synthetic import synthetic_calendar_docs, synthetic_loader, synthetic_npis
+
+# Availability engine timings on a large synthetic unit (no Mongo needed).
+
+def timed(fn, runs):
+    samples = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return percentiles(samples)
+
+def run_benchmark(month, rooms, surgeons, queries, seed):
+    rng = random.Random(seed)
+    hospitalId, unit = "SYN-H1", "SYN-UNIT"
+
+    print(f"🧪 Generating {rooms} rooms × {surgeons} surgeons for {month}")
+    docs = synthetic_calendar_docs(month, hospitalId, unit, rooms=rooms, surgeons=surgeons, seed=seed)
+    print(f"📦 {len(docs)} room-days, {sum(len(d['blocks']) for d in docs)} blocks, "
+          f"{sum(len(d['procedures']) for d in docs)} cases")
+
+    engine = AvailabilityEngine(synthetic_loader(docs), max_age=float("inf"))
+    started = time.perf_counter()
+    engine.unit_month(hospitalId, unit, month)
+    build_ms = (time.perf_counter() - started) * 1000
+    print(f"🌲 Built interval trees in {build_ms:.1f} ms")
+
+    npis = synthetic_npis(surgeons)
+    year, month_num = map(int, month.split("-"))
+    first = date(year, month_num, 1)
+    rooms_list = sorted(engine.unit_month(hospitalId, unit, month).rooms)
+
+    def week_query():
+        start = first + timedelta(days=rng.randint(0, 20))
+        engine.free_slots(hospitalId, unit, rng.choice(npis), start, start + timedelta(days=6),
+                          rng.choice([60, 120, 180]), ownership=rng.choice(["any", "own", "open"]), limit=20)
+
+    def month_query():
+        engine.free_slots(hospitalId, unit, rng.choice(npis), first, first + timedelta(days=27), 180, limit=500)
+
+    def check_query():
+        day = first + timedelta(days=rng.randint(0, 27))
+        engine.check(hospitalId, unit, rng.choice(npis), day.isoformat(), rng.choice(rooms_list),
+                     rng.randrange(7 * 60, 14 * 60, 15), rng.choice([60, 120, 180]))
+
+    results = {
+        "month": month,
+        "rooms": rooms,
+        "surgeons": surgeons,
+        "roomDays": len(docs),
+        "buildMs": round(build_ms, 1),
+        "slotsWeekMs": timed(week_query, queries),
+        "slotsMonthMs": timed(month_query, max(1, queries // 10)),
+        "checkMs": timed(check_query, queries),
+    }
+    for name in ("slotsWeekMs", "slotsMonthMs", "checkMs"):
+        stats = results[name]
+        print(f"⏱️ {name}: p50 {stats['p50']} ms, p95 {stats['p95']} ms, p99 {stats['p99']} ms")
+    return results
+
+# CLI
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="Benchmark the availability engine on a synthetic unit.")
+    arg_parser.add_argument("--month", default="2025-04")
+    arg_parser.add_argument("--rooms", type=int, default=60)
+    arg_parser.add_argument("--surgeons", type=int, default=250)
+    arg_parser.add_argument("--queries", type=int, default=1000)
+    arg_parser.add_argument("--seed", type=int, default=7)
+    arg_parser.add_argument("--json", help="Also write the results to this file")
+    args = arg_parser.parse_args()
+
+    results = run_benchmark(args.month, args.rooms, args.surgeons, args.queries, args.seed)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"📝 Results written to {args.json}")
@@ -0,0 +1,32 @@
+from pymongo import MongoClient
+from dotenv import load_dotenv
+from datetime import datetime, timedelta
+import os
+import sys
+
+from utils.surgeon_calendar import sync_surgeon_calendar
+
+load_dotenv()
+
+client = MongoClient(os.getenv("MONGODB_URI"))
+db = client["surgical-analytics"]
+
+def build_surgeon_calendar(start_str, end_str, days_per_batch=7):
+    """Backfill surgeon-days from existing calendar documents in a date range."""
+    day = datetime.fromisoformat(start_str).date()
+    end = datetime.fromisoformat(end_str).date()
+    written = 0
+    while day <= end:
+        dates = [(day + timedelta(days=i)).isoformat() for i in range(days_per_batch) if day + timedelta(days=i) <= end]
+        written += sync_surgeon_calendar(db, dates)
+        day += timedelta(days=days_per_batch)
+    print(f"✅ {written} surgeon-days rebuilt from {start_str} to {end_str}")
+    return written
+
+# CLI
+if __name__ == "__main__":
+    if len(sys.argv) < 3:
+        print("Usage: python build_surgeon_calendar.py 2025-04-01 2025-04-30")
+        sys.exit(1)
+
+    build_surgeon_calendar(sys.argv[1], sys.argv[2])
@@ -0,0 +1,38 @@
+from pymongo import MongoClient
+from dotenv import load_dotenv
+import os
+import sys
+
+from utils.utilization_cube import ensure_cube_indexes, write_cube_for_calendar_docs
+
+load_dotenv()
+
+client = MongoClient(os.getenv("MONGODB_URI"))
+db = client["surgical-analytics"]
+calendar_collection = db["calendar"]
+cube_collection = db["utilization_cube"]
+
+def build_cube(start_str, end_str, batch_size=500):
+    """Backfill cube cells from existing calendar documents in a date range."""
+    ensure_cube_indexes(cube_collection)
+    batch = []
+    processed = 0
+    for doc in calendar_collection.find({"date": {"$gte": start_str, "$lte": end_str}}):
+        batch.append(doc)
+        if len(batch) >= batch_size:
+            write_cube_for_calendar_docs(cube_collection, batch)
+            processed += len(batch)
+            batch = []
+    if batch:
+        write_cube_for_calendar_docs(cube_collection, batch)
+        processed += len(batch)
+    print(f"✅ Cube rebuilt from {processed} calendar documents")
+    return processed
+
+# CLI
+if __name__ == "__main__":
+    if len(sys.argv) < 3:
+        print("Usage: python build_utilization_cube.py 2025-04-01 2025-04-30")
+        sys.exit(1)
+
+    build_cube(sys.argv[1], sys.argv[2])
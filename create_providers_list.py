@@ -1,30 +1,63 @@
 # create_provider_list.py
 from pymongo import MongoClient
 from dotenv import load_dotenv
+from datetime import datetime
 import os
+import sys
+
+from utils.warmup import notify_warmup
 
 load_dotenv()
 client = MongoClient(os.getenv("MONGODB_URI"))
 db = client["surgical-analytics"]
 cases = db["cases"]
 providers = db["providers"]
+meta = db["meta"]
+
+def rebuild_providers(since=None):
+    """Merge primary providers into `providers` server-side; nothing is deleted,
+    so /api/providers/list keeps serving while this runs."""
+    match = {"procedures.primary": True}
+    if since:
+        match["procedureDate"] = {"$gte": datetime.fromisoformat(since)}
 
-pipeline = [
-    {"$unwind": "$procedures"},
-    {"$match": {"procedures.primary": True}},
-    {
-        "$group": {
-            "_id": "$procedures.primaryNpi",
-            "providerName": {"$first": "$procedures.providerName"}
+    pipeline = [
+        {"$match": match},
+        {"$unwind": "$procedures"},
+        {"$match": {"procedures.primary": True, "procedures.primaryNpi": {"$ne": None}}},
+        {
+            "$group": {
+                "_id": "$procedures.primaryNpi",
+                "providerName": {"$first": "$procedures.providerName"}
+            }
+        },
+        {"$project": {"npi": "$_id", "providerName": 1, "_id": 0}},
+        {
+            "$merge": {
+                "into": "providers",
+                "on": "npi",
+                "whenMatched": "merge",
+                "whenNotMatched": "insert"
+            }
         }
-    },
-    {"$project": {"npi": "$_id", "providerName": 1, "_id": 0}}
-]
+    ]
+
+    # $merge on "npi" requires a unique index
+    providers.create_index("npi", unique=True)
+    cases.aggregate(pipeline, allowDiskUse=True)
+
+    # Bump the version so in-process provider indexes reload
+    meta.update_one(
+        {"_id": "providers"},
+        {"$inc": {"version": 1}, "$currentDate": {"updatedAt": True}},
+        upsert=True
+    )
+    total = providers.count_documents({})
+    print(f"✅ Providers merged{f' from cases since {since}' if since else ''}; {total} providers total")
+    return total
 
-result = list(cases.aggregate(pipeline))
-if result:
-    providers.delete_many({})
-    providers.insert_many(result)
-    print(f"✅ Inserted {len(result)} unique providers")
-else:
-    print("⚠️ No providers found.")
+# CLI
+if __name__ == "__main__":
+    # Usage: python create_providers_list.py [since YYYY-MM-DD]
+    rebuild_providers(sys.argv[1] if len(sys.argv) > 1 else None)
+    notify_warmup()
@@ -0,0 +1,118 @@
+import argparse
+import json
+import os
+import shutil
+import time
+from datetime import datetime
+
+from pymongo import MongoClient
+from dotenv import load_dotenv
+
+from utils import partitions
+from utils.snapshot import SNAPSHOT_COLLECTIONS, SERVING_COLLECTIONS, UNPARTITIONED, ALL_PARTITION, PartitionWriter
+from utils.snapshot_serving import publish_snapshot
+
+load_dotenv()
+
+client = MongoClient(os.getenv("MONGODB_URI"))
+db = client["surgical-analytics"]
+
+def month_list(start_month: str, end_month: str) -> list:
+    months = []
+    year, month_num = map(int, start_month.split("-"))
+    while f"{year:04d}-{month_num:02d}" <= end_month:
+        months.append(f"{year:04d}-{month_num:02d}")
+        year, month_num = (year + 1, 1) if month_num == 12 else (year, month_num + 1)
+    return months
+
+def month_query(collection: str, month: str) -> dict:
+    if collection == "cases":
+        year, month_num = map(int, month.split("-"))
+        next_year, next_month = (year + 1, 1) if month_num == 12 else (year, month_num + 1)
+        return {"procedureDate": {"$gte": datetime(year, month_num, 1), "$lt": datetime(next_year, next_month, 1)}}
+    return {"date": {"$gte": f"{month}-01", "$lte": f"{month}-31"}}
+
+def detect_months(collection: str):
+    """First and last month present in a collection, archived partitions included."""
+    field = "procedureDate" if collection == "cases" else "date"
+    first = db[collection].find_one({field: {"$ne": None}}, {field: 1}, sort=[(field, 1)])
+    last = db[collection].find_one({field: {"$ne": None}}, {field: 1}, sort=[(field, -1)])
+    months = [partitions.to_month(doc[field]) for doc in (first, last) if doc]
+    if partitions.PARTITIONED_STORAGE and collection in partitions.PARTITIONED_COLLECTIONS:
+        months.extend(partitions.partition_catalog(db).archived(collection))
+    if not months:
+        return None, None
+    return min(months), max(months)
+
+def export_snapshot(out_dir: str, collections=SNAPSHOT_COLLECTIONS, start_month=None, end_month=None, compression=None):
+    """
+    Write month-partitioned columnar files, then move the finished directory
+    into place. compression="zstd" is for archival copies only: compressed
+    files cannot be read in place from the memory map.
+    """
+    tmp_dir = f"{out_dir.rstrip('/')}.tmp-{os.getpid()}"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    file_format = f"arrow-ipc-{compression}" if compression else "arrow-ipc"
+    manifest = {"createdAt": datetime.utcnow().isoformat() + "Z", "format": file_format, "collections": {}}
+    started = time.perf_counter()
+
+    for collection in collections:
+        os.makedirs(os.path.join(tmp_dir, collection), exist_ok=True)
+        months = {}
+        if collection in UNPARTITIONED:
+            writer = PartitionWriter(os.path.join(tmp_dir, collection, f"{ALL_PARTITION}.arrow"), collection,
+                                     compression=compression)
+            for doc in db[collection].find({}, {"_id": 0}):
+                writer.write(doc)
+            writer.close()
+            months[ALL_PARTITION] = writer.count
+        else:
+            first, last = detect_months(collection)
+            first = start_month or first
+            last = end_month or last
+            for month in (month_list(first, last) if first and last else []):
+                path = os.path.join(tmp_dir, collection, f"{month}.arrow")
+                writer = PartitionWriter(path, collection, compression=compression)
+                for doc in partitions.find(db, collection, month_query(collection, month), month, month):
+                    writer.write(doc)
+                writer.close()
+                if writer.count:
+                    months[month] = writer.count
+                else:
+                    os.remove(path)
+        manifest["collections"][collection] = {"months": months, "rows": sum(months.values())}
+        print(f"📦 {collection}: {sum(months.values())} rows in {len(months)} partitions")
+
+    with open(os.path.join(tmp_dir, "manifest.json"), "w") as f:
+        json.dump(manifest, f, indent=2)
+
+    if os.path.exists(out_dir):
+        old_dir = f"{out_dir.rstrip('/')}.old-{os.getpid()}"
+        os.rename(out_dir, old_dir)
+        os.rename(tmp_dir, out_dir)
+        shutil.rmtree(old_dir, ignore_errors=True)
+    else:
+        os.rename(tmp_dir, out_dir)
+
+    print(f"✅ Snapshot written to {out_dir} in {time.perf_counter() - started:.1f}s")
+    return manifest
+
+# CLI
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="Export cases, calendar and block_utilization to a columnar snapshot.")
+    arg_parser.add_argument("out_dir", help="e.g. snapshots/latest")
+    arg_parser.add_argument("--start", help="First month (YYYY-MM); defaults to the earliest in each collection")
+    arg_parser.add_argument("--end", help="Last month (YYYY-MM); defaults to the latest in each collection")
+    arg_parser.add_argument("--collections", default=",".join(SNAPSHOT_COLLECTIONS))
+    arg_parser.add_argument("--compress", action="store_true",
+                            help="zstd-compress the files (archival copies; not for --serving or memory-mapped analytics)")
+    arg_parser.add_argument("--serving", action="store_true",
+                            help="Export calendar + providers as a new version under out_dir and switch "
+                                 "out_dir/current to it (picked up live by SNAPSHOT_MODE servers)")
+    args = arg_parser.parse_args()
+
+    if args.serving:
+        publish_snapshot(args.out_dir, lambda path: export_snapshot(path, SERVING_COLLECTIONS, args.start, args.end))
+    else:
+        export_snapshot(args.out_dir, [c for c in args.collections.split(",") if c], args.start, args.end,
+                        "zstd" if args.compress else None)
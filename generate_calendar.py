@@ -1,9 +1,18 @@
-from pymongo import MongoClient
+from pymongo import MongoClient, UpdateOne
 from datetime import datetime, timedelta
 from collections import defaultdict
 from dotenv import load_dotenv
 import pytz
 import os
+import sys
+
+from utils.conflicts import refresh_conflicts
+from utils.content_hash import stable_hash
+from utils.job_profiler import job_profiler
+from utils.room_day import primary_procedures, room_day_fields
+from utils.surgeon_calendar import sync_surgeon_calendar
+from utils.utilization_cube import cube_cells_for_calendar_doc, ensure_cube_indexes, write_cube_for_calendar_docs
+from utils.warmup import notify_warmup
 
 # Load environment variables
 load_dotenv()
@@ -12,94 +21,118 @@ MONGO_URI = os.getenv("MONGODB_URI")
 if not MONGO_URI:
     raise EnvironmentError("MONGODB_URI not found in .env file")
 
+# Before the client exists, so its commands are counted
+profiler = job_profiler("generate_calendar", sys.argv)
+
 client = MongoClient(MONGO_URI)
 db = client["surgical-analytics"]
 cases_collection = db["cases"]
 blocks_collection = db["block"]
 calendar_collection = db["calendar"]
+cube_collection = db["utilization_cube"]
 
 # Constants
 cst_tz = pytz.timezone("US/Central")
 APRIL_START = cst_tz.localize(datetime(2025, 4, 1))
 MAY_START = cst_tz.localize(datetime(2025, 5, 1))
 
-# Precompute total rooms per (hospitalId, unit)
-room_sets = defaultdict(set)
-for case in cases_collection.find({}, {"hospitalId": 1, "unit": 1, "room": 1}):
-    hosp = case.get("hospitalId")
-    unit = case.get("unit")
-    room = case.get("room")
-    if hosp and unit and room:
-        room_sets[(hosp, unit)].add(room)
-
-room_counts = {key: len(rooms) for key, rooms in room_sets.items()}
-
-# Build grouped structure
-grouped_data = defaultdict(lambda: {"procedures": [], "blocks": []})
-
-print("🔍 Fetching procedures...")
-cursor = cases_collection.find({
-    "procedures.primary": True,
-    "startTime": {"$gte": APRIL_START, "$lt": MAY_START},
-    "endTime": {"$exists": True}
-})
-
-for case in cursor:
-    hospitalId = case.get("hospitalId")
-    unit = case.get("unit")
-    room = case.get("room")
-    date = case.get("startTime")
-
-    if not (hospitalId and unit and room and date):
-        continue
-
-    date_key = date.astimezone(cst_tz).strftime("%Y-%m-%d")
-    key = (date_key, hospitalId, unit, room)
-
-    for proc in case.get("procedures", []):
-        if not proc.get("primary"):
-            continue
-
-        # Prefer frequency.duration if available
-        duration = 0
-        if proc.get("frequencies"):
-            for freq in proc["frequencies"]:
-                duration = max(duration, freq.get("duration", 0))
-
-        if duration == 0:
-            # Fallback: compute from case start and end time
-            start = case.get("startTime")
-            end = case.get("endTime")
-            if start and end:
-                duration = int((end - start).total_seconds() / 60)
-
-        # Always store startTime and endTime from the case level
-        start = case.get("startTime")
-        end = case.get("endTime")
-
-        grouped_data[key]["procedures"].append({
-            **proc,
-            "duration": duration,
-            "startTime": start,
-            "endTime": end
+def write_cube_for_updates(calendar_filters, batch_size=500) -> int:
+    """
+    Rewrite the cube cells (caseCount, caseMinutes) and cubeHash of the
+    rewritten room-days, so they do not wait for generate_block_utilization.py.
+    """
+    ensure_cube_indexes(cube_collection)
+    written = 0
+    for i in range(0, len(calendar_filters), batch_size):
+        docs = list(calendar_collection.find({"$or": calendar_filters[i:i + batch_size]}))
+        write_cube_for_calendar_docs(cube_collection, docs)
+        if docs:
+            calendar_collection.bulk_write([
+                UpdateOne({"_id": doc["_id"]}, {"$set": {"cubeHash": stable_hash(cube_cells_for_calendar_doc(doc))}})
+                for doc in docs
+            ], ordered=False)
+        written += len(docs)
+    return written
+
+def generate_calendar():
+    # Precompute total rooms per (hospitalId, unit)
+    room_sets = defaultdict(set)
+    with profiler.phase("rooms"):
+        for case in cases_collection.find({}, {"hospitalId": 1, "unit": 1, "room": 1}):
+            hosp = case.get("hospitalId")
+            unit = case.get("unit")
+            room = case.get("room")
+            if hosp and unit and room:
+                room_sets[(hosp, unit)].add(room)
+
+    room_counts = {key: len(rooms) for key, rooms in room_sets.items()}
+
+    # Build grouped structure
+    grouped_data = defaultdict(lambda: {"procedures": [], "blocks": []})
+
+    print("🔍 Fetching procedures...")
+    # Streamed: fetching and grouping interleave
+    with profiler.phase("fetch"):
+        cursor = cases_collection.find({
+            "procedures.primary": True,
+            "startTime": {"$gte": APRIL_START, "$lt": MAY_START},
+            "endTime": {"$exists": True}
         })
 
-print("📅 Calculating utilization and updating calendar...")
-for (date, hospitalId, unit, room), data in grouped_data.items():
-    procedures = data["procedures"]
-    total_minutes = sum(proc.get("duration", 0) for proc in procedures)
-    utilization_rate = round(total_minutes / 510, 3)
-
-    calendar_collection.update_one(
-        {"date": date, "hospitalId": hospitalId, "unit": unit, "room": room},
-        {"$set": {
-            "procedures": procedures,
-            "utilizationMinutes": total_minutes,
-            "availableMinutes": 510,
-            "utilizationRate": utilization_rate,
-            "totalRooms": room_counts.get((hospitalId, unit), 0)
-        }},
-        upsert=True
-    )
-
-print(f"✅ Done. {len(grouped_data)} calendar entries processed.")
+        for case in cursor:
+            hospitalId = case.get("hospitalId")
+            unit = case.get("unit")
+            room = case.get("room")
+            date = case.get("startTime")
+
+            if not (hospitalId and unit and room and date):
+                continue
+
+            date_key = date.astimezone(cst_tz).strftime("%Y-%m-%d")
+            key = (date_key, hospitalId, unit, room)
+            grouped_data[key]["procedures"].extend(primary_procedures(case))
+
+    # Payload hashes from the last run; unchanged room-days are not rewritten
+    with profiler.phase("fetch"):
+        stored_hashes = {
+            (doc.get("date"), doc.get("hospitalId"), doc.get("unit"), doc.get("room")): doc.get("procHash")
+            for doc in calendar_collection.find(
+                {
+                    "date": {"$gte": APRIL_START.strftime("%Y-%m-%d"), "$lt": MAY_START.strftime("%Y-%m-%d")},
+                    "procHash": {"$exists": True}
+                },
+                {"_id": 0, "date": 1, "hospitalId": 1, "unit": 1, "room": 1, "procHash": 1}
+            )
+        }
+
+    print("📅 Calculating utilization and updating calendar...")
+    with profiler.phase("compute"):
+        updates = []
+        for key, data in grouped_data.items():
+            date, hospitalId, unit, room = key
+            fields = {**room_day_fields(data["procedures"]), "totalRooms": room_counts.get((hospitalId, unit), 0)}
+            fields["procHash"] = stable_hash(fields)
+            if stored_hashes.get(key) != fields["procHash"]:
+                updates.append(({"date": date, "hospitalId": hospitalId, "unit": unit, "room": room}, fields))
+
+    with profiler.phase("write"):
+        for calendar_filter, fields in updates:
+            calendar_collection.update_one(calendar_filter, {"$set": fields}, upsert=True)
+        cube_room_days = write_cube_for_updates([calendar_filter for calendar_filter, _ in updates])
+        surgeon_days = sync_surgeon_calendar(db, {calendar_filter["date"] for calendar_filter, _ in updates})
+
+        # The stored QA summaries and conflicts of the rewritten unit-months are stale now
+        unit_months = {(cf["hospitalId"], cf["unit"], cf["date"][:7]) for cf, _ in updates}
+        for hospitalId, unit, month in sorted(unit_months):
+            refresh_conflicts(db, hospitalId, unit, month)
+
+    skipped = len(grouped_data) - len(updates)
+    print(f"✅ Done. {len(grouped_data)} calendar entries processed: {len(updates)} written, {skipped} unchanged (skipped).")
+    print(f"🧊 Utilization cube updated for {cube_room_days} room-days; 👤 {surgeon_days} surgeon-days synced")
+    return {"calendarEntries": len(grouped_data), "written": len(updates), "skipped": skipped,
+            "cubeRoomDays": cube_room_days, "surgeonDays": surgeon_days}
+
+if __name__ == "__main__":
+    counts = generate_calendar()
+    profiler.finish(**counts)
+    notify_warmup()
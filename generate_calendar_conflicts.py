@@ -0,0 +1,59 @@
+from pymongo import MongoClient
+from dotenv import load_dotenv
+import calendar
+import os
+import sys
+
+from utils import partitions
+from utils.conflicts import find_conflicts, persist_conflicts
+from utils.warmup import notify_warmup
+
+load_dotenv()
+
+client = MongoClient(os.getenv("MONGODB_URI"))
+db = client["surgical-analytics"]
+calendar_collection = db["calendar"]
+
+def month_range(month: str):
+    year, month_num = map(int, month.split("-"))
+    last_day = calendar.monthrange(year, month_num)[1]
+    return f"{month}-01", f"{month}-{last_day:02d}"
+
+def generate_conflicts(month: str, hospitalId=None, unit=None):
+    start_str, end_str = month_range(month)
+    query = {"date": {"$gte": start_str, "$lte": end_str}}
+    if hospitalId:
+        query["hospitalId"] = hospitalId
+    if unit:
+        query["unit"] = unit
+
+    # One read for the month, split into unit-months
+    unit_docs = {}
+    projection = {"date": 1, "room": 1, "hospitalId": 1, "unit": 1, "blocks": 1, "procedures": 1}
+    for doc in partitions.find(db, "calendar", query, start_str, end_str, projection):
+        key = (doc.get("hospitalId"), doc.get("unit"))
+        if all(key):
+            unit_docs.setdefault(key, []).append(doc)
+
+    total = 0
+    for (hosp, unit_name), docs in unit_docs.items():
+        result = find_conflicts(docs)
+        count = persist_conflicts(db, hosp, unit_name, month, result)
+        print(f"🔎 {hosp} / {unit_name} {month}: {count} conflicts across {len(docs)} room-days")
+        total += count
+
+    print(f"✅ {total} conflicts stored for {len(unit_docs)} unit-months")
+    return total
+
+# CLI
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: python generate_calendar_conflicts.py 2025-04 [hospitalId] [unit]")
+        sys.exit(1)
+
+    generate_conflicts(
+        sys.argv[1],
+        sys.argv[2] if len(sys.argv) > 2 else None,
+        sys.argv[3] if len(sys.argv) > 3 else None
+    )
+    notify_warmup()
@@ -0,0 +1,123 @@
+import argparse
+import os
+import time
+from datetime import datetime, timezone
+from functools import partial
+from itertools import islice
+from multiprocessing import Pool
+
+from bson import json_util
+from bson.json_util import JSONOptions
+from dotenv import load_dotenv
+from pymongo import InsertOne, MongoClient, ReplaceOne
+from pymongo.errors import BulkWriteError
+
+from utils.json_stream import iter_json_array
+
+load_dotenv()
+
+# Datetimes are stored the way pymongo reads them back by default: naive UTC
+JSON_OPTIONS = JSONOptions(tz_aware=False)
+FREQUENCY_DATE_FIELDS = ("blockStartDate", "blockEndDate", "blockStartTime", "blockEndTime", "lastUpdateTime")
+DUPLICATE_KEY = 11000
+
+collection = None
+
+def init_worker(collection_name):
+    """Each worker process opens its own client (clients are not fork-safe)."""
+    global collection
+    client = MongoClient(os.getenv("MONGODB_URI"))
+    collection = client["surgical-analytics"][collection_name]
+
+def decode_extended(value):
+    """Decode Mongo extended JSON ($oid, $date, $numberLong, ...) into BSON types."""
+    if isinstance(value, dict):
+        decoded = {k: decode_extended(v) for k, v in value.items()}
+        return json_util.object_hook(decoded, JSON_OPTIONS)
+    if isinstance(value, list):
+        return [decode_extended(v) for v in value]
+    return value
+
+def to_naive_utc(value):
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if isinstance(value, datetime) and value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+def normalise_frequencies(doc):
+    """Make frequency dates real datetimes and weeksOfMonth plain ints."""
+    for freq in doc.get("frequencies", []) or []:
+        for field in FREQUENCY_DATE_FIELDS:
+            if freq.get(field) is not None:
+                freq[field] = to_naive_utc(freq[field])
+        if "weeksOfMonth" in freq:
+            freq["weeksOfMonth"] = [int(w) for w in freq["weeksOfMonth"]]
+        if "dowApplied" in freq and freq["dowApplied"] is not None:
+            freq["dowApplied"] = int(freq["dowApplied"])
+    return doc
+
+def load_batch(raw_docs, upsert):
+    """Decode and write one batch; returns (written, skipped)."""
+    docs = [normalise_frequencies(decode_extended(raw)) for raw in raw_docs]
+
+    try:
+        if upsert:
+            result = collection.bulk_write(
+                [ReplaceOne({"_id": doc["_id"]}, doc, upsert=True) if "_id" in doc else InsertOne(doc)
+                 for doc in docs],
+                ordered=False
+            )
+            return result.inserted_count + result.upserted_count + result.modified_count, result.matched_count - result.modified_count
+        result = collection.insert_many(docs, ordered=False)
+        return len(result.inserted_ids), 0
+    except BulkWriteError as e:
+        errors = e.details.get("writeErrors", [])
+        fatal = [err for err in errors if err.get("code") != DUPLICATE_KEY]
+        if fatal:
+            raise
+        # Re-load without --upsert: existing _ids are skipped, not fatal
+        return e.details.get("nInserted", 0), len(errors)
+
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+def load_file(path, collection_name, upsert=False, workers=None, batch_size=1000, drop=False):
+    workers = workers or os.cpu_count() or 1
+    print(f"📥 Loading {path} into '{collection_name}' ({workers} workers, batches of {batch_size})")
+
+    if drop:
+        MongoClient(os.getenv("MONGODB_URI"))["surgical-analytics"][collection_name].drop()
+        print(f"🗑️ Dropped '{collection_name}'")
+
+    written = skipped = 0
+    started = time.perf_counter()
+    worker = partial(load_batch, upsert=upsert)
+
+    with open(path) as f, Pool(workers, initializer=init_worker, initargs=(collection_name,)) as pool:
+        for batch_written, batch_skipped in pool.imap_unordered(worker, batched(iter_json_array(f), batch_size)):
+            written += batch_written
+            skipped += batch_skipped
+
+    elapsed = time.perf_counter() - started
+    rate = (written + skipped) / elapsed if elapsed else 0
+    print(f"✅ {written} docs written, {skipped} unchanged/skipped in {elapsed:.2f}s ({rate:,.0f} docs/s)")
+    return {"written": written, "skipped": skipped, "seconds": round(elapsed, 3), "docsPerSecond": round(rate, 1)}
+
+# CLI
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="Bulk load a Mongo extended-JSON array export.")
+    arg_parser.add_argument("path", help="e.g. output_deidentifiedBlock.json")
+    arg_parser.add_argument("collection", choices=["block", "cases"], help="Target collection")
+    arg_parser.add_argument("--upsert", action="store_true", help="Replace existing documents by _id (re-loads)")
+    arg_parser.add_argument("--drop", action="store_true", help="Drop the collection before loading")
+    arg_parser.add_argument("--workers", type=int, default=None)
+    arg_parser.add_argument("--batch-size", type=int, default=1000)
+    args = arg_parser.parse_args()
+
+    load_file(args.path, args.collection, args.upsert, args.workers, args.batch_size, args.drop)
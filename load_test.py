@@ -0,0 +1,242 @@
+import argparse
+import asyncio
+import json
+import os
+import random
+import time
+from collections import Counter, defaultdict
+
+import httpx
+from dotenv import load_dotenv
+from pymongo import MongoClient, UpdateOne
+
+from utils.latency import percentiles
+from utils.synthetic import synthetic_calendar_docs, synthetic_npis
+
+load_dotenv()
+
+# Open-loop load test of the dashboard endpoints: requests are sent on a
+# Poisson schedule at --rate regardless of how fast earlier ones return, and
+# latency is measured from the scheduled send time (no coordinated omission).
+# Targets main.app in-process or a running server (--url, e.g. uvicorn with
+# several workers), optionally after seeding a synthetic unit into MONGODB_URI.
+
+ENDPOINTS = ("view", "qa", "blocks", "providers", "patch")
+DEFAULT_MIX = "view=40,qa=20,blocks=20,providers=15,patch=5"
+
+def parse_mix(text: str) -> dict:
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in ENDPOINTS:
+            raise ValueError(f"Unknown endpoint '{name}' (expected one of {', '.join(ENDPOINTS)})")
+        mix[name] = float(weight or 1)
+    return mix
+
+def seed_synthetic(month, hospitalId, unit, rooms, surgeons, seed) -> list:
+    """Replace the synthetic unit-month in Mongo; only documents of that unit are touched."""
+    db = MongoClient(os.getenv("MONGODB_URI"))["surgical-analytics"]
+    docs = synthetic_calendar_docs(month, hospitalId, unit, rooms=rooms, surgeons=surgeons, seed=seed)
+    db["calendar"].delete_many({"hospitalId": hospitalId, "unit": unit, "date": {"$regex": f"^{month}"}})
+    db["calendar"].insert_many(docs)
+    db["providers"].bulk_write([
+        UpdateOne({"npi": npi}, {"$set": {"npi": npi, "providerName": f"Surgeon {npi[-4:]}"}}, upsert=True)
+        for npi in synthetic_npis(surgeons)
+    ], ordered=False)
+    print(f"🌱 Seeded {len(docs)} room-days, {sum(len(d['blocks']) for d in docs)} blocks, "
+          f"{sum(len(d['procedures']) for d in docs)} cases for {hospitalId}/{unit} {month}")
+    return docs
+
+class Workload:
+    """Builds (endpoint, method, path, params, body) requests against one synthetic unit-month."""
+
+    def __init__(self, docs, month, hospitalId, unit, mix, rng, patch_recompute="none"):
+        self.month = month
+        self.hospitalId = hospitalId
+        self.unit = unit
+        self.rng = rng
+        self.patch_recompute = patch_recompute
+        self.names = list(mix)
+        self.weights = [mix[name] for name in self.names]
+        self.room_days = [(doc["date"], doc["room"]) for doc in docs]
+        self.blocks = [(block["blockId"], doc["date"]) for doc in docs for block in doc.get("blocks", [])]
+
+    def next(self):
+        endpoint = self.rng.choices(self.names, self.weights)[0]
+        unit_params = {"month": self.month, "hospitalId": self.hospitalId, "unit": self.unit}
+        if endpoint == "view":
+            return endpoint, "GET", "/calendar/view", unit_params, None
+        if endpoint == "qa":
+            return endpoint, "GET", "/api/calendar/qa", unit_params, None
+        if endpoint == "blocks":
+            date_str, room = self.rng.choice(self.room_days)
+            return endpoint, "GET", "/api/calendar/blocks", \
+                {"date": date_str, "room": room, "hospitalId": self.hospitalId, "unit": self.unit}, None
+        if endpoint == "providers":
+            return endpoint, "GET", "/api/providers/list", None, None
+        block_id, date_str = self.rng.choice(self.blocks)
+        return endpoint, "PATCH", "/api/calendar/blocks/inactive", {"recompute": self.patch_recompute}, \
+            {"blockId": block_id, "date": date_str, "inactive": self.rng.random() < 0.5}
+
+async def run_load(client, workload, rate, duration, max_in_flight, rng) -> dict:
+    latencies = defaultdict(list)
+    statuses = defaultdict(Counter)
+    lag = []
+    in_flight = set()
+    sent = dropped = 0
+
+    async def fire(request, scheduled):
+        endpoint, method, path, params, body = request
+        try:
+            response = await client.request(method, path, params=params, json=body)
+            status = response.status_code
+        except Exception as e:
+            status = type(e).__name__
+        latencies[endpoint].append((time.perf_counter() - scheduled) * 1000)
+        statuses[endpoint][str(status)] += 1
+
+    started = time.perf_counter()
+    scheduled = started
+    while True:
+        scheduled += rng.expovariate(rate)
+        if scheduled - started >= duration:
+            break
+        delay = scheduled - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        lag.append(max(0.0, -delay) * 1000)
+        request = workload.next()
+        if len(in_flight) >= max_in_flight:
+            # The client is saturated; count it rather than queueing it
+            dropped += 1
+            statuses[request[0]]["dropped"] += 1
+            continue
+        sent += 1
+        task = asyncio.create_task(fire(request, scheduled))
+        in_flight.add(task)
+        task.add_done_callback(in_flight.discard)
+
+    if in_flight:
+        await asyncio.wait(in_flight)
+    elapsed = time.perf_counter() - started
+
+    def is_error(status):
+        return not status.isdigit() or int(status) >= 400
+
+    endpoints = {}
+    for endpoint in sorted(statuses):
+        counts = statuses[endpoint]
+        total = sum(count for status, count in counts.items() if status != "dropped")
+        errors = sum(count for status, count in counts.items() if status != "dropped" and is_error(status))
+        endpoints[endpoint] = {
+            "requests": total,
+            "errors": errors,
+            "errorRate": round(errors / total, 4) if total else 0.0,
+            "statuses": dict(counts),
+            "latencyMs": percentiles(latencies[endpoint]),
+        }
+
+    all_latencies = [sample for samples in latencies.values() for sample in samples]
+    errors = sum(stats["errors"] for stats in endpoints.values())
+    return {
+        "sent": sent,
+        "dropped": dropped,
+        "completed": len(all_latencies),
+        "elapsedSeconds": round(elapsed, 3),
+        "throughputPerSecond": round(len(all_latencies) / elapsed, 2) if elapsed else 0.0,
+        "errors": errors,
+        "errorRate": round(errors / len(all_latencies), 4) if all_latencies else 0.0,
+        "latencyMs": percentiles(all_latencies),
+        "schedulerLagMs": percentiles(lag),
+        "endpoints": endpoints,
+    }
+
+async def warm(client, month, in_process):
+    if in_process:
+        from routers import admin
+        await asyncio.to_thread(admin.warmup_job.run, "load-test", [month])
+        return
+    response = await client.post("/admin/warmup", params={"months": month},
+                                 headers={"x-warmup-token": os.getenv("WARMUP_TOKEN", "")})
+    if response.status_code != 200:
+        print(f"⚠️ Warm-up not run ({response.status_code}): {response.json().get('detail')}")
+        return
+    while True:
+        await asyncio.sleep(0.5)
+        status = (await client.get("/ready")).json().get("warmup", {})
+        if status.get("status") in ("done", "failed"):
+            return
+
+async def main(args):
+    rng = random.Random(args.seed)
+    mix = parse_mix(args.mix)
+    if args.seed_data:
+        docs = seed_synthetic(args.month, args.hospital, args.unit, args.rooms, args.surgeons, args.seed)
+    else:
+        docs = synthetic_calendar_docs(args.month, args.hospital, args.unit, rooms=args.rooms,
+                                       surgeons=args.surgeons, seed=args.seed)
+
+    if args.url:
+        client = httpx.AsyncClient(base_url=args.url, timeout=args.timeout)
+    else:
+        import main as api
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=api.app), base_url="http://load-test",
+                                   timeout=args.timeout)
+
+    target = args.url or "in-process"
+    async with client:
+        if args.warmup:
+            print("🔥 Warming the response cache")
+            await warm(client, args.month, in_process=not args.url)
+        print(f"🚀 {args.rate:g} req/s for {args.duration:g}s against {target} ({args.mix})")
+        workload = Workload(docs, args.month, args.hospital, args.unit, mix, rng, args.patch_recompute)
+        results = await run_load(client, workload, args.rate, args.duration, args.max_in_flight, rng)
+
+    report = {
+        "target": target,
+        "month": args.month,
+        "hospitalId": args.hospital,
+        "unit": args.unit,
+        "rooms": args.rooms,
+        "surgeons": args.surgeons,
+        "ratePerSecond": args.rate,
+        "durationSeconds": args.duration,
+        "mix": mix,
+        "warmed": args.warmup,
+        **results,
+    }
+    latency = results["latencyMs"]
+    print(f"📊 {results['completed']} requests, {results['throughputPerSecond']} req/s, "
+          f"p50 {latency['p50']} ms, p95 {latency['p95']} ms, p99 {latency['p99']} ms, "
+          f"errors {results['errorRate'] * 100:.2f}%")
+    for endpoint, stats in results["endpoints"].items():
+        print(f"   {endpoint:<10} {stats['requests']:>6} req  p95 {stats['latencyMs']['p95']} ms  "
+              f"errors {stats['errors']}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"📝 Report written to {args.json}")
+    return report
+
+# CLI
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="Open-loop HTTP load test of the calendar endpoints.")
+    arg_parser.add_argument("--url", help="Running server, e.g. http://localhost:8000 (default: main.app in-process)")
+    arg_parser.add_argument("--rate", type=float, default=50, help="Target requests per second")
+    arg_parser.add_argument("--duration", type=float, default=30, help="Seconds of traffic")
+    arg_parser.add_argument("--mix", default=DEFAULT_MIX, help="Endpoint weights, e.g. view=40,qa=20,patch=5")
+    arg_parser.add_argument("--month", default="2025-04")
+    arg_parser.add_argument("--hospital", default="SYN-H1")
+    arg_parser.add_argument("--unit", default="SYN-UNIT")
+    arg_parser.add_argument("--rooms", type=int, default=40)
+    arg_parser.add_argument("--surgeons", type=int, default=150)
+    arg_parser.add_argument("--seed", type=int, default=7)
+    arg_parser.add_argument("--seed-data", action="store_true",
+                            help="Write the synthetic unit-month to MONGODB_URI first (use a local database)")
+    arg_parser.add_argument("--warmup", action="store_true", help="Warm the response cache before measuring")
+    arg_parser.add_argument("--patch-recompute", default="none", choices=["inline", "queued", "none"])
+    arg_parser.add_argument("--max-in-flight", type=int, default=500)
+    arg_parser.add_argument("--timeout", type=float, default=30)
+    arg_parser.add_argument("--json", help="Also write the report to this file")
+    asyncio.run(main(arg_parser.parse_args()))
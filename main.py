@@ -1,4 +1,5 @@
 from fastapi import FastAPI, Request, HTTPException, status
+from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from dotenv import load_dotenv
 from pymongo import MongoClient
@@ -8,16 +9,28 @@ import os
 from routers.surgeon_profiles import surgeon_profiles_router
 from routers.room_profiles import room_profiles_router
 from routers.block_utilization import block_utilization_router
+from routers.utilization_cube import utilization_cube_router
 from routers import calendar_qa 
 from routers import calendar_view
 from routers import calendar_blocks  
 from routers import calendar_patch
 from routers import providers  
+from routers import metrics
+from routers import availability
+from routers import admin
+from routers import surgeon_calendar
+from utils import snapshot_serving
+from utils.admission import AdmissionMiddleware, admission_controller
+from utils.warmup import WARMUP_ON_STARTUP
 # Load env variables
 load_dotenv()
 
 app = FastAPI()
 
+# Per-route concurrency limits and priority classes (interactive reads vs. batch generation).
+# Added before CORS so rejections still carry CORS headers.
+app.add_middleware(AdmissionMiddleware, controller=admission_controller)
+
 # CORS setup
 app.add_middleware(
     CORSMiddleware,
@@ -57,6 +70,25 @@ def get_db():
 def ping():
     return {"message": "pong"}
 
+# Readiness: 503 until the startup warm-up has filled the shared response cache
+@app.get("/ready")
+def ready():
+    warmup = admin.warmup_job.status()
+    return JSONResponse(status_code=200 if warmup["ready"] else 503, content={"ready": warmup["ready"], "warmup": warmup})
+
+# Warm the response cache in the background; the server accepts requests meanwhile
+@app.on_event("startup")
+def start_warmup():
+    if WARMUP_ON_STARTUP:
+        admin.warmup_job.start("startup")
+
+# Data source in use (live Mongo or read-only snapshot)
+@app.get("/datasource")
+def datasource():
+    if snapshot_serving.serving is not None:
+        return snapshot_serving.serving.status()
+    return {"mode": "mongo"}
+
 # MongoDB test
 @app.get("/cases/test")
 def test_cases():
@@ -78,11 +110,16 @@ def get_blocks():
 app.include_router(surgeon_profiles_router)
 app.include_router(room_profiles_router)
 app.include_router(block_utilization_router)
+app.include_router(utilization_cube_router)
 app.include_router(calendar_view.router)
 app.include_router(calendar_qa.router, prefix="/api")
 app.include_router(calendar_blocks.router,prefix="/api")
 app.include_router(calendar_patch.router,prefix="/api")
 app.include_router(providers.router,prefix="/api")
+app.include_router(metrics.router)
+app.include_router(availability.router)
+app.include_router(admin.router)
+app.include_router(surgeon_calendar.router)
 
 if __name__ == "__main__":
     import uvicorn
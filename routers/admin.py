@@ -0,0 +1,72 @@
+from fastapi import APIRouter, Header, HTTPException, Query
+from pymongo import MongoClient
+from dotenv import load_dotenv
+from typing import List, Optional
+import os
+from routers.block_utilization import cached_block_catalog
+from routers.calendar_qa import cached_calendar_qa
+from routers.calendar_view import cached_calendar_view, month_bounds
+from routers.providers import cached_provider_list
+from utils.response_cache import response_cache
+from utils.snapshot_serving import serving_snapshot
+from utils.warmup import WARMUP_ENABLED, WarmupJob
+
+load_dotenv()
+
+router = APIRouter()
+client = MongoClient(os.getenv("MONGODB_URI"))
+db = client["surgical-analytics"]
+calendar_collection = db["calendar"]
+
+WARMUP_TOKEN = os.getenv("WARMUP_TOKEN")
+
+def active_units(months: List[str]) -> list:
+    """(hospitalId, unit) pairs with calendar documents in any of the months."""
+    start_str = month_bounds(min(months))[0].strftime("%Y-%m-%d")
+    end_str = month_bounds(max(months))[1].strftime("%Y-%m-%d")
+    snapshot = serving_snapshot()
+    if snapshot is not None:
+        return snapshot.units(start_str, end_str)
+    return sorted(
+        (row["_id"]["hospitalId"], row["_id"]["unit"])
+        for row in calendar_collection.aggregate([
+            {"$match": {"date": {"$gte": start_str, "$lte": end_str}}},
+            {"$group": {"_id": {"hospitalId": "$hospitalId", "unit": "$unit"}}}
+        ])
+        if row["_id"].get("hospitalId") and row["_id"].get("unit")
+    )
+
+def warmup_plan(months: List[str], refresh: bool) -> list:
+    tasks = [
+        ("providers", lambda: cached_provider_list(refresh)),
+        ("block catalog", lambda: cached_block_catalog(refresh)),
+    ]
+    for hospitalId, unit in active_units(months):
+        for month in months:
+            tasks.append((f"view {month} {hospitalId}/{unit}",
+                          lambda m=month, h=hospitalId, u=unit: cached_calendar_view(m, h, u, refresh=refresh)))
+            tasks.append((f"qa {month} {hospitalId}/{unit}",
+                          lambda m=month, h=hospitalId, u=unit: cached_calendar_qa(m, h, u, refresh)))
+    return tasks
+
+# With CACHE_BACKEND=shared one worker warms at a time; the others then find the entries cached
+warmup_job = WarmupJob(warmup_plan, guard=lambda: response_cache.exclusive("warmup"))
+
+@router.post("/admin/warmup")
+def trigger_warmup(
+    months: Optional[List[str]] = Query(None, description="YYYY-MM; defaults to the current and next month"),
+    x_warmup_token: Optional[str] = Header(None)
+):
+    """
+    Recompute the cached calendar views, QA summaries, provider list and block
+    catalog in the background. Called by the regeneration jobs via WARMUP_URL
+    with WARMUP_TOKEN; disabled while WARMUP_TOKEN is unset.
+    """
+    if not WARMUP_TOKEN:
+        raise HTTPException(status_code=403, detail="Warm-up is disabled: WARMUP_TOKEN is not set")
+    if x_warmup_token != WARMUP_TOKEN:
+        raise HTTPException(status_code=401, detail="Invalid or missing warm-up token")
+    if not WARMUP_ENABLED:
+        raise HTTPException(status_code=409, detail="Warm-up needs CACHE_BACKEND=shared")
+    started = warmup_job.start("request", months)
+    return {"started": started, **warmup_job.status()}
@@ -0,0 +1,82 @@
+from fastapi import APIRouter, HTTPException, Query
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+from routers.calendar_view import fetch_calendar_docs
+from utils.availability import AvailabilityEngine, OWNERSHIP_RULES
+
+router = APIRouter()
+
+availability_engine = AvailabilityEngine(fetch_calendar_docs)
+
+OWNERSHIP_PATTERN = "^(" + "|".join(OWNERSHIP_RULES) + ")$"
+
+def parse_day(value: str, name: str):
+    try:
+        return datetime.strptime(value, "%Y-%m-%d").date()
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Invalid {name}: {value} (expected YYYY-MM-DD)")
+
+def parse_hhmm(value: str) -> int:
+    try:
+        parsed = datetime.strptime(value, "%H:%M")
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Invalid start: {value} (expected HH:MM)")
+    return parsed.hour * 60 + parsed.minute
+
+@router.get("/availability/slots", tags=["Availability"])
+def get_free_slots(
+    hospitalId: str = Query(...),
+    unit: str = Query(...),
+    npi: str = Query(...),
+    startDate: str = Query(..., example="2025-04-07"),
+    endDate: Optional[str] = Query(None, description="Defaults to startDate + 6 days"),
+    duration: int = Query(..., ge=1, le=24 * 60, description="Case length in minutes"),
+    rooms: Optional[List[str]] = Query(None),
+    ownership: str = Query("any", pattern=OWNERSHIP_PATTERN),
+    includeWeekends: bool = Query(False),
+    limit: int = Query(50, ge=1, le=500),
+):
+    """
+    Earliest-first free spans (CST, 7:00–15:30) where the surgeon can fit a
+    case of `duration` minutes. ownership: "any" = own blocks or unblocked
+    time, "own" = own blocks only, "open" = unblocked time only.
+    """
+    start = parse_day(startDate, "startDate")
+    end = parse_day(endDate, "endDate") if endDate else start + timedelta(days=6)
+    if end < start:
+        raise HTTPException(status_code=400, detail="endDate is before startDate")
+    if (end - start).days > 92:
+        raise HTTPException(status_code=400, detail="Date range is limited to 93 days")
+
+    slots = availability_engine.free_slots(
+        hospitalId, unit, npi, start, end, duration,
+        rooms=rooms, ownership=ownership, limit=limit, business_days_only=not includeWeekends
+    )
+    return {
+        "hospitalId": hospitalId,
+        "unit": unit,
+        "npi": npi,
+        "duration": duration,
+        "ownership": ownership,
+        "slots": slots
+    }
+
+@router.get("/availability/check", tags=["Availability"])
+def check_slot(
+    hospitalId: str = Query(...),
+    unit: str = Query(...),
+    npi: str = Query(...),
+    date: str = Query(..., example="2025-04-08"),
+    room: str = Query(...),
+    start: str = Query(..., example="07:30", description="CST start time, HH:MM"),
+    duration: int = Query(..., ge=1, le=24 * 60),
+    ownership: str = Query("any", pattern=OWNERSHIP_PATTERN),
+):
+    """Whether one placement is feasible, with every conflicting case or block when it is not."""
+    parse_day(date, "date")
+    return availability_engine.check(hospitalId, unit, npi, date, room, parse_hhmm(start), duration, ownership)
+
+@router.get("/availability/stats", tags=["Availability"])
+def get_availability_stats():
+    return availability_engine.stats()
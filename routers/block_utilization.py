@@ -1,6 +1,11 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Request
 from pymongo import MongoClient
 from datetime import datetime, timedelta
+from utils import partitions
+from utils.date_dimension import date_dimension, weeks_mask
+from utils.fast_json import dumps, encoded_response
+from utils.response_cache import response_cache
+from utils.single_flight import request_key
 from utils.time_utils import to_cst, minutes_within_block_window
 import os
 import traceback
@@ -13,8 +18,11 @@ block_collection = db["block"]
 cases_collection = db["cases"]
 util_collection = db["block_utilization"]
 
-def get_week_of_month(date: datetime) -> int:
-    return ((date.day + date.replace(day=1).weekday() - 1) // 7) + 1
+# Everything the UI needs to list surgeon blocks; releaseInfo can be large
+CATALOG_PROJECTION = {
+    "hospital": 1, "unit": 1, "room": 1, "name": 1, "flexId": 1, "type": 1,
+    "owner": 1, "frequencies": 1, "inactive": 1
+}
 
 def daterange(start_date, end_date):
     delta = end_date - start_date
@@ -38,7 +46,7 @@ def generate_block_utilization(start_date: str, end_date: str):
 
         for freq in block.get("frequencies", []):
             dow = freq.get("dowApplied")
-            weeks_of_month = [int(w) for w in freq.get("weeksOfMonth", []) if isinstance(w, int)]
+            weeks = weeks_mask(w for w in freq.get("weeksOfMonth", []) if isinstance(w, int))
 
             try:
                 block_start_raw = freq.get("blockStartDate")
@@ -65,9 +73,9 @@ def generate_block_utilization(start_date: str, end_date: str):
             for day in daterange(start, end):
                 if not (block_start.date() <= day.date() <= block_end.date()):
                     continue
-                if day.weekday() != dow:
+                if date_dimension.weekday(day) != dow:
                     continue
-                if get_week_of_month(day) not in weeks_of_month:
+                if not date_dimension.matches_weeks(day, weeks):
                     continue
 
                 block_start_cst = datetime.combine(day.date(), block_start_time).astimezone(to_cst("2024-01-01T00:00:00Z").tzinfo)
@@ -76,7 +84,7 @@ def generate_block_utilization(start_date: str, end_date: str):
                 day_start = datetime.combine(day.date(), datetime.min.time())
                 day_end = datetime.combine(day.date(), datetime.max.time())
 
-                matching_cases = list(cases_collection.find({
+                matching_cases = list(partitions.find(db, "cases", {
                     "procedureDate": {
                         "$gte": day_start,
                         "$lte": day_end
@@ -86,7 +94,7 @@ def generate_block_utilization(start_date: str, end_date: str):
                             "primary": True
                         }
                     }
-                }))
+                }, day_start, day_end))
 
 
                 in_room_minutes = 0
@@ -110,10 +118,10 @@ def generate_block_utilization(start_date: str, end_date: str):
 
                 utilization_doc = {
                     "room": room,
-                    "date": day.strftime("%Y-%m-%d"),
+                    "date": date_dimension.iso(day),
                     "surgeons": owner_npis,
                     "dow": dow,
-                    "weekOfMonth": get_week_of_month(day),
+                    "weekOfMonth": date_dimension.week_of_month(day),
                     "blockStartTime": block_start_time.strftime("%H:%M"),
                     "blockEndTime": block_end_time.strftime("%H:%M"),
                     "blockMinutes": block_duration,
@@ -133,4 +141,17 @@ def generate_block_utilization(start_date: str, end_date: str):
     print(f"✅ {total_inserted} block utilization records inserted or updated.")
     return {"recordsWritten": total_inserted}
 
+def render_block_catalog() -> bytes:
+    return dumps(list(block_collection.find({"type": "Surgeon"}, CATALOG_PROJECTION).sort("_id", 1)))
+
+def cached_block_catalog(refresh: bool = False) -> bytes:
+    return response_cache.cached("block_catalog", request_key(), render_block_catalog, refresh)
+
+@router.get("/blocks/catalog")
+def get_block_catalog(request: Request):
+    """
+    Surgeon blocks with their owners and frequencies.
+    """
+    return encoded_response(request, cached_block_catalog())
+
 block_utilization_router = router
@@ -1,8 +1,12 @@
 from datetime import datetime
 from pymongo import MongoClient
-from fastapi import APIRouter, Query
+from fastapi import APIRouter, Query, Request
 from dotenv import load_dotenv
 import os
+from utils import partitions
+from utils.fast_json import dumps, encoded_response
+from utils.single_flight import flight, request_key
+from utils.snapshot_serving import serving_snapshot
 
 load_dotenv()
 
@@ -13,6 +17,7 @@ calendar_collection = db["calendar"]
 
 @router.get("/calendar/blocks", tags=["Calendar"])
 def get_blocks_for_day(
+    request: Request,
     date: str = Query(..., example="2024-05-08"),
     room: str = Query(...),
     hospitalId: str = Query(...),
@@ -27,21 +32,32 @@ def get_blocks_for_day(
     except Exception as e:
         return {"error": f"Invalid date format: {e}"}
 
-    cursor = calendar_collection.find({
-        "date": central_date_str,
-        "hospitalId": hospitalId,
-        "unit": unit,
-        "room": room
-    })
+    def compute() -> bytes:
+        snapshot = serving_snapshot()
+        if snapshot is not None:
+            cursor = [
+                doc for doc in snapshot.unit_calendar_docs(hospitalId, unit, central_date_str, central_date_str)
+                if doc.get("room") == room
+            ]
+        else:
+            cursor = partitions.find(db, "calendar", {
+                "date": central_date_str,
+                "hospitalId": hospitalId,
+                "unit": unit,
+                "room": room
+            }, central_date_str, central_date_str)
 
-    blocks = []
-    for doc in cursor:
-        for block in doc.get("blocks", []):
-            block["inactive"] = block.get("inactive", False)
-            blocks.append(block)
+        blocks = []
+        for doc in cursor:
+            for block in doc.get("blocks", []):
+                block["inactive"] = block.get("inactive", False)
+                blocks.append(block)
 
-    return {
-        "date": central_date_str,
-        "room": room,
-        "blocks": blocks
-    }
+        return dumps({
+            "date": central_date_str,
+            "room": room,
+            "blocks": blocks
+        })
+
+    key = request_key(date=central_date_str, room=room, hospitalId=hospitalId, unit=unit)
+    return encoded_response(request, flight("calendar_blocks").do(key, compute))
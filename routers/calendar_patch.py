@@ -1,10 +1,21 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, BackgroundTasks, HTTPException, Query
 from pydantic import BaseModel
-from pymongo import MongoClient
+from pymongo import MongoClient, UpdateMany, UpdateOne
 from bson import ObjectId
+from bson.errors import InvalidId
+from collections import defaultdict
+from datetime import datetime
+from typing import List, Optional
 from dotenv import load_dotenv
 import os
 
+from utils.availability import invalidate_availability
+from utils.conflicts import refresh_conflict_dates
+from utils.response_cache import invalidate_calendar_responses, response_cache
+from utils.snapshot_serving import require_writable
+from utils.surgeon_calendar import sync_surgeon_calendar
+from utils.utilization import recompute_block_day, recompute_for_case
+
 load_dotenv()
 
 router = APIRouter()
@@ -13,29 +24,243 @@ db = client["surgical-analytics"]
 calendar_collection = db["calendar"]
 block_collection = db["block"]
 
+MAX_BULK_ITEMS = 1000
+
 class BlockUpdateRequest(BaseModel):
     blockId: str
     inactive: bool
     date: str  # YYYY-MM-DD format (e.g., 2025-04-01)
 
+class BlockDateItem(BaseModel):
+    blockId: str
+    date: Optional[str] = None       # a single day, or
+    startDate: Optional[str] = None  # an inclusive range
+    endDate: Optional[str] = None
+
+class CaseChangeRequest(BaseModel):
+    npi: str
+    date: str  # YYYY-MM-DD (CST procedure date)
+    room: str
+    hospitalId: Optional[str] = None
+    unit: Optional[str] = None
+
+class BulkBlockUpdateRequest(BaseModel):
+    inactive: bool
+    items: List[BlockDateItem] = []
+    # Shorthand for one block over a range (e.g. a vacation month)
+    blockId: Optional[str] = None
+    startDate: Optional[str] = None
+    endDate: Optional[str] = None
+
+def block_date_filter(item: BlockDateItem) -> dict:
+    """Calendar filter for one item; raises ValueError on bad dates."""
+    if item.date:
+        datetime.strptime(item.date, "%Y-%m-%d")
+        return {"date": item.date, "blocks.blockId": item.blockId}
+    if item.startDate and item.endDate:
+        start = datetime.strptime(item.startDate, "%Y-%m-%d")
+        end = datetime.strptime(item.endDate, "%Y-%m-%d")
+        if end < start:
+            raise ValueError("endDate is before startDate")
+        return {"date": {"$gte": item.startDate, "$lte": item.endDate}, "blocks.blockId": item.blockId}
+    raise ValueError("Provide date or startDate and endDate")
+
+def set_block_inactive(calendar_filter: dict, block_id: str, inactive: bool) -> UpdateMany:
+    # arrayFilters reach every element with this blockId in every matching doc;
+    # the positional `$` only touches the first match in the first doc
+    return UpdateMany(
+        calendar_filter,
+        {"$set": {"blocks.$[b].inactive": inactive}},
+        array_filters=[{"b.blockId": block_id}]
+    )
+
+def _date_matches(date_str: str, date_filter) -> bool:
+    if isinstance(date_filter, dict):
+        return date_filter["$gte"] <= date_str <= date_filter["$lte"]
+    return date_str == date_filter
+
+def matched_docs_by_filter(calendar_filters: List[dict]) -> List[set]:
+    """(doc _id, date) pairs each block_date_filter matches, from one read for all of them."""
+    matches = [set() for _ in calendar_filters]
+    if not calendar_filters:
+        return matches
+    filters_by_block = defaultdict(list)
+    for index, calendar_filter in enumerate(calendar_filters):
+        filters_by_block[calendar_filter["blocks.blockId"]].append((index, calendar_filter["date"]))
+    for doc in calendar_collection.find({"$or": calendar_filters}, {"date": 1, "blocks.blockId": 1}):
+        for block_id in {block.get("blockId") for block in doc.get("blocks", [])}:
+            for index, date_filter in filters_by_block.get(block_id, []):
+                if _date_matches(doc["date"], date_filter):
+                    matches[index].add((doc["_id"], doc["date"]))
+    return matches
+
+def refresh_unit_conflicts(db, hospitalId: str, unit: str, dates: List[str]) -> int:
+    found = refresh_conflict_dates(db, hospitalId, unit, dates)
+    for month in sorted({date_str[:7] for date_str in dates}):
+        invalidate_calendar_responses(month, hospitalId, unit)
+    return found
+
+def refresh_unit_dates(calendar_filters: List[dict]) -> list:
+    """
+    Keep cached availability and responses current for every affected
+    unit-month, and the surgeon-days of the affected blocks. Returns the
+    conflict refresh jobs of the touched unit-dates, for dispatch_recompute.
+    """
+    if not calendar_filters:
+        return []
+    unit_dates = defaultdict(set)
+    surgeon_days = defaultdict(set)
+    for doc in calendar_collection.find(
+        {"$or": calendar_filters},
+        {"_id": 0, "hospitalId": 1, "unit": 1, "date": 1, "blocks.npi": 1, "blocks.primaryNpi": 1}
+    ):
+        unit_dates[(doc.get("hospitalId"), doc.get("unit"))].add(doc["date"])
+        surgeon_days[doc["date"]].update(block.get("npi") or block.get("primaryNpi") for block in doc.get("blocks", []))
+    for date_str, npis in sorted(surgeon_days.items()):
+        sync_surgeon_calendar(db, [date_str], npis)
+    for (hospitalId, unit), dates in unit_dates.items():
+        for month in {date_str[:7] for date_str in dates}:
+            invalidate_availability(month, hospitalId, unit)
+            invalidate_calendar_responses(month, hospitalId, unit)
+    return [(refresh_unit_conflicts, hospitalId, unit, sorted(dates))
+            for (hospitalId, unit), dates in sorted(unit_dates.items(), key=str)]
+
+def dispatch_recompute(background_tasks: BackgroundTasks, recompute: str, jobs) -> list:
+    """
+    Run (fn, *args) utilization and QA jobs in the request ("inline"), after
+    the response is sent ("queued"), or not at all ("none", left to
+    generate_block_utilization.py and generate_calendar_conflicts.py).
+    """
+    if recompute == "inline":
+        return [fn(db, *args) for fn, *args in jobs]
+    if recompute == "queued":
+        for fn, *args in jobs:
+            background_tasks.add_task(fn, db, *args)
+    return []
+
 @router.patch("/calendar/blocks/inactive")
-def patch_block_inactive(data: BlockUpdateRequest):
-    # Update the embedded block inside the correct calendar document
-    calendar_result = calendar_collection.update_one(
-        {"date": data.date, "blocks.blockId": data.blockId},
-        {"$set": {"blocks.$.inactive": data.inactive}}
+def patch_block_inactive(data: BlockUpdateRequest, background_tasks: BackgroundTasks, recompute: str = Query("inline", pattern="^(inline|queued|none)$")):
+    require_writable()
+
+    try:
+        block_oid = ObjectId(data.blockId)
+    except InvalidId:
+        raise HTTPException(status_code=400, detail=f"Invalid blockId: {data.blockId}")
+
+    calendar_filter = {"date": data.date, "blocks.blockId": data.blockId}
+    calendar_result = calendar_collection.bulk_write(
+        [set_block_inactive(calendar_filter, data.blockId, data.inactive)]
     )
 
     # Update top-level block document
     block_result = block_collection.update_one(
-        {"_id": ObjectId(data.blockId)},
+        {"_id": block_oid},
         {"$set": {"inactive": data.inactive}}
     )
+    response_cache.invalidate("block_catalog")
+
+    # QA flags and conflicts follow the same recompute mode as utilization
+    dispatch_recompute(background_tasks, recompute, refresh_unit_dates([calendar_filter]))
+    utilization = dispatch_recompute(background_tasks, recompute, [(recompute_block_day, data.blockId, data.date)])
 
     return {
         "calendarUpdated": calendar_result.modified_count,
         "blockUpdated": block_result.modified_count,
         "blockId": data.blockId,
         "date": data.date,
-        "inactive": data.inactive
+        "inactive": data.inactive,
+        "recompute": recompute,
+        "utilization": utilization
+    }
+
+@router.patch("/calendar/blocks/inactive/bulk")
+def patch_blocks_inactive_bulk(data: BulkBlockUpdateRequest, background_tasks: BackgroundTasks, recompute: str = Query("inline", pattern="^(inline|queued|none)$")):
+    """
+    Set `inactive` for many blockId/date pairs (or one blockId over a date range)
+    with one bulk write per collection. Returns a result per item.
+    """
+    require_writable()
+
+    items = list(data.items)
+    if data.blockId:
+        items.append(BlockDateItem(blockId=data.blockId, startDate=data.startDate, endDate=data.endDate))
+    if not items:
+        raise HTTPException(status_code=400, detail="No items to update")
+    if len(items) > MAX_BULK_ITEMS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BULK_ITEMS} items per request")
+
+    results = []
+    calendar_writes = []
+    calendar_filters = []
+    block_ids = set()
+    for item in items:
+        result = {"blockId": item.blockId, "date": item.date, "startDate": item.startDate, "endDate": item.endDate}
+        results.append(result)
+        try:
+            block_oid = ObjectId(item.blockId)
+            calendar_filter = block_date_filter(item)
+        except (InvalidId, ValueError) as e:
+            result["error"] = str(e)
+            continue
+        calendar_writes.append(set_block_inactive(calendar_filter, item.blockId, data.inactive))
+        calendar_filters.append(calendar_filter)
+        block_ids.add(block_oid)
+        result["filterIndex"] = len(calendar_filters) - 1
+
+    # Per-item counts: bulk results are only totals, so match up front (one read)
+    matches = matched_docs_by_filter(calendar_filters)
+    for result in results:
+        index = result.pop("filterIndex", None)
+        if index is not None:
+            result["calendarMatched"] = len(matches[index])
+
+    calendar_modified = 0
+    if calendar_writes:
+        calendar_modified = calendar_collection.bulk_write(calendar_writes, ordered=False).modified_count
+
+    block_modified = 0
+    if block_ids:
+        block_modified = block_collection.bulk_write([
+            UpdateOne({"_id": block_oid}, {"$set": {"inactive": data.inactive}})
+            for block_oid in block_ids
+        ], ordered=False).modified_count
+        response_cache.invalidate("block_catalog")
+
+    dispatch_recompute(background_tasks, recompute, refresh_unit_dates(calendar_filters))
+
+    # One recompute per touched block-day
+    block_days = {
+        (calendar_filter["blocks.blockId"], date_str)
+        for calendar_filter, matched in zip(calendar_filters, matches)
+        for _, date_str in matched
+    }
+    utilization = dispatch_recompute(
+        background_tasks, recompute,
+        [(recompute_block_day, block_id, date) for block_id, date in sorted(block_days)]
+    )
+
+    return {
+        "inactive": data.inactive,
+        "recompute": recompute,
+        "blockDaysRecomputed": len(block_days) if recompute != "none" else 0,
+        "calendarUpdated": calendar_modified,
+        "blockUpdated": block_modified,
+        "failed": sum(1 for result in results if "error" in result),
+        "items": results
     }
+
+@router.post("/calendar/utilization/recompute")
+def recompute_case_utilization(data: CaseChangeRequest, background_tasks: BackgroundTasks, recompute: str = Query("inline", pattern="^(inline|queued|none)$")):
+    """
+    Refresh utilization after a case is ingested or changed: the room-day it
+    falls on and the surgeon's blocks that day.
+    """
+    require_writable()
+    try:
+        datetime.strptime(data.date, "%Y-%m-%d")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    job = (recompute_for_case, data.npi, data.date, data.room, data.hospitalId, data.unit)
+    utilization = dispatch_recompute(background_tasks, recompute, [job])
+    return {"recompute": recompute, "utilization": utilization}
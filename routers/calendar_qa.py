@@ -1,11 +1,17 @@
 from datetime import datetime, timedelta
 from pymongo import MongoClient
-from fastapi import APIRouter, Query
+from fastapi import APIRouter, Query, Request
 from dotenv import load_dotenv
 import calendar
 import os
 from dateutil import parser
 import pytz
+from utils import partitions
+from utils.fast_json import dumps, encoded_response, json_response
+from utils.response_cache import response_cache
+from utils.single_flight import request_key
+from utils.conflicts import find_conflicts, qa_summary_id
+from utils.snapshot_serving import serving_snapshot
 
 load_dotenv()
 
@@ -13,6 +19,8 @@ router = APIRouter()
 client = MongoClient(os.getenv("MONGODB_URI"))
 db = client["surgical-analytics"]
 calendar_collection = db["calendar"]
+qa_collection = db["calendar_qa"]
+conflicts_collection = db["calendar_conflicts"]
 
 central = pytz.timezone("US/Central")
 
@@ -25,27 +33,8 @@ def parse_to_central_date(dt_str: str) -> str:
     except Exception:
         return dt_str[:10]  # fallback just in case
 
-def check_block_overlap(blocks):
-    intervals = []
-    for b in blocks:
-        try:
-            start = parser.isoparse(b["startTime"])
-            end = parser.isoparse(b["endTime"])
-            intervals.append((start, end))
-        except Exception:
-            continue
-    intervals.sort()
-    for i in range(1, len(intervals)):
-        if intervals[i][0] < intervals[i - 1][1]:
-            return True
-    return False
-
-@router.get("/calendar/qa")
-def get_calendar_qa_view(
-    month: str = Query(..., example="2024-05"),
-    hospitalId: str = Query(...),
-    unit: str = Query(...),
-):
+def compute_calendar_qa(month: str, hospitalId: str, unit: str):
+    """Live fallback when generate_calendar_conflicts.py has not run for this unit-month."""
     year, month_num = map(int, month.split("-"))
     start_date = datetime(year, month_num, 1).date()
     last_day = calendar.monthrange(year, month_num)[1]
@@ -54,33 +43,65 @@ def get_calendar_qa_view(
     start_str = start_date.strftime("%Y-%m-%d")
     end_str = end_date.strftime("%Y-%m-%d")
 
-    calendar_docs = list(calendar_collection.find({
-        "date": {"$gte": start_str, "$lte": end_str},
-        "hospitalId": hospitalId,
-        "unit": unit
-    }))
+    snapshot = serving_snapshot()
+    if snapshot is not None:
+        calendar_docs = snapshot.unit_calendar_docs(hospitalId, unit, start_str, end_str)
+    else:
+        calendar_docs = list(partitions.find(db, "calendar", {
+            "date": {"$gte": start_str, "$lte": end_str},
+            "hospitalId": hospitalId,
+            "unit": unit
+        }, start_str, end_str))
+    return find_conflicts(calendar_docs)
 
-    all_rooms = set()
-    rooms_with_overlap = {}
-    rooms_with_multiple = {}
+def render_calendar_qa(month: str, hospitalId: str, unit: str) -> bytes:
+    # Precomputed by generate_calendar_conflicts.py: a single _id lookup
+    summary = None
+    if serving_snapshot() is None:
+        summary = qa_collection.find_one(
+            {"_id": qa_summary_id(hospitalId, unit, month)},
+            {"_id": 0, "hospitalId": 0, "unit": 0, "month": 0, "generatedAt": 0}
+        )
+    if summary is None:
+        result = compute_calendar_qa(month, hospitalId, unit)
+        summary = {**result["summary"], "conflictCount": len(result["conflicts"])}
+    return dumps(summary)
 
-    for doc in calendar_docs:
-        date = doc["date"][:10]  # ✅ use plain string without timezone conversion
-        room = doc.get("room")
-        blocks = doc.get("blocks", [])
+def cached_calendar_qa(month: str, hospitalId: str, unit: str, refresh: bool = False) -> bytes:
+    key = request_key(month=month, hospitalId=hospitalId, unit=unit)
+    return response_cache.cached("calendar_qa", key, lambda: render_calendar_qa(month, hospitalId, unit), refresh)
 
-        if not room or not blocks:
-            continue
+@router.get("/calendar/qa")
+def get_calendar_qa_view(
+    request: Request,
+    month: str = Query(..., example="2024-05"),
+    hospitalId: str = Query(...),
+    unit: str = Query(...),
+):
+    return encoded_response(request, cached_calendar_qa(month, hospitalId, unit))
 
-        all_rooms.add(room)
+@router.get("/calendar/qa/conflicts")
+def get_calendar_conflicts(
+    request: Request,
+    month: str = Query(..., example="2024-05"),
+    hospitalId: str = Query(...),
+    unit: str = Query(...),
+    type: str = Query(None, description="roomOverlap, surgeonDoubleBooked or caseOutsideBlock"),
+):
+    """
+    Conflict records for a unit-month (room overlaps, surgeon double-booking,
+    cases outside blocks).
+    """
+    query = {"hospitalId": hospitalId, "unit": unit, "month": month}
+    if type:
+        query["type"] = type
 
-        if len(blocks) > 1:
-            rooms_with_multiple.setdefault(room, []).append(date)
-            if check_block_overlap(blocks):
-                rooms_with_overlap.setdefault(room, []).append(date)
+    if serving_snapshot() is None and qa_collection.count_documents({"_id": qa_summary_id(hospitalId, unit, month)}, limit=1):
+        conflicts = list(conflicts_collection.find(query, {"_id": 0}))
+    else:
+        conflicts = [
+            conflict for conflict in compute_calendar_qa(month, hospitalId, unit)["conflicts"]
+            if not type or conflict["type"] == type
+        ]
 
-    return {
-        "allRooms": sorted(all_rooms),
-        "roomsWithOverlap": rooms_with_overlap,
-        "roomsWithMultiple": rooms_with_multiple
-    }
+    return json_response(request, {"month": month, "conflicts": conflicts})
@@ -1,13 +1,19 @@
-from fastapi import APIRouter, Query
+from fastapi import APIRouter, Query, Request
 from pymongo import MongoClient
 from datetime import datetime, timedelta
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional
 import calendar
 import os
 import logging
 from collections import defaultdict
 from dateutil import parser
 from dotenv import load_dotenv
+from utils import partitions
+from utils.date_dimension import date_dimension
+from utils.fast_json import dumps, encoded_response
+from utils.response_cache import response_cache
+from utils.single_flight import request_key
+from utils.snapshot_serving import serving_snapshot
 
 load_dotenv()
 
@@ -20,8 +26,7 @@ logger = logging.getLogger("routers.calendar_view")
 logging.basicConfig(level=logging.INFO)
 
 def get_weekday(date_str: str) -> str:
-    dt = datetime.strptime(date_str, "%Y-%m-%d").date()
-    return calendar.day_name[dt.weekday()]
+    return date_dimension.weekday_name(date_str)
 
 def empty_day(weekday: str, all_rooms: list) -> Dict[str, Any]:
     return {
@@ -49,31 +54,86 @@ def format_time_range(start: Any, end: Any, context: str = "") -> str:
         logger.warning(f"Time format error: {e}")
         return ""
 
-@router.get("/calendar/view")
-def get_calendar_view(
-    month: str = Query(..., example="2025-04"),
-    hospitalId: str = Query(...),
-    unit: str = Query(...)
-):
-    weekdays = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday"]
+def month_bounds(month: str):
     year, month_num = map(int, month.split("-"))
     start_date = datetime(year, month_num, 1).date()
     last_day = calendar.monthrange(year, month_num)[1]
     end_date = datetime(year, month_num, last_day).date()
+    return start_date, end_date
 
-    matching_docs = list(calendar_collection.find({
+def fetch_calendar_docs(start_date, end_date, hospitalId: str, unit: str) -> list:
+    snapshot = serving_snapshot()
+    if snapshot is not None:
+        return snapshot.unit_calendar_docs(hospitalId, unit, start_date.strftime("%Y-%m-%d"), end_date.strftime("%Y-%m-%d"))
+    return list(partitions.find(db, "calendar", {
         "date": {"$gte": start_date.strftime("%Y-%m-%d"), "$lte": end_date.strftime("%Y-%m-%d")},
         "hospitalId": hospitalId,
         "unit": unit
-    }))
+    }, start_date, end_date))
+
+def fetch_calendar_docs_by_unit(start_date, end_date, hospitalId: str, units: Optional[List[str]] = None) -> Dict[str, list]:
+    """One query for many units (or every unit of the hospital), grouped by unit."""
+    snapshot = serving_snapshot()
+    if snapshot is not None:
+        start_str, end_str = start_date.strftime("%Y-%m-%d"), end_date.strftime("%Y-%m-%d")
+        return {
+            unit: snapshot.unit_calendar_docs(hospitalId, unit, start_str, end_str)
+            for unit in units or snapshot.hospital_units(hospitalId, start_str, end_str)
+        }
+
+    query = {
+        "date": {"$gte": start_date.strftime("%Y-%m-%d"), "$lte": end_date.strftime("%Y-%m-%d")},
+        "hospitalId": hospitalId
+    }
+    if units:
+        query["unit"] = {"$in": list(units)}
 
-    all_rooms = sorted({
+    docs_by_unit: Dict[str, list] = {unit: [] for unit in units or []}
+    for doc in partitions.find(db, "calendar", query, start_date, end_date):
+        docs_by_unit.setdefault(doc.get("unit"), []).append(doc)
+    return docs_by_unit
+
+def collect_rooms(matching_docs: list) -> list:
+    return sorted({
         doc["room"].strip().upper()
         for doc in matching_docs
         if doc.get("room") and isinstance(doc["room"], str)
     })
 
+def grid_slots(start_date, end_date):
+    """Yield (week index, weekday index, date or None) for every weekday cell of the 6x5 grid."""
+    cells = []
+    first_weekday = date_dimension.weekday(start_date)
+    if first_weekday < 5:
+        cells.extend((i, None) for i in range(first_weekday))
+
+    current_day = start_date
+    while current_day <= end_date:
+        if date_dimension.is_business_day(current_day):
+            cells.append((date_dimension.weekday(current_day), current_day))
+        current_day += timedelta(days=1)
+
+    while len(cells) % 5:
+        cells.append((len(cells) % 5, None))
+    while len(cells) < 30:
+        cells.append((len(cells) % 5, None))
+
+    for idx, (weekday_idx, day) in enumerate(cells[:30]):
+        yield idx // 5, weekday_idx, day
+
+def build_calendar_grid(matching_docs: list, start_date, end_date) -> list:
+    weekdays = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday"]
+    all_rooms = collect_rooms(matching_docs)
+
     days_grid = [[] for _ in range(6)]
+    # Padding cells are identical per weekday, so build each one once and share it
+    empty_days: Dict[str, Dict[str, Any]] = {}
+
+    def padding_day(weekday: str) -> Dict[str, Any]:
+        if weekday not in empty_days:
+            empty_days[weekday] = empty_day(weekday, all_rooms)
+        return empty_days[weekday]
+
     grouped_by_date: Dict[str, Dict[str, Any]] = {}
 
     for doc in matching_docs:
@@ -139,31 +199,158 @@ def get_calendar_view(
         ]
 
     # Calendar grid setup
-    week_idx = 0
-    current_day = start_date
-    first_weekday = current_day.weekday()
+    for week_idx, weekday_idx, day in grid_slots(start_date, end_date):
+        date_str = day.strftime("%Y-%m-%d") if day else None
+        if date_str in grouped_by_date:
+            days_grid[week_idx].append(grouped_by_date[date_str])
+        else:
+            days_grid[week_idx].append(padding_day(weekdays[weekday_idx]))
 
-    if first_weekday < 5:
-        for i in range(first_weekday):
-            days_grid[week_idx].append(empty_day(calendar.day_name[i], all_rooms))
+    return days_grid
 
-    while current_day <= end_date:
-        if current_day.weekday() < 5:
-            date_str = current_day.strftime("%Y-%m-%d")
-            weekday_name = calendar.day_name[current_day.weekday()]
+def minute_of_day(value: Any) -> int:
+    """Minutes since midnight of the wall-clock time (the HH:MM the grid shows)."""
+    if not value:
+        return -1
+    try:
+        if not isinstance(value, datetime):
+            try:
+                value = datetime.fromisoformat(str(value))
+            except ValueError:
+                value = parser.parse(str(value))
+        return value.hour * 60 + value.minute
+    except Exception as e:
+        logger.warning(f"Time parse error: {e}")
+        return -1
 
-            if len(days_grid[week_idx]) == 5:
-                week_idx += 1
+class Interner:
+    """Assigns each distinct value a stable index in a shared dictionary."""
 
-            if date_str in grouped_by_date:
-                days_grid[week_idx].append(grouped_by_date[date_str])
-            else:
-                days_grid[week_idx].append(empty_day(weekday_name, all_rooms))
+    def __init__(self):
+        self.values = []
+        self.index = {}
 
-        current_day += timedelta(days=1)
+    def __call__(self, value) -> int:
+        if value is None:
+            return -1
+        idx = self.index.get(value)
+        if idx is None:
+            idx = self.index[value] = len(self.values)
+            self.values.append(value)
+        return idx
 
-    for week in days_grid:
-        while len(week) < 5:
-            week.append(empty_day(weekdays[len(week)], all_rooms))
+def build_compact_calendar(matching_docs: list, start_date, end_date) -> Dict[str, Any]:
+    """
+    Columnar form of the grid: rooms/providers/NPIs are interned once and each
+    day carries parallel arrays of entries. Padding cells are null in `grid`.
+    """
+    all_rooms = collect_rooms(matching_docs)
+    room_index = {room: i for i, room in enumerate(all_rooms)}
+    providers = Interner()
+    npis = Interner()
+    days: Dict[str, Dict[str, Any]] = {}
 
-    return days_grid[:6]
+    for doc in matching_docs:
+        date_str = doc["date"]
+        room = doc.get("room", "").strip().upper()
+        room_idx = room_index.get(room, -1)
+
+        day = days.get(date_str)
+        if day is None:
+            day = days[date_str] = {
+                "date": date_str,
+                "overall": 0.0,
+                "roomUtilization": [0.0] * len(all_rooms),
+                "entries": {
+                    "room": [], "type": [], "start": [], "end": [], "duration": [],
+                    "provider": [], "npi": [], "inactive": [], "inRoom": [], "anywhere": []
+                }
+            }
+        entries = day["entries"]
+
+        for kind, items, npi_field in ((0, doc.get("procedures", []), "primaryNpi"), (1, doc.get("blocks", []), "npi")):
+            for item in items:
+                entries["room"].append(room_idx)
+                entries["type"].append(kind)
+                entries["start"].append(minute_of_day(item.get("startTime")))
+                entries["end"].append(minute_of_day(item.get("endTime")))
+                entries["duration"].append(item.get("duration", 0))
+                entries["provider"].append(providers(item.get("providerName", "")))
+                entries["npi"].append(npis(item.get(npi_field)))
+                entries["inactive"].append(1 if item.get("inactive", False) else 0)
+                entries["inRoom"].append(item.get("inRoomUtilization", 0.0) if kind else 0.0)
+                entries["anywhere"].append(item.get("anywhereUtilization", 0.0) if kind else 0.0)
+
+        room_util = doc.get("utilizationRate")
+        if room_util is not None and room_idx >= 0:
+            day["roomUtilization"][room_idx] = round(room_util, 3)
+
+    for day in days.values():
+        if day["roomUtilization"]:
+            day["overall"] = round(sum(day["roomUtilization"]) / len(day["roomUtilization"]), 3)
+
+    ordered_dates = sorted(days)
+    day_position = {date_str: i for i, date_str in enumerate(ordered_dates)}
+    grid = [[None] * 5 for _ in range(6)]
+    for week_idx, weekday_idx, day in grid_slots(start_date, end_date):
+        if day:
+            grid[week_idx][weekday_idx] = day_position.get(day.strftime("%Y-%m-%d"))
+
+    return {
+        "format": "compact",
+        "month": start_date.strftime("%Y-%m"),
+        "weekdays": ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday"],
+        "entryTypes": ["case", "block"],
+        "rooms": all_rooms,
+        "providers": providers.values,
+        "npis": npis.values,
+        "grid": grid,
+        "days": [days[date_str] for date_str in ordered_dates]
+    }
+
+def render_calendar_view(month: str, hospitalId: str, unit: str, format: str = "grid") -> bytes:
+    start_date, end_date = month_bounds(month)
+    matching_docs = fetch_calendar_docs(start_date, end_date, hospitalId, unit)
+    if format == "compact":
+        return dumps(build_compact_calendar(matching_docs, start_date, end_date))
+    return dumps(build_calendar_grid(matching_docs, start_date, end_date))
+
+def cached_calendar_view(month: str, hospitalId: str, unit: str, format: str = "grid", refresh: bool = False) -> bytes:
+    """Encoded view from the response cache; identical concurrent misses share one query + build."""
+    key = request_key(month=month, hospitalId=hospitalId, unit=unit, format=format)
+    return response_cache.cached("calendar_view", key, lambda: render_calendar_view(month, hospitalId, unit, format), refresh)
+
+@router.get("/calendar/view")
+def get_calendar_view(
+    request: Request,
+    month: str = Query(..., example="2025-04"),
+    hospitalId: str = Query(...),
+    unit: str = Query(...),
+    format: str = Query("grid", pattern="^(grid|compact)$")
+):
+    return encoded_response(request, cached_calendar_view(month, hospitalId, unit, format))
+
+@router.get("/calendar/view/batch")
+def get_calendar_view_batch(
+    request: Request,
+    month: str = Query(..., example="2025-04"),
+    hospitalId: str = Query(...),
+    units: Optional[List[str]] = Query(None, description="Omit for every unit of the hospital"),
+    format: str = Query("grid", pattern="^(grid|compact)$")
+):
+    """
+    Calendar views for many units of a hospital in one call, keyed by unit.
+    """
+    start_date, end_date = month_bounds(month)
+    docs_by_unit = fetch_calendar_docs_by_unit(start_date, end_date, hospitalId, units)
+
+    build = build_compact_calendar if format == "compact" else build_calendar_grid
+    return encoded_response(request, dumps({
+        "month": month,
+        "hospitalId": hospitalId,
+        "units": {
+            unit: build(docs, start_date, end_date)
+            for unit, docs in sorted(docs_by_unit.items(), key=lambda item: str(item[0]))
+            if unit is not None
+        }
+    }))
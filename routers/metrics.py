@@ -0,0 +1,28 @@
+from fastapi import APIRouter
+
+from utils.admission import admission_controller
+from utils.response_cache import response_cache
+from utils.single_flight import coalescing_metrics
+
+router = APIRouter()
+
+@router.get("/metrics/admission")
+def get_admission_metrics():
+    """
+    In-flight, queued and rejected request counts per priority class and batch route.
+    """
+    return admission_controller.metrics()
+
+@router.get("/metrics/coalescing")
+def get_coalescing_metrics():
+    """
+    Executed vs. coalesced (shared) computations per coalesced endpoint.
+    """
+    return coalescing_metrics()
+
+@router.get("/metrics/cache")
+def get_cache_metrics():
+    """
+    Response cache entries per endpoint, total bytes and hit/miss counts.
+    """
+    return response_cache.metrics()
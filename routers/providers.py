@@ -1,6 +1,11 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Query, Request
 from pymongo import MongoClient
 from dotenv import load_dotenv
+from utils.provider_index import ProviderIndex, ProviderIndexCache
+from utils.snapshot_serving import serving_snapshot
+from utils.fast_json import dumps, encoded_response
+from utils.response_cache import response_cache
+from utils.single_flight import request_key
 import os
 
 load_dotenv()
@@ -9,10 +14,59 @@ router = APIRouter()
 client = MongoClient(os.getenv("MONGODB_URI"))
 db = client["surgical-analytics"]
 providers_collection = db["providers"]
+meta_collection = db["meta"]
+
+provider_index = ProviderIndexCache(providers_collection, meta_collection)
+_snapshot_index = (None, None)
+
+def snapshot_provider_index(snapshot) -> ProviderIndex:
+    """Prefix index over the serving snapshot's providers, rebuilt when the snapshot is swapped."""
+    global _snapshot_index
+    if _snapshot_index[0] is not snapshot:
+        _snapshot_index = (snapshot, ProviderIndex(snapshot.providers()))
+    return _snapshot_index[1]
+
+def render_provider_list() -> bytes:
+    snapshot = serving_snapshot()
+    if snapshot is not None:
+        return dumps(snapshot.providers())
+    return dumps(provider_index.get().providers)
+
+def providers_version():
+    """Current providers version (None in snapshot mode, where the snapshot path keys the cache)."""
+    if serving_snapshot() is not None:
+        return None
+    provider_index.get()
+    return str(provider_index.version)
+
+def cached_provider_list(refresh: bool = False) -> bytes:
+    # Keyed by the providers version, so create_providers_list.py runs show up
+    key = request_key(version=providers_version())
+    return response_cache.cached("providers", key, render_provider_list, refresh)
+
+def render_provider_search(q: str, limit: int) -> bytes:
+    snapshot = serving_snapshot()
+    if snapshot is not None:
+        return dumps(snapshot_provider_index(snapshot).search(q, limit))
+    return dumps(provider_index.get().search(q, limit))
 
 @router.get("/providers/list")
-def get_providers():
+def get_providers(request: Request):
     """
     Returns a list of all unique primary providers (NPI + name).
     """
-    return list(providers_collection.find({}, {"_id": 0}))
+    return encoded_response(request, cached_provider_list())
+
+@router.get("/providers/search")
+def search_providers(
+    request: Request,
+    q: str = Query(..., min_length=1, example="smi"),
+    limit: int = Query(10, ge=1, le=100)
+):
+    """
+    Typeahead lookup: providers whose name, a name token, or NPI starts with `q`.
+    Served from an in-process prefix index.
+    """
+    q = q.strip().lower()
+    key = request_key(q=q, limit=limit, version=providers_version())
+    return encoded_response(request, response_cache.cached("provider_search", key, lambda: render_provider_search(q, limit)))
@@ -1,11 +1,15 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Query
 from pymongo import MongoClient
 from collections import defaultdict
 from statistics import mean, stdev
 from datetime import datetime
 import os
 
-from utils.time_utils import to_cst, minutes_within_block_window
+from utils import partitions
+from utils.date_dimension import date_dimension
+from utils.job_profiler import JobProfiler
+from utils.profile_pipelines import merge_stamp, room_profile_pipeline
+from utils.time_utils import to_cst, minutes_within_block_window, standard_block_window
 
 router = APIRouter()
 
@@ -14,27 +18,8 @@ db = client["surgical-analytics"]
 cases_collection = db["cases"]
 room_profiles_collection = db["room_profiles"]
 
-# def get_week_of_month(date):
-#     first_day = date.replace(day=1)
-#     return ((date.day + first_day.weekday() - 1) // 7) + 1
-
-def get_week_of_month(date: datetime) -> int:
-    first_day = date.replace(day=1)
-    first_day_dow = first_day.weekday()  # Monday=0
-    offset = date.day + first_day_dow - 1
-    return (offset // 7) + 1
-
-@router.get("/rooms/profiles")
-def generate_room_profiles(start_date: str, end_date: str):
-    start = datetime.fromisoformat(start_date)
-    end = datetime.fromisoformat(end_date)
-
-    print(f"📊 Generating room profiles from {start} to {end}")
-    cases = list(cases_collection.find({
-        "procedureDate": {"$gte": start, "$lte": end}
-    }))
-    print(f"📦 {len(cases)} cases found")
-
+def build_room_profiles(cases, start: datetime) -> list:
+    """Per-room profile documents for `cases` (any iterable of case dicts)."""
     room_profiles = {}
 
     for case in cases:
@@ -51,7 +36,7 @@ def generate_room_profiles(start_date: str, end_date: str):
         if isinstance(procedure_date, dict):
             procedure_date = datetime.fromisoformat(procedure_date["$date"])
 
-        weekday_key = f"{procedure_date.weekday()}-{get_week_of_month(procedure_date)}"
+        weekday_key = date_dimension.dow_wom_key(procedure_date)
 
         if room not in room_profiles:
             room_profiles[room] = {
@@ -73,7 +58,7 @@ def generate_room_profiles(start_date: str, end_date: str):
         # Add utilization time (converted to CST and clipped to 7:00–15:30)
         start_cst = to_cst(start_raw)
         end_cst = to_cst(end_raw)
-        util_minutes = minutes_within_block_window(start_cst, end_cst)
+        util_minutes = minutes_within_block_window(start_cst, end_cst, *standard_block_window(start_cst.date()))
         bucket["utilizationMinutes"] += util_minutes
 
         for proc in case.get("procedures", []):
@@ -129,13 +114,60 @@ def generate_room_profiles(start_date: str, end_date: str):
 
             finalized["usageByDayAndWeek"][key] = usage_entry
 
-        room_profiles_collection.replace_one({"room": finalized["room"], "profileMonth": finalized["profileMonth"]},
-            finalized, upsert=True)
-
-        print(f"✅ Profile saved for room {profile['room']}")
         results.append(finalized)
 
+    return results
+
+@router.get("/rooms/profiles")
+def generate_room_profiles(
+    start_date: str,
+    end_date: str,
+    mode: str = Query("python", pattern="^(python|pushdown)$"),
+    profile: bool = Query(False, description="Write a job profile of this request to JOB_PROFILE_DIR"),
+):
+    start = datetime.fromisoformat(start_date)
+    end = datetime.fromisoformat(end_date)
+
+    # Only on request: profiling traces memory for the whole API process while it runs
+    profiler = JobProfiler(f"room_profiles-{mode}", profile)
+    try:
+        return store_room_profiles(start, end, mode, profiler)
+    finally:
+        profiler.close()
+
+def store_room_profiles(start: datetime, end: datetime, mode: str, profiler: JobProfiler) -> dict:
+    if mode == "pushdown":
+        # Grouped and $merge'd inside Mongo; no case documents reach the API
+        print(f"📊 Generating room profiles from {start} to {end} (pushdown)")
+        room_profiles_collection.create_index([("room", 1), ("profileMonth", 1)], unique=True)
+        merged_at = merge_stamp()
+        with profiler.phase("aggregate"):
+            partitions.aggregate(db, "cases", room_profile_pipeline(start, end, merged_at), start, end, allowDiskUse=True)
+        # $merge reports no count; this run's profiles are the ones carrying its stamp
+        stored = room_profiles_collection.count_documents({"profileMonth": start.strftime("%Y-%m"), "mergedAt": merged_at})
+        print(f"🎯 {stored} room profiles stored for {start.strftime('%Y-%m')}")
+        profiler.finish(profilesCreated=stored)
+        return {"profilesCreated": stored, "mode": mode}
+
+    print(f"📊 Generating room profiles from {start} to {end}")
+    with profiler.phase("fetch"):
+        cases = list(partitions.find(db, "cases", {
+            "procedureDate": {"$gte": start, "$lte": end}
+        }, start, end))
+    print(f"📦 {len(cases)} cases found")
+
+    with profiler.phase("compute"):
+        results = build_room_profiles(cases, start)
+
+    with profiler.phase("write"):
+        for finalized in results:
+            room_profiles_collection.replace_one({"room": finalized["room"], "profileMonth": finalized["profileMonth"]},
+                finalized, upsert=True)
+
+            print(f"✅ Profile saved for room {finalized['room']}")
+
     print(f"🎯 {len(results)} room profiles inserted")
+    profiler.finish(cases=len(cases), profilesCreated=len(results))
     return {"profilesCreated": len(results)}
 
 room_profiles_router = router
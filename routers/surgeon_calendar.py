@@ -0,0 +1,50 @@
+from fastapi import APIRouter, Query, Request
+from pymongo import MongoClient
+from dotenv import load_dotenv
+import calendar
+import os
+
+from utils.fast_json import json_response
+from utils.snapshot_serving import serving_snapshot
+from utils.surgeon_calendar import SURGEON_CALENDAR, surgeon_days_for_calendar_docs
+from utils.utilization_cube import CUBE_MEASURES
+
+load_dotenv()
+
+router = APIRouter()
+client = MongoClient(os.getenv("MONGODB_URI"))
+db = client["surgical-analytics"]
+surgeon_calendar_collection = db[SURGEON_CALENDAR]
+
+def fetch_surgeon_days(npi: str, month: str) -> list:
+    snapshot = serving_snapshot()
+    if snapshot is not None:
+        # Snapshots hold room-day docs only; build the surgeon-days from the month
+        year, month_num = map(int, month.split("-"))
+        end_str = f"{month}-{calendar.monthrange(year, month_num)[1]:02d}"
+        days = surgeon_days_for_calendar_docs(snapshot.calendar_docs(f"{month}-01", end_str), {npi})
+        return sorted(days, key=lambda day: day["date"])
+    return list(surgeon_calendar_collection.find({"npi": npi, "month": month}).sort("date", 1))
+
+@router.get("/surgeons/{npi}/calendar")
+def surgeon_calendar(request: Request, npi: str, month: str = Query(..., examples=["2025-04"], pattern=r"^\d{4}-(0[1-9]|1[0-2])$")):
+    """
+    One surgeon's month across every room and hospital: blocks, cases and
+    utilization per day, from the surgeon_calendar collection.
+    """
+    days = fetch_surgeon_days(npi, month)
+    totals = {measure: sum(day.get(measure, 0) for day in days) for measure in CUBE_MEASURES}
+    block_minutes = totals["blockMinutes"]
+    totals["inRoomUtilization"] = round(totals["usedInRoomMinutes"] / block_minutes, 3) if block_minutes else 0
+    totals["anywhereUtilization"] = round(totals["usedAnywhereMinutes"] / block_minutes, 3) if block_minutes else 0
+    for day in days:
+        for field in ("_id", "npi", "month"):
+            day.pop(field, None)
+
+    return json_response(request, {
+        "npi": npi,
+        "month": month,
+        "providerName": next((day["providerName"] for day in days if day.get("providerName")), None),
+        "totals": totals,
+        "days": days
+    })
@@ -1,10 +1,15 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Query
 from pymongo import MongoClient
 from statistics import mean, stdev
 from collections import defaultdict
 from datetime import datetime
 import os
 
+from utils import partitions
+from utils.date_dimension import date_dimension
+from utils.job_profiler import JobProfiler
+from utils.profile_pipelines import merge_stamp, surgeon_profile_pipeline
+
 router = APIRouter()
 
 client = MongoClient(os.getenv("MONGODB_URI"))
@@ -12,21 +17,8 @@ db = client["surgical-analytics"]
 cases_collection = db["cases"]
 profiles_collection = db["surgeon_profiles"]
 
-def get_week_of_month(date):
-    first_day = date.replace(day=1)
-    return ((date.day + first_day.weekday() - 1) // 7) + 1
-
-@router.get("/surgeons/profiles")
-def generate_profiles(start_date: str, end_date: str):
-    start = datetime.fromisoformat(start_date)
-    end = datetime.fromisoformat(end_date)
-
-    print(f"⏳ Generating profiles from {start} to {end}")
-    cases = list(cases_collection.find({
-        "procedureDate": {"$gte": start, "$lte": end}
-    }))
-    print(f"📦 {len(cases)} cases found in date range")
-
+def build_surgeon_profiles(cases, start: datetime) -> list:
+    """Per-surgeon profile documents for `cases` (any iterable of case dicts)."""
     provider_profiles = {}
 
     for case in cases:
@@ -71,7 +63,7 @@ def generate_profiles(start_date: str, end_date: str):
             provider_profiles[npi]["leadTimeByProcedure"][pid]["durations"].append(duration)
             provider_profiles[npi]["totalProcedureCount"] += 1
 
-            key = f"{procedure_date.weekday()}-{get_week_of_month(procedure_date)}"
+            key = date_dimension.dow_wom_key(procedure_date)
             provider_profiles[npi]["timeUsageByDayAndWeek"][key].append(duration)
 
     print(f"🧠 Profiles gathered for {len(provider_profiles)} surgeons")
@@ -107,16 +99,63 @@ def generate_profiles(start_date: str, end_date: str):
                 }
 
         if stat_profile["leadTimeByProcedure"] or stat_profile["timeUsageByDayAndWeek"]:
+            results.append(stat_profile)
+        else:
+            print(f"⚠️ Skipping profile for {profile['surgeonId']} — no valid stats")
+
+    return results
+
+@router.get("/surgeons/profiles")
+def generate_profiles(
+    start_date: str,
+    end_date: str,
+    mode: str = Query("python", pattern="^(python|pushdown)$"),
+    profile: bool = Query(False, description="Write a job profile of this request to JOB_PROFILE_DIR"),
+):
+    start = datetime.fromisoformat(start_date)
+    end = datetime.fromisoformat(end_date)
+
+    # Only on request: profiling traces memory for the whole API process while it runs
+    profiler = JobProfiler(f"surgeon_profiles-{mode}", profile)
+    try:
+        return store_surgeon_profiles(start, end, mode, profiler)
+    finally:
+        profiler.close()
+
+def store_surgeon_profiles(start: datetime, end: datetime, mode: str, profiler: JobProfiler) -> dict:
+    if mode == "pushdown":
+        # Grouped and $merge'd inside Mongo; no case documents reach the API
+        print(f"⏳ Generating profiles from {start} to {end} (pushdown)")
+        profiles_collection.create_index([("surgeonId", 1), ("profileMonth", 1)], unique=True)
+        merged_at = merge_stamp()
+        with profiler.phase("aggregate"):
+            partitions.aggregate(db, "cases", surgeon_profile_pipeline(start, end, merged_at), start, end, allowDiskUse=True)
+        # $merge reports no count; this run's profiles are the ones carrying its stamp
+        stored = profiles_collection.count_documents({"profileMonth": start.strftime("%Y-%m"), "mergedAt": merged_at})
+        print(f"🎯 {stored} profiles stored for {start.strftime('%Y-%m')}")
+        profiler.finish(profilesCreated=stored)
+        return {"profilesCreated": stored, "mode": mode}
+
+    print(f"⏳ Generating profiles from {start} to {end}")
+    with profiler.phase("fetch"):
+        cases = list(partitions.find(db, "cases", {
+            "procedureDate": {"$gte": start, "$lte": end}
+        }, start, end))
+    print(f"📦 {len(cases)} cases found in date range")
+
+    with profiler.phase("compute"):
+        results = build_surgeon_profiles(cases, start)
+
+    with profiler.phase("write"):
+        for stat_profile in results:
             profiles_collection.replace_one(
             {"surgeonId": stat_profile["surgeonId"], "profileMonth": stat_profile["profileMonth"]},
                 stat_profile, upsert=True)
 
-            print(f"✅ Inserted profile for {profile['surgeonId']}")
-            results.append(stat_profile)
-        else:
-            print(f"⚠️ Skipping profile for {profile['surgeonId']} — no valid stats")
+            print(f"✅ Inserted profile for {stat_profile['surgeonId']}")
 
     print(f"🎯 {len(results)} profiles inserted")
+    profiler.finish(cases=len(cases), profilesCreated=len(results))
     return {"profilesCreated": len(results)}
 
 surgeon_profiles_router = router
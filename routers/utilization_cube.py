@@ -0,0 +1,93 @@
+from fastapi import APIRouter, HTTPException, Query, Request
+from pymongo import MongoClient
+from dotenv import load_dotenv
+from datetime import datetime
+from typing import Optional
+import os
+
+from utils.fast_json import json_response
+from utils.utilization_cube import CUBE_DIMENSIONS, rollup_pipeline, finalize_rollup_row
+
+load_dotenv()
+
+router = APIRouter()
+client = MongoClient(os.getenv("MONGODB_URI"))
+db = client["surgical-analytics"]
+cube_collection = db["utilization_cube"]
+
+def cube_match(hospitalId, unit, room, npi, start_month, end_month) -> dict:
+    match = {}
+    for field, value in (("hospitalId", hospitalId), ("unit", unit), ("room", room), ("npi", npi)):
+        if value:
+            match[field] = value
+    if start_month or end_month:
+        match["month"] = {}
+        if start_month:
+            match["month"]["$gte"] = start_month
+        if end_month:
+            match["month"]["$lte"] = end_month
+    return match
+
+def shift_month(month: str, delta: int) -> str:
+    year, month_num = map(int, month.split("-"))
+    index = year * 12 + (month_num - 1) + delta
+    return f"{index // 12:04d}-{index % 12 + 1:02d}"
+
+@router.get("/utilization/cube")
+def query_utilization_cube(
+    request: Request,
+    groupBy: str = Query("", description=f"Comma-separated subset of {', '.join(CUBE_DIMENSIONS)}"),
+    hospitalId: Optional[str] = None,
+    unit: Optional[str] = None,
+    room: Optional[str] = None,
+    npi: Optional[str] = None,
+    startMonth: Optional[str] = Query(None, example="2025-01"),
+    endMonth: Optional[str] = Query(None, example="2025-12"),
+):
+    """
+    Roll the pre-aggregated utilization cube up along any subset of dimensions.
+    """
+    group_by = [dim.strip() for dim in groupBy.split(",") if dim.strip()]
+    unknown = [dim for dim in group_by if dim not in CUBE_DIMENSIONS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown dimensions: {', '.join(unknown)}")
+
+    match = cube_match(hospitalId, unit, room, npi, startMonth, endMonth)
+    rows = cube_collection.aggregate(rollup_pipeline(match, group_by))
+    return json_response(request, {
+        "groupBy": group_by,
+        "rows": [finalize_rollup_row(row, group_by) for row in rows]
+    })
+
+@router.get("/utilization/cube/heatmap")
+def utilization_heatmap(
+    request: Request,
+    hospitalId: Optional[str] = None,
+    unit: Optional[str] = None,
+    room: Optional[str] = None,
+    npi: Optional[str] = None,
+    endMonth: Optional[str] = Query(None, example="2025-12"),
+    months: int = Query(12, ge=1, le=36),
+    columns: str = Query("dow", pattern="^(dow|wom)$"),
+    measure: str = Query("inRoomUtilization", pattern="^(inRoomUtilization|anywhereUtilization)$"),
+):
+    """
+    Month x day-of-week (or week-of-month) heatmap over the trailing `months`.
+    """
+    end_month = endMonth or datetime.utcnow().strftime("%Y-%m")
+    start_month = shift_month(end_month, -(months - 1))
+    match = cube_match(hospitalId, unit, room, npi, start_month, end_month)
+    rows = [finalize_rollup_row(row, ["month", columns]) for row in cube_collection.aggregate(rollup_pipeline(match, ["month", columns]))]
+
+    month_labels = [shift_month(start_month, i) for i in range(months)]
+    column_labels = list(range(5)) if columns == "dow" else list(range(1, 7))
+    values = {(row["month"], row[columns]): row[measure] for row in rows}
+
+    return json_response(request, {
+        "months": month_labels,
+        "columns": column_labels,
+        "measure": measure,
+        "values": [[values.get((month, col)) for col in column_labels] for month in month_labels]
+    })
+
+utilization_cube_router = router
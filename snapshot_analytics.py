@@ -0,0 +1,55 @@
+import argparse
+import json
+from datetime import datetime
+
+from utils.snapshot import Snapshot
+from utils.case_index import CaseIntervalIndex
+from utils.utilization import compute_doc_utilization
+from utils.fast_json import dumps
+
+# Profile and utilization computations against a columnar snapshot
+# (see export_snapshot.py) instead of the live Mongo instance.
+
+def surgeon_profiles(snapshot, start_str, end_str):
+    from routers.surgeon_profiles import build_surgeon_profiles
+    start = datetime.fromisoformat(start_str)
+    return build_surgeon_profiles(snapshot.cases(start, datetime.fromisoformat(end_str)), start)
+
+def room_profiles(snapshot, start_str, end_str):
+    from routers.room_profiles import build_room_profiles
+    start = datetime.fromisoformat(start_str)
+    return build_room_profiles(snapshot.cases(start, datetime.fromisoformat(end_str)), start)
+
+def block_utilization(snapshot, start_str, end_str):
+    case_index = CaseIntervalIndex.from_cursor(
+        snapshot.cases(datetime.fromisoformat(f"{start_str}T00:00:00"), datetime.fromisoformat(f"{end_str}T23:59:59"))
+    )
+    results = []
+    for doc in snapshot.calendar_docs(start_str, end_str):
+        compute_doc_utilization(doc, case_index)
+        results.append({key: doc.get(key) for key in ("_id", "date", "hospitalId", "unit", "room", "blocks")})
+    return results
+
+JOBS = {
+    "surgeon-profiles": surgeon_profiles,
+    "room-profiles": room_profiles,
+    "block-utilization": block_utilization,
+}
+
+# CLI
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="Run analytics against a columnar snapshot.")
+    arg_parser.add_argument("snapshot_dir")
+    arg_parser.add_argument("job", choices=sorted(JOBS))
+    arg_parser.add_argument("start_date", help="YYYY-MM-DD")
+    arg_parser.add_argument("end_date", help="YYYY-MM-DD")
+    arg_parser.add_argument("--out", help="Write results as JSON here (default: stdout summary only)")
+    args = arg_parser.parse_args()
+
+    results = JOBS[args.job](Snapshot(args.snapshot_dir), args.start_date, args.end_date)
+    if args.out:
+        with open(args.out, "wb") as f:
+            f.write(dumps(results))
+        print(f"✅ {len(results)} {args.job} results written to {args.out}")
+    else:
+        print(json.dumps({"job": args.job, "results": len(results)}))
@@ -1,7 +1,18 @@
+import argparse
+import hashlib
+import hmac
 import json
+import os
 import random
+from collections import deque
+from functools import lru_cache
+from itertools import islice
+from multiprocessing import Pool
+
 from faker import Faker
 
+from utils.json_stream import iter_json_array_raw, JsonArrayWriter
+
 fake = Faker()
 random.seed(42)
 
@@ -24,36 +35,39 @@ def get_or_create(mapping, key, name_func):
         mapping[key] = name_func()
     return mapping[key]
 
-# Load the files
-with open('output_deidentifiedCase.json') as f:
-    cases = json.load(f)
+# Streaming mode: names come from a keyed hash of (field, value) instead of the
+# shared mappings above, so any worker produces the same name for the same value.
+SURROGATE_KEY = os.getenv("SURROGATE_KEY", "surgical-analytics").encode()
 
-with open('output_deidentifiedBlock.json') as f:
-    groups = json.load(f)
+@lru_cache(maxsize=65536)
+def surrogate(field, value, provider):
+    """Deterministic Faker value for `value`, seeded from HMAC-SHA256(field, value)."""
+    digest = hmac.new(SURROGATE_KEY, f"{field}\x1f{value}".encode(), hashlib.sha256).digest()
+    fake.seed_instance(int.from_bytes(digest[:8], "big"))
+    return getattr(fake, provider)()
 
-# Process cases
-for case in cases:
+def name_case(case, name):
     if 'caseNumber' in case:
-        case['caseName'] = get_or_create(name_mappings['caseNumber'], case['caseNumber'], fake.word)
+        case['caseName'] = name('caseNumber', case['caseNumber'], 'word')
     if 'hospitalId' in case:
-        case['hospitalName'] = get_or_create(name_mappings['hospitalId'], case['hospitalId'], fake.company)
+        case['hospitalName'] = name('hospitalId', case['hospitalId'], 'company')
     if 'fin' in case:
-        case['finName'] = get_or_create(name_mappings['fin'], case['fin'], fake.uuid4)
+        case['finName'] = name('fin', case['fin'], 'uuid4')
 
     for proc in case.get('procedures', []):
         if 'procedureName' in proc:
-            proc['procedureLabel'] = get_or_create(name_mappings['procedureName'], proc['procedureName'], fake.bs)
+            proc['procedureLabel'] = name('procedureName', proc['procedureName'], 'bs')
         if 'primaryNpi' in proc:
-            proc['providerName'] = get_or_create(name_mappings['primaryNpi'], proc['primaryNpi'], fake.name)
+            proc['providerName'] = name('primaryNpi', proc['primaryNpi'], 'name')
+    return case
 
-# Process groups
-for group in groups:
+def name_group(group, name):
     if 'market' in group:
-        group['marketName'] = get_or_create(name_mappings['market'], group['market'], fake.city)
+        group['marketName'] = name('market', group['market'], 'city')
     if 'ministry' in group:
-        group['ministryName'] = get_or_create(name_mappings['ministry'], group['ministry'], fake.company)
+        group['ministryName'] = name('ministry', group['ministry'], 'company')
     if 'speciality' in group:
-        group['specialityName'] = get_or_create(name_mappings['speciality'], group['speciality'], fake.job)
+        group['specialityName'] = name('speciality', group['speciality'], 'job')
 
     if 'owner' in group:
         for owner in group['owner']:
@@ -61,15 +75,106 @@ for group in groups:
                 owner['providerNames'] = []
                 owner['npiNameMap'] = []
                 for npi in owner['npis']:
-                    name = get_or_create(name_mappings['primaryNpi'], npi, fake.name)
-                    owner['providerNames'].append(name)
-                    owner['npiNameMap'].append({ "npi": npi, "providerName": name })
+                    provider_name = name('primaryNpi', npi, 'name')
+                    owner['providerNames'].append(provider_name)
+                    owner['npiNameMap'].append({ "npi": npi, "providerName": provider_name })
+    return group
+
+def legacy_name(field, value, provider):
+    return get_or_create(name_mappings[field], value, getattr(fake, provider))
+
+def run_in_memory():
+    # Load the files
+    with open('output_deidentifiedCase.json') as f:
+        cases = json.load(f)
+
+    with open('output_deidentifiedBlock.json') as f:
+        groups = json.load(f)
+
+    for case in cases:
+        name_case(case, legacy_name)
+    for group in groups:
+        name_group(group, legacy_name)
+
+    # Save outputs
+    with open('cases_named.json', 'w') as f:
+        json.dump(cases, f, indent=2)
+
+    with open('groups_named.json', 'w') as f:
+        json.dump(groups, f, indent=2)
+
+    print("✓ Surrogate names added and saved to cases_named.json and groups_named.json.")
+
+# Worker entry points: parse a chunk of raw elements, name them and hand back
+# serialised elements, so decoding and encoding both run in the workers
+def process_case_chunk(chunk):
+    return [json.dumps(name_case(json.loads(text), surrogate)) for text in chunk]
+
+def process_group_chunk(chunk):
+    return [json.dumps(name_group(json.loads(text), surrogate)) for text in chunk]
+
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+def bounded_imap(pool, worker, chunks, max_in_flight):
+    """
+    Like pool.imap, but at most `max_in_flight` chunks are read ahead of the
+    writer: imap would drain the input and queue every result in memory
+    when writing falls behind.
+    """
+    pending = deque()
+    for chunk in chunks:
+        if len(pending) >= max_in_flight:
+            yield pending.popleft().get()
+        pending.append(pool.apply_async(worker, (chunk,)))
+    while pending:
+        yield pending.popleft().get()
+
+def stream_file(src, dest, worker, pool, chunk_size, max_in_flight=1):
+    """
+    Stream `src` through `worker` in chunks of raw element text (the parent
+    only splits the array); output stays in input order and at most
+    `max_in_flight` chunks are held at once.
+    """
+    with open(src) as f_in, open(dest, 'w') as f_out, JsonArrayWriter(f_out) as writer:
+        chunks = chunked(iter_json_array_raw(f_in), chunk_size)
+        results = bounded_imap(pool, worker, chunks, max_in_flight) if pool else map(worker, chunks)
+        for serialised in results:
+            for text in serialised:
+                writer.write_raw(text)
+    print(f"✓ {writer.count} records written to {dest}")
 
-# Save outputs
-with open('cases_named.json', 'w') as f:
-    json.dump(cases, f, indent=2)
+def run_streaming(workers, chunk_size):
+    jobs = [
+        ('output_deidentifiedCase.json', 'cases_named.json', process_case_chunk),
+        ('output_deidentifiedBlock.json', 'groups_named.json', process_group_chunk),
+    ]
+    if workers > 1:
+        with Pool(workers) as pool:
+            for src, dest, worker in jobs:
+                # Two chunks per worker keep them busy while the writer catches up
+                stream_file(src, dest, worker, pool, chunk_size, 2 * workers)
+    else:
+        for src, dest, worker in jobs:
+            stream_file(src, dest, worker, None, chunk_size)
 
-with open('groups_named.json', 'w') as f:
-    json.dump(groups, f, indent=2)
+# CLI
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="Add surrogate names to de-identified case and block exports.")
+    arg_parser.add_argument("--stream", action="store_true",
+                            help="Parse and write incrementally with hash-derived names (constant memory)")
+    arg_parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                            help="Worker processes for --stream")
+    arg_parser.add_argument("--chunk-size", type=int, default=500,
+                            help="Records per worker task for --stream")
+    args = arg_parser.parse_args()
 
-print("✓ Surrogate names added and saved to cases_named.json and groups_named.json.")
+    if args.stream:
+        run_streaming(args.workers, args.chunk_size)
+    else:
+        run_in_memory()
@@ -0,0 +1,88 @@
+import random
+from datetime import date
+
+from utils.availability import AvailabilityEngine, RoomDay, subtract_spans, union_spans
+from utils.interval_tree import IntervalTree
+
+def at(hhmm: str, date_str: str = "2025-04-01") -> str:
+    # April is CDT: -05:00 is Central local time
+    return f"{date_str}T{hhmm}:00-05:00"
+
+def test_overlapping_matches_brute_force():
+    rng = random.Random(11)
+    for _ in range(50):
+        intervals = []
+        for i in range(rng.randint(0, 60)):
+            start = rng.randint(0, 1400)
+            intervals.append((start, start + rng.randint(0, 120), i))
+        tree = IntervalTree(intervals)
+        for _ in range(20):
+            start = rng.randint(0, 1440)
+            end = start + rng.randint(1, 200)
+            expected = sorted(iv for iv in intervals if iv[0] < end and iv[1] > start and iv[1] > iv[0])
+            assert sorted(tree.overlapping(start, end)) == expected
+            assert tree.overlaps(start, end) == bool(expected)
+
+def test_intervals_are_half_open_and_empty_ones_dropped():
+    tree = IntervalTree([(60, 120, "a"), (120, 180, "b"), (200, 200, "empty")])
+    assert len(tree) == 2
+    assert [iv[2] for iv in tree.overlapping(120, 121)] == ["b"]
+    assert tree.overlapping(180, 200) == []
+
+def test_covered_merges_and_clips():
+    tree = IntervalTree([(60, 120, "a"), (100, 150, "b"), (150, 160, "c"), (300, 400, "d")])
+    assert tree.covered(0, 1440) == [(60, 160), (300, 400)]
+    assert tree.covered(110, 350) == [(110, 160), (300, 350)]
+    assert IntervalTree().covered(0, 1440) == []
+
+def test_subtract_spans():
+    assert subtract_spans([(0, 100)], []) == [(0, 100)]
+    assert subtract_spans([(0, 100)], [(20, 30), (50, 60)]) == [(0, 20), (30, 50), (60, 100)]
+    assert subtract_spans([(0, 100), (200, 300)], [(90, 210)]) == [(0, 90), (210, 300)]
+    assert subtract_spans([(10, 20)], [(0, 50)]) == []
+
+def test_union_spans():
+    assert union_spans([(0, 10), (20, 30)], [(5, 25)]) == [(0, 30)]
+    assert union_spans([(0, 10)], [(10, 20)]) == [(0, 20)]
+    assert union_spans([(30, 40)], [], [(0, 5)]) == [(0, 5), (30, 40)]
+
+def doc(room, blocks=(), procedures=(), date_str="2025-04-01"):
+    return {"date": date_str, "room": room, "blocks": list(blocks), "procedures": list(procedures)}
+
+def test_allowed_spans_by_ownership():
+    room_day = RoomDay.from_doc(doc("OR1", [
+        {"npi": "N1", "startTime": at("07:00"), "endTime": at("11:00")},
+        {"npi": "N2", "startTime": at("11:00"), "endTime": at("13:00")},
+        {"npi": "N3", "startTime": at("13:00"), "endTime": at("14:00"), "inactive": True},
+    ]))
+    assert room_day.allowed_spans("N1", "own") == [(420, 660)]
+    assert room_day.allowed_spans("N1", "open") == [(420, 660), (780, 930)]
+    assert room_day.allowed_spans("N2", "open") == [(660, 930)]
+    assert room_day.allowed_spans("N1", "any") == [(420, 660), (780, 930)]
+
+def engine_for(docs):
+    return AvailabilityEngine(lambda start, end, hospitalId, unit: docs)
+
+def test_check_reports_every_reason():
+    engine = engine_for([
+        doc("OR1", [{"npi": "N2", "startTime": at("07:00"), "endTime": at("12:00")}],
+            [{"primaryNpi": "N2", "startTime": at("08:00"), "endTime": at("09:00")}]),
+        doc("OR2", procedures=[{"primaryNpi": "N1", "startTime": at("08:30"), "endTime": at("09:30")}]),
+    ])
+    result = engine.check("H1", "U1", "N1", "2025-04-01", "OR1", 8 * 60, 60)
+    assert result["feasible"] is False
+    assert sorted(reason["reason"] for reason in result["reasons"]) == ["blockedByOther", "roomBusy", "surgeonBusy"]
+
+    assert engine.check("H1", "U1", "N1", "2025-04-01", "OR2", 10 * 60, 60)["feasible"] is True
+
+def test_free_slots_skip_busy_time_and_weekends():
+    engine = engine_for([
+        doc("OR1", [{"npi": "N1", "startTime": at("07:00"), "endTime": at("11:00")}],
+            [{"primaryNpi": "N1", "startTime": at("08:00"), "endTime": at("10:00")}]),
+    ])
+    slots = engine.free_slots("H1", "U1", "N1", date(2025, 4, 1), date(2025, 4, 1), 60, rooms=["OR1"])
+    assert [(slot["start"], slot["end"], slot["inOwnBlock"]) for slot in slots] == [
+        ("07:00", "08:00", True), ("10:00", "15:30", False),
+    ]
+    # 2025-04-05 is a Saturday
+    assert engine.free_slots("H1", "U1", "N1", date(2025, 4, 5), date(2025, 4, 5), 60, rooms=["OR1"]) == []
@@ -0,0 +1,118 @@
+import random
+from itertools import combinations
+
+from utils.conflicts import (
+    CASE_OUTSIDE_BLOCK, ROOM_OVERLAP, SURGEON_DOUBLE_BOOKED, blocks_overlap, find_conflicts, parse_dt,
+)
+
+DATE = "2025-04-01"
+
+def at(hhmm: str, date_str: str = DATE) -> str:
+    return f"{date_str}T{hhmm}:00-05:00"
+
+def block(block_id, npi, start, end, **extra):
+    return {"blockId": block_id, "npi": npi, "startTime": at(start), "endTime": at(end), **extra}
+
+def room_day(doc_id, room, blocks=(), procedures=(), date_str=DATE):
+    return {"_id": doc_id, "date": date_str, "room": room, "blocks": list(blocks), "procedures": list(procedures)}
+
+def of_type(result, conflict_type):
+    return [c for c in result["conflicts"] if c["type"] == conflict_type]
+
+def test_same_room_overlap_is_flagged_on_both_docs_of_the_room():
+    result = find_conflicts([
+        room_day("a", "OR1", [block("b1", "N1", "07:00", "11:00"), block("b2", "N2", "10:00", "15:00")]),
+    ])
+    overlaps = of_type(result, ROOM_OVERLAP)
+    assert len(overlaps) == 1
+    assert overlaps[0]["minutes"] == 60
+    assert sorted(overlaps[0]["blockIds"]) == ["b1", "b2"]
+    assert result["flags"]["a"]["hasBlockOverlap"] is True
+    assert result["flags"]["a"]["hasMultipleBlocks"] is True
+    assert result["summary"]["roomsWithOverlap"] == {"OR1": [DATE]}
+
+def test_back_to_back_blocks_do_not_overlap():
+    blocks = [block("b1", "N1", "07:00", "11:00"), block("b2", "N1", "11:00", "15:00")]
+    result = find_conflicts([room_day("a", "OR1", blocks)])
+    assert result["conflicts"] == []
+    assert result["flags"]["a"]["hasBlockOverlap"] is False
+    assert not blocks_overlap(blocks)
+
+def test_surgeon_in_two_rooms_at_once_is_double_booked():
+    result = find_conflicts([
+        room_day("a", "OR1", [block("b1", "N1", "07:00", "12:00")]),
+        room_day("b", "OR2", [block("b2", "N1", "11:30", "15:00")]),
+    ])
+    double = of_type(result, SURGEON_DOUBLE_BOOKED)
+    assert len(double) == 1
+    assert double[0]["npi"] == "N1"
+    assert sorted(double[0]["rooms"]) == ["OR1", "OR2"]
+    assert double[0]["minutes"] == 30
+    assert result["flags"]["a"]["hasSurgeonDoubleBooking"] and result["flags"]["b"]["hasSurgeonDoubleBooking"]
+    assert of_type(result, ROOM_OVERLAP) == []
+
+def test_inactive_blocks_are_not_double_booked():
+    result = find_conflicts([
+        room_day("a", "OR1", [block("b1", "N1", "07:00", "12:00")]),
+        room_day("b", "OR2", [block("b2", "N1", "08:00", "10:00", inactive=True)]),
+    ])
+    assert of_type(result, SURGEON_DOUBLE_BOOKED) == []
+
+def test_different_days_never_conflict():
+    result = find_conflicts([
+        room_day("a", "OR1", [block("b1", "N1", "07:00", "12:00")]),
+        room_day("b", "OR1", [{**block("b2", "N2", "07:00", "12:00"),
+                              "startTime": at("07:00", "2025-04-02"), "endTime": at("12:00", "2025-04-02")}],
+                 date_str="2025-04-02"),
+    ])
+    assert result["conflicts"] == []
+
+def test_case_running_past_its_surgeons_block():
+    procedure = {"primaryNpi": "N1", "startTime": parse_dt(at("10:30")), "endTime": parse_dt(at("12:15"))}
+    result = find_conflicts([
+        room_day("a", "OR1", [block("b1", "N1", "07:00", "11:00"), block("b2", "N1", "11:00", "12:00")], [procedure]),
+    ])
+    outside = of_type(result, CASE_OUTSIDE_BLOCK)
+    assert len(outside) == 1
+    assert outside[0]["minutes"] == 15  # the two blocks merge into 07:00–12:00
+    assert result["flags"]["a"]["hasCaseOutsideBlock"] is True
+    assert result["summary"]["roomsWithCaseOutsideBlock"] == {"OR1": [DATE]}
+
+def test_cases_of_surgeons_without_a_block_in_the_room_are_ignored():
+    procedure = {"primaryNpi": "N9", "startTime": at("06:00"), "endTime": at("16:00")}
+    result = find_conflicts([room_day("a", "OR1", [block("b1", "N1", "07:00", "11:00")], [procedure])])
+    assert of_type(result, CASE_OUTSIDE_BLOCK) == []
+
+def test_sweep_matches_pairwise_comparison():
+    rng = random.Random(7)
+    docs = []
+    for doc_index in range(40):
+        date_str = f"2025-04-{rng.randint(1, 3):02d}"
+        blocks = []
+        for block_index in range(rng.randint(0, 3)):
+            start = rng.randint(7 * 4, 14 * 4) * 15
+            end = start + rng.randint(1, 12) * 15
+            blocks.append({
+                "blockId": f"b{doc_index}-{block_index}",
+                "npi": rng.choice(["N1", "N2", "N3"]),
+                "startTime": at(f"{start // 60:02d}:{start % 60:02d}", date_str),
+                "endTime": at(f"{end // 60:02d}:{end % 60:02d}", date_str),
+                "inactive": rng.random() < 0.2,
+            })
+        docs.append(room_day(f"d{doc_index}", rng.choice(["OR1", "OR2", "OR3"]), blocks, date_str=date_str))
+
+    expected_room, expected_double = 0, 0
+    entries = [(doc, blk) for doc in docs for blk in doc["blocks"]]
+    for (doc_a, a), (doc_b, b) in combinations(entries, 2):
+        if doc_a["date"] != doc_b["date"]:
+            continue
+        if not (parse_dt(a["startTime"]) < parse_dt(b["endTime"]) and parse_dt(b["startTime"]) < parse_dt(a["endTime"])):
+            continue
+        if doc_a["room"] == doc_b["room"]:
+            expected_room += 1
+        elif a["npi"] == b["npi"] and not a["inactive"] and not b["inactive"]:
+            expected_double += 1
+
+    result = find_conflicts(docs)
+    assert len(of_type(result, ROOM_OVERLAP)) == expected_room
+    assert len(of_type(result, SURGEON_DOUBLE_BOOKED)) == expected_double
@@ -0,0 +1,93 @@
+import zlib
+
+import pytest
+
+from utils.shared_cache import SEQUENCE, SLOT, SharedStore, _key_hash
+from utils.single_flight import request_key
+
+def key(month="2025-04", hospitalId="H1", unit="U1"):
+    # (snapshot source, request key), as ResponseCache builds it
+    return None, request_key(month=month, hospitalId=hospitalId, unit=unit)
+
+@pytest.fixture
+def store(tmp_path):
+    return SharedStore(str(tmp_path / "cache"), capacity=4096, slots=64)
+
+def fill(store, name, cache_key, body):
+    assert store.put(name, cache_key, body, store.token(name, cache_key))
+
+def slot_position(store, name, cache_key):
+    key_hash = _key_hash(name, cache_key)
+    for index in store._probe(key_hash):
+        position = store.index_start + index * SLOT.size
+        if SLOT.unpack_from(store.map, position)[1] == key_hash:
+            return position
+    raise AssertionError("entry not found")
+
+def test_round_trip_and_ttl(store):
+    fill(store, "calendar_view", key(), b'{"days":[]}')
+    assert store.get("calendar_view", key(), ttl=60) == b'{"days":[]}'
+    assert store.get("calendar_view", key(), ttl=0) is None
+    assert store.get("calendar_qa", key(), ttl=60) is None
+
+def test_entries_are_shared_between_processes_opening_the_file(store):
+    fill(store, "calendar_view", key(), b"shared")
+    other = SharedStore(store.path)
+    assert other.get("calendar_view", key(), ttl=60) == b"shared"
+
+def test_scoped_invalidation_only_drops_that_unit_month(store):
+    fill(store, "calendar_view", key(unit="U1"), b"u1")
+    fill(store, "calendar_view", key(unit="U2"), b"u2")
+    store.invalidate("calendar_view", month="2025-04", hospitalId="H1", unit="U1")
+    assert store.get("calendar_view", key(unit="U1"), ttl=60) is None
+    assert store.get("calendar_view", key(unit="U2"), ttl=60) == b"u2"
+
+def test_fill_that_raced_an_invalidation_is_not_stored(store):
+    token = store.token("calendar_view", key())
+    store.invalidate("calendar_view")
+    assert store.put("calendar_view", key(), b"stale", token) is False
+    assert store.get("calendar_view", key(), ttl=60) is None
+
+def test_full_data_area_starts_over(store):
+    fill(store, "calendar_view", key(unit="U1"), b"x" * 3000)
+    fill(store, "calendar_view", key(unit="U2"), b"y" * 3000)
+    assert store.get("calendar_view", key(unit="U1"), ttl=60) is None
+    assert store.get("calendar_view", key(unit="U2"), ttl=60) == b"y" * 3000
+    assert store.metrics()["resets"] == 1
+
+def test_slot_being_written_is_a_miss(store):
+    fill(store, "calendar_view", key(), b"body")
+    position = slot_position(store, "calendar_view", key())
+    sequence = SEQUENCE.unpack_from(store.map, position)[0]
+    assert sequence % 2 == 0
+    SEQUENCE.pack_into(store.map, position, sequence + 1)
+    assert store.get("calendar_view", key(), ttl=60) is None
+    SEQUENCE.pack_into(store.map, position, sequence + 2)
+    assert store.get("calendar_view", key(), ttl=60) == b"body"
+
+def test_corrupted_body_fails_the_crc(store):
+    fill(store, "calendar_view", key(), b"body")
+    offset = SLOT.unpack_from(store.map, slot_position(store, "calendar_view", key()))[2]
+    store.map[store.data_start + offset] ^= 0xFF
+    assert store.get("calendar_view", key(), ttl=60) is None
+
+def test_slot_pointing_at_another_keys_body_is_rejected(store):
+    # The crc covers the key hash too, not only the body
+    fill(store, "calendar_view", key(unit="U1"), b"same")
+    slot = list(SLOT.unpack_from(store.map, slot_position(store, "calendar_view", key(unit="U1"))))
+    other_hash = _key_hash("calendar_view", key(unit="U2"))
+    other_position = store.index_start + store._probe(other_hash)[0] * SLOT.size
+    slot[1] = other_hash
+    SLOT.pack_into(store.map, other_position, *slot)
+    assert store.get("calendar_view", key(unit="U2"), ttl=60) is None
+
+    slot[4] = zlib.crc32(other_hash + b"same")
+    SLOT.pack_into(store.map, other_position, *slot)
+    assert store.get("calendar_view", key(unit="U2"), ttl=60) == b"same"
+
+def test_invalidate_everything(store):
+    fill(store, "calendar_view", key(), b"a")
+    fill(store, "calendar_qa", key(), b"b")
+    store.invalidate()
+    assert store.get("calendar_view", key(), ttl=60) is None
+    assert store.get("calendar_qa", key(), ttl=60) is None
@@ -2,43 +2,33 @@ from datetime import datetime, timedelta
 from pymongo import MongoClient
 from dotenv import load_dotenv
 import os
+import sys
+
+from utils.conflicts import blocks_overlap, refresh_conflicts
+from utils.content_hash import stable_hash
+from utils.date_dimension import date_dimension, weeks_mask
+from utils.job_profiler import job_profiler
+from utils.surgeon_calendar import sync_surgeon_calendar
+from utils.warmup import notify_warmup
 
 load_dotenv()
 
+profiler = job_profiler("update_calendar_with_blocks", sys.argv)
+
 client = MongoClient(os.getenv("MONGODB_URI"))
 db = client["surgical-analytics"]
 calendar_collection = db["calendar"]
 block_collection = db["block"]
 
-def get_week_of_month(date: datetime) -> int:
-    first_day = date.replace(day=1)
-    adjusted_dom = date.day + first_day.weekday()
-    return ((adjusted_dom - 1) // 7) + 1
-
-def has_overlap(blocks):
-    def parse_time(t): return datetime.strptime(t, "%Y-%m-%dT%H:%M:%S-05:00")
-    sorted_blocks = sorted(blocks, key=lambda b: parse_time(b["startTime"]))
-    for i in range(len(sorted_blocks) - 1):
-        end_current = parse_time(sorted_blocks[i]["endTime"])
-        start_next = parse_time(sorted_blocks[i + 1]["startTime"])
-        if start_next < end_current:
-            return True
-    return False
-
 april_start = datetime(2025, 4, 1)
 april_end = datetime(2025, 5, 31)
 
-calendar_docs = list(calendar_collection.find({
-    "date": {"$gte": april_start.strftime("%Y-%m-%d"), "$lte": april_end.strftime("%Y-%m-%d")}
-}))
-
-blocks = list(block_collection.find({"type": "Surgeon"}))
-
-for doc in calendar_docs:
+def blocks_for_doc(doc, blocks):
+    """Block entries of the surgeon blocks that fall on this calendar doc's room-day."""
     date_str = doc["date"]
     date_obj = datetime.strptime(date_str, "%Y-%m-%d")
-    dow = date_obj.weekday()
-    wom = get_week_of_month(date_obj)
+    dow = date_dimension.weekday(date_str)
+    wom = date_dimension.week_of_month(date_str)
     unit = doc.get("unit")
     room = doc.get("room")
 
@@ -64,7 +54,7 @@ for doc in calendar_docs:
         for freq in block.get("frequencies", []):
             if freq.get("dowApplied") != dow:
                 continue
-            if wom not in freq.get("weeksOfMonth", []):
+            if not date_dimension.matches_weeks(date_str, weeks_mask(freq.get("weeksOfMonth"))):
                 continue
             if not (freq["blockStartDate"].date() <= date_obj.date() <= freq["blockEndDate"].date()):
                 continue
@@ -94,30 +84,60 @@ for doc in calendar_docs:
             print(f"✅ Adding block for {providerName} on {date_str} with duration {duration} mins")
             matching_blocks.append(block_entry)
 
-    if matching_blocks:
-        calendar_collection.update_one(
-            {"_id": doc["_id"]},
-            {"$unset": {
-                "blocks": "",
-                "hasMultipleBlocks": "",
-                "hasBlockOverlap": ""
-            }}
-        )
-        calendar_collection.update_one(
-            {"_id": doc["_id"]},
-            {"$push": {"blocks": {"$each": matching_blocks}}}
-        )
-
-        flags = {}
+    return matching_blocks
+
+with profiler.phase("fetch"):
+    calendar_docs = list(calendar_collection.find({
+        "date": {"$gte": april_start.strftime("%Y-%m-%d"), "$lte": april_end.strftime("%Y-%m-%d")}
+    }))
+
+    blocks = list(block_collection.find({"type": "Surgeon"}))
+
+with profiler.phase("compute"):
+    updates = []
+    updated_dates = set()
+    unit_months = set()
+    unchanged = 0
+    for doc in calendar_docs:
+        matching_blocks = blocks_for_doc(doc, blocks)
+        if not matching_blocks:
+            continue
+
+        flags = {"hasMultipleBlocks": False, "hasBlockOverlap": False}
         if len(matching_blocks) > 1:
             flags["hasMultipleBlocks"] = True
-            if has_overlap(matching_blocks):
+            if blocks_overlap(matching_blocks):
                 flags["hasBlockOverlap"] = True
 
-        if flags:
-            calendar_collection.update_one(
-                {"_id": doc["_id"]},
-                {"$set": flags}
-            )
-
-print("✅ Finished updating calendar documents with block data including duration.")
+        # Same schedule as the last run: keep the stored blocks (and their
+        # utilization and inactive flags) instead of rewriting them
+        schedule_hash = stable_hash({"blocks": matching_blocks, "flags": flags})
+        if doc.get("blockScheduleHash") == schedule_hash:
+            unchanged += 1
+            continue
+        updates.append((doc["_id"], matching_blocks, flags, schedule_hash))
+        updated_dates.add(doc["date"])
+        if doc.get("hospitalId") and doc.get("unit"):
+            unit_months.add((doc["hospitalId"], doc["unit"], doc["date"][:7]))
+
+with profiler.phase("write"):
+    for doc_id, matching_blocks, flags, schedule_hash in updates:
+        update = {"$set": {
+            "blocks": matching_blocks,
+            "blockScheduleHash": schedule_hash,
+            **{flag: True for flag, value in flags.items() if value}
+        }}
+        cleared = {flag: "" for flag, value in flags.items() if not value}
+        if cleared:
+            update["$unset"] = cleared
+        calendar_collection.update_one({"_id": doc_id}, update)
+    surgeon_days = sync_surgeon_calendar(db, updated_dates)
+
+    # Stored QA summaries and conflicts of the rewritten unit-months
+    for hospitalId, unit, month in sorted(unit_months):
+        refresh_conflicts(db, hospitalId, unit, month)
+
+print(f"✅ Finished updating calendar documents with block data including duration: "
+      f"{len(updates)} written, {unchanged} unchanged (skipped); {surgeon_days} surgeon-days synced.")
+profiler.finish(calendarDocs=len(calendar_docs), written=len(updates), skipped=unchanged, surgeonDays=surgeon_days)
+notify_warmup()
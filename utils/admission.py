@@ -0,0 +1,206 @@
+import asyncio
+import os
+import time
+from dataclasses import dataclass
+
+from utils.fast_json import dumps
+
+# Admission control: requests are classed as interactive dashboard reads or
+# batch generation. Each class (and each heavy route) has its own concurrency
+# limit and a bounded wait queue, so a wide profile/utilization run can never
+# take the threads and Mongo connections the calendar views need.
+
+INTERACTIVE = "interactive"
+BATCH = "batch"
+
+# Routes that run generation jobs; everything else is interactive
+BATCH_ROUTES = ("/surgeons/profiles", "/rooms/profiles", "/blocks/utilization")
+# Never queued
+EXEMPT_ROUTES = ("/ping", "/datasource", "/ready", "/metrics", "/docs", "/openapi.json")
+
+def _env_int(name, default):
+    return int(os.getenv(name, default))
+
+def _env_float(name, default):
+    return float(os.getenv(name, default))
+
+@dataclass
+class AdmissionClass:
+    name: str
+    limit: int
+    max_queue: int
+    max_wait: float
+    reject_status: int
+    retry_after: int
+    semaphore: asyncio.Semaphore = None
+    in_flight: int = 0
+    queued: int = 0
+    admitted: int = 0
+    rejected: int = 0
+    wait_seconds: float = 0.0
+    max_queued: int = 0
+
+    def __post_init__(self):
+        self.semaphore = asyncio.Semaphore(self.limit)
+
+    def metrics(self) -> dict:
+        return {
+            "limit": self.limit,
+            "inFlight": self.in_flight,
+            "queued": self.queued,
+            "maxQueued": self.max_queued,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "avgWaitMs": round(self.wait_seconds / self.admitted * 1000, 2) if self.admitted else 0.0,
+        }
+
+class Rejected(Exception):
+    def __init__(self, admission_class: AdmissionClass, reason: str):
+        self.admission_class = admission_class
+        self.reason = reason
+
+class AdmissionController:
+    def __init__(self):
+        self.classes = {
+            INTERACTIVE: AdmissionClass(
+                INTERACTIVE,
+                limit=_env_int("ADMISSION_INTERACTIVE_LIMIT", 32),
+                max_queue=_env_int("ADMISSION_INTERACTIVE_QUEUE", 200),
+                max_wait=_env_float("ADMISSION_INTERACTIVE_WAIT", 2.0),
+                reject_status=503,
+                retry_after=1,
+            ),
+            BATCH: AdmissionClass(
+                BATCH,
+                limit=_env_int("ADMISSION_BATCH_LIMIT", 2),
+                max_queue=_env_int("ADMISSION_BATCH_QUEUE", 4),
+                max_wait=_env_float("ADMISSION_BATCH_WAIT", 10.0),
+                reject_status=429,
+                retry_after=30,
+            ),
+        }
+        # Per-route limits inside the class limit (one wide run per generator)
+        route_limit = _env_int("ADMISSION_BATCH_ROUTE_LIMIT", 1)
+        self.routes = {
+            path: AdmissionClass(path, limit=route_limit, max_queue=self.classes[BATCH].max_queue,
+                                 max_wait=self.classes[BATCH].max_wait, reject_status=429, retry_after=30)
+            for path in BATCH_ROUTES
+        }
+
+    def classify(self, path: str):
+        if path.startswith(EXEMPT_ROUTES):
+            return None
+        if path.startswith(BATCH_ROUTES):
+            return BATCH
+        return INTERACTIVE
+
+    async def _acquire(self, gate: AdmissionClass, deadline: float):
+        if gate.queued >= gate.max_queue:
+            gate.rejected += 1
+            raise Rejected(gate, "queue full")
+        gate.queued += 1
+        gate.max_queued = max(gate.max_queued, gate.queued)
+        started = time.monotonic()
+        # Not asyncio.wait_for: before Python 3.12 it can drop a permit acquired
+        # just as the timeout or a client disconnect cancels the wait
+        acquire = asyncio.ensure_future(gate.semaphore.acquire())
+        try:
+            await asyncio.wait({acquire}, timeout=max(0.0, deadline - started))
+        except BaseException:
+            self._abandon(gate, acquire)
+            raise
+        finally:
+            gate.queued -= 1
+        if not acquire.done():
+            self._abandon(gate, acquire)
+            gate.rejected += 1
+            raise Rejected(gate, "wait timeout")
+        gate.in_flight += 1
+        gate.admitted += 1
+        gate.wait_seconds += time.monotonic() - started
+
+    def _abandon(self, gate: AdmissionClass, acquire):
+        """Drop a pending acquire, giving the permit back if it was granted meanwhile."""
+        if not acquire.done():
+            acquire.cancel()
+        elif not acquire.cancelled() and acquire.exception() is None:
+            gate.semaphore.release()
+
+    def _release(self, gate: AdmissionClass):
+        gate.in_flight -= 1
+        gate.semaphore.release()
+
+    async def admit(self, path: str):
+        """Acquire the route and class slots for `path`; returns the gates to release."""
+        class_name = self.classify(path)
+        if class_name is None:
+            return []
+        admission_class = self.classes[class_name]
+        deadline = time.monotonic() + admission_class.max_wait
+        gates = []
+        route_gate = next((gate for route, gate in self.routes.items() if path.startswith(route)), None)
+        try:
+            if route_gate is not None:
+                await self._acquire(route_gate, deadline)
+                gates.append(route_gate)
+            await self._acquire(admission_class, deadline)
+            gates.append(admission_class)
+        except Rejected as rejected:
+            # Report against the request's class so clients see its status and Retry-After
+            for gate in gates:
+                self._release(gate)
+            if rejected.admission_class is not admission_class:
+                admission_class.rejected += 1
+            raise Rejected(admission_class, rejected.reason)
+        except BaseException:
+            # Cancelled (client gone) while waiting for the class slot
+            for gate in gates:
+                self._release(gate)
+            raise
+        return gates
+
+    def release(self, gates):
+        for gate in reversed(gates):
+            self._release(gate)
+
+    def metrics(self) -> dict:
+        return {
+            "classes": {name: gate.metrics() for name, gate in self.classes.items()},
+            "routes": {path: gate.metrics() for path, gate in self.routes.items()},
+        }
+
+class AdmissionMiddleware:
+    """ASGI middleware applying AdmissionController to every HTTP request."""
+
+    def __init__(self, app, controller: AdmissionController):
+        self.app = app
+        self.controller = controller
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope.get("method") == "OPTIONS":
+            await self.app(scope, receive, send)
+            return
+
+        try:
+            gates = await self.controller.admit(scope["path"])
+        except Rejected as rejected:
+            gate = rejected.admission_class
+            body = dumps({"detail": f"Server busy ({gate.name} {rejected.reason}); retry later"})
+            await send({
+                "type": "http.response.start",
+                "status": gate.reject_status,
+                "headers": [
+                    (b"content-type", b"application/json"),
+                    (b"content-length", str(len(body)).encode()),
+                    (b"retry-after", str(gate.retry_after).encode()),
+                ],
+            })
+            await send({"type": "http.response.body", "body": body})
+            return
+
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.controller.release(gates)
+
+admission_controller = AdmissionController()
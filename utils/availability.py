@@ -0,0 +1,267 @@
+import calendar
+import os
+import threading
+import time
+import weakref
+from collections import defaultdict
+from datetime import date, timedelta
+
+from utils.date_dimension import date_dimension
+from utils.interval_tree import IntervalTree
+from utils.time_utils import to_cst_safe
+
+# Free-slot and feasibility queries over a unit's calendar. Each room-day
+# keeps interval trees (minutes of day, CST) of its cases and active blocks;
+# each surgeon-day keeps a tree of their cases in any room of the unit.
+# Months are loaded from calendar documents on first use and dropped when a
+# write invalidates them (or after AVAILABILITY_MAX_AGE seconds).
+
+DAY_START = 7 * 60        # 7:00 CST, the standard block window
+DAY_END = 15 * 60 + 30    # 15:30 CST
+
+# Where a surgeon may book: their own blocks or unblocked time ("any"),
+# only their own blocks ("own"), or only unblocked time ("open")
+OWNERSHIP_RULES = ("any", "own", "open")
+
+AVAILABILITY_MAX_AGE = float(os.getenv("AVAILABILITY_MAX_AGE", "300"))
+
+_engines = weakref.WeakSet()
+
+def minute_of_day_cst(value):
+    """Minutes since CST midnight, or None if unparseable."""
+    try:
+        dt = to_cst_safe(value)
+    except Exception:
+        return None
+    return dt.hour * 60 + dt.minute
+
+def hhmm(minute: int) -> str:
+    return f"{minute // 60:02d}:{minute % 60:02d}"
+
+def subtract_spans(spans, cuts):
+    """Sorted, merged spans minus sorted, merged cuts."""
+    result = []
+    for start, end in spans:
+        cursor = start
+        for cut_start, cut_end in cuts:
+            if cut_end <= cursor:
+                continue
+            if cut_start >= end:
+                break
+            if cut_start > cursor:
+                result.append((cursor, cut_start))
+            cursor = max(cursor, cut_end)
+        if cursor < end:
+            result.append((cursor, end))
+    return result
+
+def union_spans(*span_lists):
+    merged = []
+    for start, end in sorted(span for spans in span_lists for span in spans):
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+class RoomDay:
+    __slots__ = ("cases", "blocks")
+
+    def __init__(self):
+        self.cases = IntervalTree()
+        self.blocks = IntervalTree()
+
+    @classmethod
+    def from_doc(cls, doc):
+        room_day = cls()
+        cases = []
+        for proc in doc.get("procedures", []) or []:
+            start, end = minute_of_day_cst(proc.get("startTime")), minute_of_day_cst(proc.get("endTime"))
+            if start is not None and end is not None:
+                cases.append((start, end, proc.get("primaryNpi")))
+        blocks = []
+        for block in doc.get("blocks", []) or []:
+            if block.get("inactive"):
+                continue
+            start, end = minute_of_day_cst(block.get("startTime")), minute_of_day_cst(block.get("endTime"))
+            if start is not None and end is not None:
+                blocks.append((start, end, block.get("npi") or block.get("primaryNpi")))
+        room_day.cases = IntervalTree(cases)
+        room_day.blocks = IntervalTree(blocks)
+        return room_day
+
+    def own_block_spans(self, npi, start=DAY_START, end=DAY_END):
+        return IntervalTree(iv for iv in self.blocks.overlapping(start, end) if iv[2] == npi).covered(start, end)
+
+    def allowed_spans(self, npi, ownership="any", start=DAY_START, end=DAY_END):
+        """Spans of the day window the surgeon may book under the ownership rule."""
+        own = self.own_block_spans(npi, start, end)
+        if ownership == "own":
+            return own
+        others = IntervalTree(iv for iv in self.blocks.overlapping(start, end) if iv[2] != npi).covered(start, end)
+        open_time = subtract_spans([(start, end)], others)
+        if ownership == "open":
+            return open_time
+        return union_spans(own, open_time)
+
+EMPTY_ROOM_DAY = RoomDay()
+EMPTY_TREE = IntervalTree()
+
+class UnitMonth:
+    """Room-day and surgeon-day trees for one (hospitalId, unit, month)."""
+
+    def __init__(self, docs):
+        self.loaded_at = time.monotonic()
+        self.room_days = {}
+        self.rooms = set()
+        surgeon_cases = defaultdict(list)
+        for doc in docs:
+            room = (doc.get("room") or "").strip()
+            date_str = (doc.get("date") or "")[:10]
+            if not room or not date_str:
+                continue
+            self.rooms.add(room)
+            room_day = RoomDay.from_doc(doc)
+            self.room_days[(date_str, room)] = room_day
+            for start, end, npi in room_day.cases:
+                if npi:
+                    surgeon_cases[(date_str, npi)].append((start, end, room))
+        self.surgeon_days = {key: IntervalTree(cases) for key, cases in surgeon_cases.items()}
+
+    def room_day(self, date_str, room) -> RoomDay:
+        return self.room_days.get((date_str, room), EMPTY_ROOM_DAY)
+
+    def surgeon_day(self, date_str, npi) -> IntervalTree:
+        return self.surgeon_days.get((date_str, npi), EMPTY_TREE)
+
+class AvailabilityEngine:
+    def __init__(self, loader, max_age: float = AVAILABILITY_MAX_AGE):
+        """loader(start_date, end_date, hospitalId, unit) -> calendar documents."""
+        self.loader = loader
+        self.max_age = max_age
+        self.lock = threading.Lock()
+        self.units = {}
+        self.loads = 0
+        _engines.add(self)
+
+    def unit_month(self, hospitalId: str, unit: str, month: str) -> UnitMonth:
+        key = (hospitalId, unit, month)
+        with self.lock:
+            cached = self.units.get(key)
+            if cached is not None and time.monotonic() - cached.loaded_at < self.max_age:
+                return cached
+
+        year, month_num = map(int, month.split("-"))
+        start = date(year, month_num, 1)
+        end = date(year, month_num, calendar.monthrange(year, month_num)[1])
+        built = UnitMonth(self.loader(start, end, hospitalId, unit))
+
+        with self.lock:
+            self.units[key] = built
+            self.loads += 1
+        return built
+
+    def invalidate(self, month=None, hospitalId=None, unit=None) -> int:
+        """Drop cached months matching every given field (all of them if none given)."""
+        with self.lock:
+            stale = [
+                key for key in self.units
+                if (hospitalId is None or key[0] == hospitalId)
+                and (unit is None or key[1] == unit)
+                and (month is None or key[2] == month)
+            ]
+            for key in stale:
+                del self.units[key]
+        return len(stale)
+
+    def free_spans(self, unit_month: UnitMonth, date_str: str, room: str, npi: str, ownership: str = "any"):
+        """Bookable spans: allowed by ownership, minus room cases and the surgeon's cases elsewhere."""
+        room_day = unit_month.room_day(date_str, room)
+        allowed = room_day.allowed_spans(npi, ownership)
+        if not allowed:
+            return []
+        busy = union_spans(
+            room_day.cases.covered(DAY_START, DAY_END),
+            unit_month.surgeon_day(date_str, npi).covered(DAY_START, DAY_END)
+        )
+        return subtract_spans(allowed, busy)
+
+    def free_slots(self, hospitalId: str, unit: str, npi: str, start_date: date, end_date: date, duration: int,
+                   rooms=None, ownership: str = "any", limit: int = 50, business_days_only: bool = True) -> list:
+        """Earliest-first spans of at least `duration` minutes where the surgeon could book a case."""
+        slots = []
+        day = start_date
+        while day <= end_date and len(slots) < limit:
+            date_str = date_dimension.iso(day)
+            if business_days_only and not date_dimension.is_business_day(day):
+                day += timedelta(days=1)
+                continue
+            unit_month = self.unit_month(hospitalId, unit, date_str[:7])
+            for room in sorted(rooms or unit_month.rooms):
+                own = unit_month.room_day(date_str, room).own_block_spans(npi)
+                for start, end in self.free_spans(unit_month, date_str, room, npi, ownership):
+                    if end - start < duration:
+                        continue
+                    slots.append({
+                        "date": date_str,
+                        "room": room,
+                        "start": hhmm(start),
+                        "end": hhmm(end),
+                        "minutes": end - start,
+                        "inOwnBlock": any(s <= start and end <= e for s, e in own),
+                    })
+                    if len(slots) >= limit:
+                        break
+                if len(slots) >= limit:
+                    break
+            day += timedelta(days=1)
+        return slots
+
+    def check(self, hospitalId: str, unit: str, npi: str, date_str: str, room: str, start: int, duration: int,
+              ownership: str = "any") -> dict:
+        """Can the surgeon book [start, start + duration) in this room-day? Lists every reason it can't."""
+        end = start + duration
+        unit_month = self.unit_month(hospitalId, unit, date_str[:7])
+        room_day = unit_month.room_day(date_str, room)
+        reasons = []
+
+        if start < DAY_START or end > DAY_END:
+            reasons.append({"reason": "outsideDayWindow", "window": [hhmm(DAY_START), hhmm(DAY_END)]})
+        for case_start, case_end, case_npi in room_day.cases.overlapping(start, end):
+            reasons.append({"reason": "roomBusy", "npi": case_npi, "start": hhmm(case_start), "end": hhmm(case_end)})
+        for case_start, case_end, case_room in unit_month.surgeon_day(date_str, npi).overlapping(start, end):
+            if case_room != room:
+                reasons.append({"reason": "surgeonBusy", "room": case_room, "start": hhmm(case_start), "end": hhmm(case_end)})
+
+        allowed = room_day.allowed_spans(npi, ownership, min(start, DAY_START), max(end, DAY_END))
+        if not any(s <= start and end <= e for s, e in allowed):
+            if ownership == "own":
+                reasons.append({"reason": "notInOwnBlock"})
+            for block_start, block_end, block_npi in room_day.blocks.overlapping(start, end):
+                if block_npi != npi:
+                    reasons.append({"reason": "blockedByOther", "npi": block_npi,
+                                    "start": hhmm(block_start), "end": hhmm(block_end)})
+
+        own = room_day.own_block_spans(npi, min(start, DAY_START), max(end, DAY_END))
+        return {
+            "feasible": not reasons,
+            "date": date_str,
+            "room": room,
+            "start": hhmm(start),
+            "end": hhmm(end),
+            "inOwnBlock": any(s <= start and end <= e for s, e in own),
+            "reasons": reasons,
+        }
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {
+                "unitMonths": len(self.units),
+                "roomDays": sum(len(m.room_days) for m in self.units.values()),
+                "loads": self.loads,
+            }
+
+def invalidate_availability(month=None, hospitalId=None, unit=None):
+    """Called after calendar writes so the next query reloads the affected months."""
+    for engine in list(_engines):
+        engine.invalidate(month, hospitalId, unit)
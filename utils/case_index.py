@@ -0,0 +1,107 @@
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from utils.time_utils import to_cst_safe, merge_intervals
+
+# Projection with only the fields the index needs
+CASE_INDEX_PROJECTION = {
+    "procedureDate": 1,
+    "startTime": 1,
+    "endTime": 1,
+    "room": 1,
+    "procedures.primary": 1,
+    "procedures.primaryNpi": 1,
+}
+
+def case_index_query(start_date: str, end_date: str) -> dict:
+    """Cases whose procedureDate falls on any day in [start_date, end_date]."""
+    return {
+        "procedureDate": {
+            "$gte": datetime.fromisoformat(f"{start_date}T00:00:00"),
+            "$lt": datetime.fromisoformat(f"{end_date}T00:00:00") + timedelta(days=1)
+        },
+        "procedures": {"$elemMatch": {"primary": True}}
+    }
+
+class CaseIntervalIndex:
+    """
+    (date, NPI) -> CST case intervals, sorted and merged, tagged with room.
+    Built once per run from a single cursor and shared by the in-room and
+    anywhere utilization calculations.
+    """
+
+    def __init__(self):
+        self._raw = defaultdict(list)
+        self._merged = {}
+        self.case_count = 0
+
+    @classmethod
+    def from_cursor(cls, cursor):
+        index = cls()
+        for case in cursor:
+            index.add_case(case)
+        return index
+
+    def add_case(self, case):
+        procedure_date = case.get("procedureDate")
+        if not procedure_date or not case.get("startTime") or not case.get("endTime"):
+            return
+        if isinstance(procedure_date, str):
+            procedure_date = datetime.fromisoformat(procedure_date.replace("Z", "+00:00"))
+        date_str = procedure_date.strftime("%Y-%m-%d")
+
+        try:
+            start = to_cst_safe(case["startTime"])
+            end = to_cst_safe(case["endTime"])
+        except Exception as e:
+            print(f"❌ Error parsing procedure time in case {case.get('_id')}: {e}")
+            return
+
+        npis = {
+            proc.get("primaryNpi")
+            for proc in case.get("procedures", [])
+            if proc.get("primary") and proc.get("primaryNpi")
+        }
+        for npi in npis:
+            self._raw[(date_str, npi)].append((start, end, case.get("room")))
+            self._merged.pop((date_str, npi), None)
+        self.case_count += 1
+
+    def _entry(self, date_str: str, npi: str):
+        key = (date_str, npi)
+        entry = self._merged.get(key)
+        if entry is None:
+            raw = sorted(self._raw.get(key, []), key=lambda iv: (iv[0], iv[1]))
+            by_room = defaultdict(list)
+            for start, end, room in raw:
+                by_room[room].append((start, end))
+            entry = {
+                "intervals": raw,
+                "anywhere": merge_intervals([(start, end) for start, end, _ in raw]),
+                "rooms": {room: merge_intervals(ivs) for room, ivs in by_room.items()},
+            }
+            self._merged[key] = entry
+        return entry
+
+    def intervals(self, date_str: str, npi: str):
+        """Sorted (start, end, room) case intervals for the surgeon on that day."""
+        return self._entry(date_str, npi)["intervals"]
+
+    def merged(self, date_str: str, npi: str, room=None):
+        """Merged intervals in `room`, or across every room when room is None."""
+        entry = self._entry(date_str, npi)
+        if room is None:
+            return entry["anywhere"]
+        return entry["rooms"].get(room, [])
+
+    def overlap_minutes(self, date_str: str, npi: str, window_start, window_end, room=None) -> int:
+        """Whole minutes of merged case time inside [window_start, window_end)."""
+        minutes = 0
+        for start, end in self.merged(date_str, npi, room):
+            if start >= window_end:
+                break
+            overlap_start = max(start, window_start)
+            overlap_end = min(end, window_end)
+            if overlap_end > overlap_start:
+                minutes += int((overlap_end - overlap_start).total_seconds() / 60)
+        return minutes
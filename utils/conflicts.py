@@ -0,0 +1,312 @@
+import calendar
+import heapq
+from collections import defaultdict
+from datetime import datetime
+
+import pytz
+from dateutil import parser
+from pymongo import UpdateOne
+
+from utils import partitions
+
+# Sweep-line conflict detection over a unit-month of calendar documents.
+# Finds same-room block overlaps, surgeons blocked in two rooms at once and
+# cases that run outside their surgeon's block in that room.
+
+ROOM_OVERLAP = "roomOverlap"
+SURGEON_DOUBLE_BOOKED = "surgeonDoubleBooked"
+CASE_OUTSIDE_BLOCK = "caseOutsideBlock"
+
+FLAG_FIELDS = ("hasMultipleBlocks", "hasBlockOverlap", "hasSurgeonDoubleBooking", "hasCaseOutsideBlock")
+
+def parse_dt(value):
+    """Timezone-aware datetime from a datetime or ISO string (naive values are UTC)."""
+    if isinstance(value, datetime):
+        dt = value
+    else:
+        try:
+            dt = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+        except ValueError:
+            dt = parser.isoparse(str(value))
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=pytz.UTC)
+    return dt
+
+def _block_intervals(blocks):
+    intervals = []
+    for b in blocks:
+        try:
+            intervals.append((parse_dt(b["startTime"]), parse_dt(b["endTime"])))
+        except Exception:
+            continue
+    return intervals
+
+def blocks_overlap(blocks) -> bool:
+    """True if any two blocks in the list overlap."""
+    intervals = sorted(_block_intervals(blocks))
+    for i in range(1, len(intervals)):
+        if intervals[i][0] < intervals[i - 1][1]:
+            return True
+    return False
+
+def _minutes(start, end) -> int:
+    return max(0, int((end - start).total_seconds() // 60))
+
+def _uncovered_minutes(start, end, covers) -> int:
+    """Minutes of [start, end) not covered by the sorted, merged `covers`."""
+    outside = 0
+    cursor = start
+    for cover_start, cover_end in covers:
+        if cover_end <= cursor:
+            continue
+        if cover_start >= end:
+            break
+        if cover_start > cursor:
+            outside += _minutes(cursor, cover_start)
+        cursor = max(cursor, cover_end)
+        if cursor >= end:
+            break
+    if cursor < end:
+        outside += _minutes(cursor, end)
+    return outside
+
+def _merge(intervals):
+    merged = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+def find_conflicts(calendar_docs):
+    """
+    One pass over a unit-month. Returns conflict records, per-document flags
+    (keyed by _id) and the QA summary served by /api/calendar/qa.
+    """
+    calendar_docs = sorted(calendar_docs, key=lambda d: (d.get("date") or "", d.get("room") or ""))
+    conflicts = []
+    flags = {}
+    all_rooms = set()
+    summary = {
+        "roomsWithOverlap": {},
+        "roomsWithMultiple": {},
+        "roomsWithDoubleBooking": {},
+        "roomsWithCaseOutsideBlock": {},
+    }
+
+    def mark(doc, field, summary_key):
+        flags[doc["_id"]][field] = True
+        dates = summary[summary_key].setdefault(doc.get("room"), [])
+        date = doc["date"][:10]
+        if not dates or dates[-1] != date:
+            dates.append(date)
+
+    by_date = defaultdict(list)
+    for doc in calendar_docs:
+        flags[doc["_id"]] = {field: False for field in FLAG_FIELDS}
+        if doc.get("date"):
+            by_date[doc["date"][:10]].append(doc)
+
+    for date, docs in by_date.items():
+        # (start, end, seq, doc, block); seq keeps heap ordering total
+        events = []
+        for doc in docs:
+            room = doc.get("room")
+            blocks = doc.get("blocks", []) or []
+            if room and blocks:
+                all_rooms.add(room)
+                if len(blocks) > 1:
+                    mark(doc, "hasMultipleBlocks", "roomsWithMultiple")
+            for blk in blocks:
+                try:
+                    events.append((parse_dt(blk["startTime"]), parse_dt(blk["endTime"]), len(events), doc, blk))
+                except Exception:
+                    continue
+        events.sort(key=lambda e: (e[0], e[1], e[2]))
+
+        # Sweep: `active` holds blocks whose end is after the current start
+        active = []
+        for start, end, seq, doc, blk in events:
+            while active and active[0][0] <= start:
+                heapq.heappop(active)
+            npi = blk.get("npi") or blk.get("primaryNpi")
+            for other_end, _, other_doc, other_blk in active:
+                overlap_end = min(end, other_end)
+                if other_doc.get("room") == doc.get("room"):
+                    mark(doc, "hasBlockOverlap", "roomsWithOverlap")
+                    mark(other_doc, "hasBlockOverlap", "roomsWithOverlap")
+                    conflicts.append({
+                        "type": ROOM_OVERLAP,
+                        "date": date,
+                        "room": doc.get("room"),
+                        "blockIds": [other_blk.get("blockId"), blk.get("blockId")],
+                        "npis": [other_blk.get("npi"), npi],
+                        "start": start,
+                        "end": overlap_end,
+                        "minutes": _minutes(start, overlap_end),
+                    })
+                elif npi and not blk.get("inactive") and not other_blk.get("inactive") \
+                        and (other_blk.get("npi") or other_blk.get("primaryNpi")) == npi:
+                    mark(doc, "hasSurgeonDoubleBooking", "roomsWithDoubleBooking")
+                    mark(other_doc, "hasSurgeonDoubleBooking", "roomsWithDoubleBooking")
+                    conflicts.append({
+                        "type": SURGEON_DOUBLE_BOOKED,
+                        "date": date,
+                        "npi": npi,
+                        "rooms": [other_doc.get("room"), doc.get("room")],
+                        "blockIds": [other_blk.get("blockId"), blk.get("blockId")],
+                        "start": start,
+                        "end": overlap_end,
+                        "minutes": _minutes(start, overlap_end),
+                    })
+            heapq.heappush(active, (end, seq, doc, blk))
+
+        # Cases by surgeons holding a block in the room that run past it
+        for doc in docs:
+            block_windows = defaultdict(list)
+            for blk in doc.get("blocks", []) or []:
+                npi = blk.get("npi") or blk.get("primaryNpi")
+                if npi and not blk.get("inactive"):
+                    try:
+                        block_windows[npi].append((parse_dt(blk["startTime"]), parse_dt(blk["endTime"])))
+                    except Exception:
+                        continue
+            if not block_windows:
+                continue
+            merged = {npi: _merge(windows) for npi, windows in block_windows.items()}
+            for proc in doc.get("procedures", []) or []:
+                npi = proc.get("primaryNpi")
+                if npi not in merged or not proc.get("startTime") or not proc.get("endTime"):
+                    continue
+                try:
+                    case_start, case_end = parse_dt(proc["startTime"]), parse_dt(proc["endTime"])
+                except Exception:
+                    continue
+                outside = _uncovered_minutes(case_start, case_end, merged[npi])
+                if outside > 0:
+                    mark(doc, "hasCaseOutsideBlock", "roomsWithCaseOutsideBlock")
+                    conflicts.append({
+                        "type": CASE_OUTSIDE_BLOCK,
+                        "date": date,
+                        "room": doc.get("room"),
+                        "npi": npi,
+                        "start": case_start,
+                        "end": case_end,
+                        "minutes": outside,
+                    })
+
+    summary["allRooms"] = sorted(all_rooms)
+    return {"conflicts": conflicts, "flags": flags, "summary": summary}
+
+def qa_summary_id(hospitalId: str, unit: str, month: str) -> str:
+    return f"{hospitalId}|{unit}|{month}"
+
+def persist_conflicts(db, hospitalId: str, unit: str, month: str, result) -> int:
+    """Store conflict records, per-document flags and the QA summary for a unit-month."""
+    conflicts_collection = db["calendar_conflicts"]
+    conflicts_collection.create_index([("hospitalId", 1), ("unit", 1), ("month", 1), ("type", 1)])
+
+    conflicts_collection.delete_many({"hospitalId": hospitalId, "unit": unit, "month": month})
+    if result["conflicts"]:
+        conflicts_collection.insert_many([
+            {**conflict, "hospitalId": hospitalId, "unit": unit, "month": month}
+            for conflict in result["conflicts"]
+        ])
+
+    _write_flags(db, result["flags"])
+    _write_summary(db, hospitalId, unit, month, result["summary"], len(result["conflicts"]))
+    return len(result["conflicts"])
+
+def _write_flags(db, flags):
+    flag_updates = []
+    for doc_id, doc_flags in flags.items():
+        to_set = {field: True for field, value in doc_flags.items() if value}
+        to_unset = {field: "" for field, value in doc_flags.items() if not value}
+        update = {}
+        if to_set:
+            update["$set"] = to_set
+        if to_unset:
+            update["$unset"] = to_unset
+        flag_updates.append(UpdateOne({"_id": doc_id}, update))
+    if flag_updates:
+        db["calendar"].bulk_write(flag_updates, ordered=False)
+
+def _write_summary(db, hospitalId: str, unit: str, month: str, summary: dict, conflict_count: int):
+    db["calendar_qa"].replace_one(
+        {"_id": qa_summary_id(hospitalId, unit, month)},
+        {
+            "hospitalId": hospitalId,
+            "unit": unit,
+            "month": month,
+            **summary,
+            "conflictCount": conflict_count,
+            "generatedAt": datetime.utcnow(),
+        },
+        upsert=True
+    )
+
+def refresh_conflicts(db, hospitalId: str, unit: str, month: str) -> int:
+    """Recompute and persist one unit-month, e.g. after a block is toggled."""
+    year, month_num = map(int, month.split("-"))
+    last_day = calendar.monthrange(year, month_num)[1]
+    start_str, end_str = f"{month}-01", f"{month}-{last_day:02d}"
+    docs = list(partitions.find(db, "calendar", {
+        "date": {"$gte": start_str, "$lte": end_str},
+        "hospitalId": hospitalId,
+        "unit": unit
+    }, start_str, end_str))
+    return persist_conflicts(db, hospitalId, unit, month, find_conflicts(docs))
+
+def refresh_conflict_dates(db, hospitalId: str, unit: str, dates) -> int:
+    """
+    Recompute one unit's conflicts on `dates` only (conflicts never span
+    days) and patch them into the stored records, flags and QA summary of
+    their months. A month without a stored summary is refreshed in full.
+    Returns the conflicts found on those dates.
+    """
+    dates_by_month = defaultdict(set)
+    for date_str in dates:
+        dates_by_month[date_str[:7]].add(date_str)
+
+    found = 0
+    for month, month_dates in sorted(dates_by_month.items()):
+        stored = db["calendar_qa"].find_one({"_id": qa_summary_id(hospitalId, unit, month)})
+        if stored is None:
+            refresh_conflicts(db, hospitalId, unit, month)
+            continue
+        month_dates = sorted(month_dates)
+        docs = list(partitions.find(db, "calendar", {
+            "date": {"$in": month_dates},
+            "hospitalId": hospitalId,
+            "unit": unit
+        }, month_dates[0], month_dates[-1]))
+        result = find_conflicts(docs)
+
+        conflicts_collection = db["calendar_conflicts"]
+        removed = conflicts_collection.delete_many(
+            {"hospitalId": hospitalId, "unit": unit, "month": month, "date": {"$in": month_dates}}
+        ).deleted_count
+        if result["conflicts"]:
+            conflicts_collection.insert_many([
+                {**conflict, "hospitalId": hospitalId, "unit": unit, "month": month}
+                for conflict in result["conflicts"]
+            ])
+        _write_flags(db, result["flags"])
+
+        # The other dates' entries stay; rooms only leave allRooms on a full refresh
+        summary = {"allRooms": sorted(set(stored.get("allRooms", [])) | set(result["summary"]["allRooms"]))}
+        for key, rooms in result["summary"].items():
+            if key == "allRooms":
+                continue
+            merged = {}
+            for room in set(stored.get(key, {})) | set(rooms):
+                room_dates = {d for d in stored.get(key, {}).get(room, []) if d not in month_dates}
+                room_dates.update(rooms.get(room, []))
+                if room_dates:
+                    merged[room] = sorted(room_dates)
+            summary[key] = merged
+        conflict_count = max(0, stored.get("conflictCount", 0) - removed) + len(result["conflicts"])
+        _write_summary(db, hospitalId, unit, month, summary, conflict_count)
+        found += len(result["conflicts"])
+    return found
@@ -0,0 +1,22 @@
+import hashlib
+import json
+from datetime import date, datetime
+
+from bson import ObjectId
+
+# Stable content hashes of computed payloads. Jobs store them on the
+# documents they write and skip writes whose payload hash is unchanged.
+
+def _canonical(obj):
+    if isinstance(obj, ObjectId):
+        return str(obj)
+    if isinstance(obj, (datetime, date)):
+        return obj.isoformat()
+    if isinstance(obj, (set, frozenset)):
+        return sorted(obj, key=str)
+    raise TypeError(f"Object of type {type(obj).__name__} cannot be hashed")
+
+def stable_hash(value) -> str:
+    """Hex digest that ignores dict key order; datetimes hash by their ISO form."""
+    encoded = json.dumps(value, sort_keys=True, separators=(",", ":"), default=_canonical, ensure_ascii=False)
+    return hashlib.blake2b(encoded.encode("utf-8"), digest_size=16).hexdigest()
@@ -0,0 +1,137 @@
+import calendar
+import os
+from array import array
+from datetime import date, datetime
+
+import pytz
+
+# Precomputed calendar attributes per day, indexed by ordinal date. Replaces
+# the per-module get_week_of_month helpers and per-document strptime/weekday
+# and timezone lookups with O(1) array reads.
+
+cst_tz = pytz.timezone("US/Central")
+
+def _years_from_env():
+    first, _, last = os.getenv("DATE_DIMENSION_YEARS", "2015-2040").partition("-")
+    return int(first), int(last or first)
+
+def week_of_month(day) -> int:
+    """Calendar-row week of month (Monday-start): the 1st is always week 1."""
+    return ((day.day + day.replace(day=1).weekday() - 1) // 7) + 1
+
+def weeks_mask(weeks_of_month) -> int:
+    """Bitmask of a block frequency's weeksOfMonth (week n -> bit n-1)."""
+    mask = 0
+    for week in weeks_of_month or []:
+        try:
+            mask |= 1 << (int(week) - 1)
+        except (TypeError, ValueError):
+            continue
+    return mask
+
+def _cst_offset_minutes(day) -> int:
+    # Midday, clear of the 2am DST switch
+    return int(cst_tz.localize(datetime(day.year, day.month, day.day, 12)).utcoffset().total_seconds() // 60)
+
+class DateDimension:
+    def __init__(self, first_year: int, last_year: int):
+        self.first_year = first_year
+        self.last_year = last_year
+        self.first_ordinal = date(first_year, 1, 1).toordinal()
+        self.last_ordinal = date(last_year, 12, 31).toordinal()
+        size = self.last_ordinal - self.first_ordinal + 1
+
+        self._weekday = array("b", bytes(size))
+        self._week_of_month = array("b", bytes(size))
+        self._business_day = array("b", bytes(size))
+        self._cst_offset = array("h", [0]) * size
+        self._iso = [None] * size
+        self._by_iso = {}
+
+        for year in range(first_year, last_year + 1):
+            for month in range(1, 13):
+                first = date(year, month, 1)
+                days = calendar.monthrange(year, month)[1]
+                first_dow = first.weekday()
+                # Only months with a DST switch need a per-day timezone lookup
+                month_offset = _cst_offset_minutes(first)
+                switches = month_offset != _cst_offset_minutes(first.replace(day=days))
+                base = first.toordinal() - self.first_ordinal
+                for dom in range(1, days + 1):
+                    i = base + dom - 1
+                    weekday = (first_dow + dom - 1) % 7
+                    iso = f"{year:04d}-{month:02d}-{dom:02d}"
+                    self._weekday[i] = weekday
+                    self._week_of_month[i] = ((dom + first_dow - 1) // 7) + 1
+                    self._business_day[i] = weekday < 5
+                    self._cst_offset[i] = _cst_offset_minutes(date(year, month, dom)) if switches else month_offset
+                    self._iso[i] = iso
+                    self._by_iso[iso] = i
+
+    def _to_date(self, value) -> date:
+        if isinstance(value, datetime):
+            return value.date()
+        if isinstance(value, date):
+            return value
+        if isinstance(value, int):
+            return date.fromordinal(value)
+        return date.fromisoformat(str(value)[:10])
+
+    def _index(self, value):
+        """Row for a date, datetime, ordinal or YYYY-MM-DD string; None if outside the table."""
+        if isinstance(value, str):
+            i = self._by_iso.get(value[:10])
+            if i is not None:
+                return i
+        ordinal = value if isinstance(value, int) else self._to_date(value).toordinal()
+        if self.first_ordinal <= ordinal <= self.last_ordinal:
+            return ordinal - self.first_ordinal
+        return None
+
+    def weekday(self, value) -> int:
+        i = self._index(value)
+        return self._weekday[i] if i is not None else self._to_date(value).weekday()
+
+    def weekday_name(self, value) -> str:
+        return calendar.day_name[self.weekday(value)]
+
+    def week_of_month(self, value) -> int:
+        i = self._index(value)
+        return self._week_of_month[i] if i is not None else week_of_month(self._to_date(value))
+
+    def iso(self, value) -> str:
+        i = self._index(value)
+        return self._iso[i] if i is not None else self._to_date(value).isoformat()
+
+    def is_business_day(self, value) -> bool:
+        """Monday–Friday (no holiday calendar)."""
+        i = self._index(value)
+        return bool(self._business_day[i]) if i is not None else self._to_date(value).weekday() < 5
+
+    def cst_offset_minutes(self, value) -> int:
+        """US/Central UTC offset that day: -360 (CST) or -300 (CDT)."""
+        i = self._index(value)
+        return self._cst_offset[i] if i is not None else _cst_offset_minutes(self._to_date(value))
+
+    def cst_offset(self, value) -> str:
+        """The offset as an ISO suffix, e.g. "-05:00"."""
+        minutes = self.cst_offset_minutes(value)
+        sign = "-" if minutes < 0 else "+"
+        return f"{sign}{abs(minutes) // 60:02d}:{abs(minutes) % 60:02d}"
+
+    def week_bit(self, value) -> int:
+        return 1 << (self.week_of_month(value) - 1)
+
+    def matches_weeks(self, value, mask: int) -> bool:
+        """True if the day's week of month is set in a weeks_mask()."""
+        return bool(self.week_bit(value) & mask)
+
+    def dow_wom_key(self, value) -> str:
+        """"<weekday>-<week of month>", the key used by the profile endpoints."""
+        i = self._index(value)
+        if i is None:
+            day = self._to_date(value)
+            return f"{day.weekday()}-{week_of_month(day)}"
+        return f"{self._weekday[i]}-{self._week_of_month[i]}"
+
+date_dimension = DateDimension(*_years_from_env())
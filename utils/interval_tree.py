@@ -0,0 +1,64 @@
+# Static augmented interval tree over half-open [start, end) integer
+# intervals (minutes of day). Intervals live in one start-sorted list; the
+# tree is implicit (node = midpoint of a range) with each node storing the
+# largest end in its subtree, so overlap queries prune whole subtrees.
+
+class IntervalTree:
+    __slots__ = ("_items", "_max_end")
+
+    def __init__(self, intervals=()):
+        """intervals: iterable of (start, end, data)."""
+        self._items = sorted(((s, e, d) for s, e, d in intervals if e > s), key=lambda iv: (iv[0], iv[1]))
+        self._build()
+
+    def _build(self):
+        self._max_end = [0] * len(self._items)
+        if self._items:
+            self._fill(0, len(self._items))
+
+    def _fill(self, lo, hi) -> int:
+        if lo >= hi:
+            return -1
+        mid = (lo + hi) // 2
+        best = max(self._items[mid][1], self._fill(lo, mid), self._fill(mid + 1, hi))
+        self._max_end[mid] = best
+        return best
+
+    def overlapping(self, start: int, end: int) -> list:
+        """(start, end, data) of every interval intersecting [start, end)."""
+        found = []
+        self._search(0, len(self._items), start, end, found)
+        return found
+
+    def _search(self, lo, hi, start, end, found):
+        if lo >= hi:
+            return
+        mid = (lo + hi) // 2
+        if self._max_end[mid] <= start:
+            return
+        self._search(lo, mid, start, end, found)
+        item = self._items[mid]
+        if item[0] < end:
+            if item[1] > start:
+                found.append(item)
+            self._search(mid + 1, hi, start, end, found)
+
+    def overlaps(self, start: int, end: int) -> bool:
+        return bool(self.overlapping(start, end))
+
+    def covered(self, start: int, end: int) -> list:
+        """Merged [start, end) spans covered by intervals, clipped to the window."""
+        merged = []
+        for s, e, _ in self.overlapping(start, end):
+            s, e = max(s, start), min(e, end)
+            if merged and s <= merged[-1][1]:
+                merged[-1][1] = max(merged[-1][1], e)
+            else:
+                merged.append([s, e])
+        return [tuple(span) for span in merged]
+
+    def __len__(self):
+        return len(self._items)
+
+    def __iter__(self):
+        return iter(self._items)
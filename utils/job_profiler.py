@@ -0,0 +1,197 @@
+import json
+import os
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+
+from bson import encode
+from pymongo import monitoring
+
+try:
+    import resource
+except ImportError:  # pragma: no cover - not available on Windows
+    resource = None
+
+# Opt-in job profiling (--profile or JOB_PROFILE=1): wall and CPU time per
+# phase, peak traced memory with the top allocation sites, and Mongo
+# documents/bytes read and written (from a command listener). A JSON report
+# per run goes to JOB_PROFILE_DIR. Phases are meant to be coarse (fetch,
+# compute, write): each one ends with a tracemalloc snapshot. tracemalloc is
+# process-wide, so only one profiler at a time traces memory (and stops it
+# when done); concurrent ones report time and Mongo I/O only.
+
+JOB_PROFILE = os.getenv("JOB_PROFILE", "").lower() in ("1", "true", "yes")
+JOB_PROFILE_DIR = os.getenv("JOB_PROFILE_DIR", "profiles")
+TOP_ALLOCATIONS = 10
+
+READ_COMMANDS = ("find", "getMore", "aggregate", "count", "distinct")
+WRITE_COMMANDS = ("insert", "update", "delete", "findAndModify")
+
+_active = threading.local()
+_memory_lock = threading.Lock()
+
+def _docs_read(reply) -> int:
+    cursor = reply.get("cursor") or {}
+    return len(cursor.get("firstBatch") or cursor.get("nextBatch") or [])
+
+def _docs_written(command_name, reply) -> int:
+    if command_name == "update":
+        return reply.get("nModified", 0) + len(reply.get("upserted", []))
+    if command_name == "findAndModify":
+        return 1 if reply.get("value") is not None else 0
+    return reply.get("n", 0)
+
+class MongoIOListener(monitoring.CommandListener):
+    """Attributes every command to the profiler active on the issuing thread."""
+
+    def started(self, event):
+        profiler = getattr(_active, "profiler", None)
+        if profiler is not None:
+            profiler.count_io(commands=1, bytesSent=len(encode(event.command)))
+
+    def succeeded(self, event):
+        profiler = getattr(_active, "profiler", None)
+        if profiler is None:
+            return
+        reply = event.reply
+        io = {"bytesReceived": len(encode(reply))}
+        if event.command_name in READ_COMMANDS:
+            io["docsRead"] = _docs_read(reply)
+        elif event.command_name in WRITE_COMMANDS:
+            io["docsWritten"] = _docs_written(event.command_name, reply)
+        profiler.count_io(**io)
+
+    def failed(self, event):
+        profiler = getattr(_active, "profiler", None)
+        if profiler is not None:
+            profiler.count_io(errors=1)
+
+_listener = None
+_listener_lock = threading.Lock()
+
+def register_listener():
+    """Must run before the MongoClient is created: listeners apply to new clients only."""
+    global _listener
+    with _listener_lock:
+        if _listener is None:
+            _listener = MongoIOListener()
+            monitoring.register(_listener)
+
+if JOB_PROFILE:
+    register_listener()
+
+class JobProfiler:
+    def __init__(self, job: str, enabled: bool):
+        self.job = job
+        self.enabled = enabled
+        self.phases = {}
+        self.current = None
+        self.mongo = Counter()
+        self.top_allocations = None
+        self.traces_memory = False
+        self.started_tracing = False
+        if not enabled:
+            return
+        register_listener()
+        self.traces_memory = _memory_lock.acquire(blocking=False)
+        if self.traces_memory:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                self.started_tracing = True
+            tracemalloc.reset_peak()
+        self.started_at = datetime.utcnow()
+        self.wall = time.perf_counter()
+        self.cpu = time.thread_time()
+        _active.profiler = self
+
+    def count_io(self, **counts):
+        self.mongo.update(counts)
+        if self.current is not None:
+            self.current["mongo"].update(counts)
+
+    @contextmanager
+    def phase(self, name: str):
+        if not self.enabled:
+            yield
+            return
+        stats = self.phases.setdefault(name, {"calls": 0, "wallSeconds": 0.0, "cpuSeconds": 0.0, "mongo": Counter()})
+        previous, self.current = self.current, stats
+        wall, cpu = time.perf_counter(), time.thread_time()
+        try:
+            yield
+        finally:
+            stats["calls"] += 1
+            stats["wallSeconds"] += time.perf_counter() - wall
+            stats["cpuSeconds"] += time.thread_time() - cpu
+            self.current = previous
+            if self.traces_memory:
+                self._snapshot_allocations(name)
+
+    def _snapshot_allocations(self, phase: str):
+        traced = tracemalloc.get_traced_memory()[0]
+        if self.top_allocations is not None and traced <= self.top_allocations["tracedBytes"]:
+            return
+        snapshot = tracemalloc.take_snapshot().filter_traces([
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        ])
+        self.top_allocations = {
+            "phase": phase,
+            "tracedBytes": traced,
+            "sites": [
+                {"site": str(stat.traceback[0]), "bytes": stat.size, "count": stat.count}
+                for stat in snapshot.statistics("lineno")[:TOP_ALLOCATIONS]
+            ],
+        }
+
+    def finish(self, **summary):
+        """Write the JSON report; returns its path (None when profiling is off)."""
+        if not self.enabled:
+            return None
+        finished_at = datetime.utcnow()
+        report = {
+            "job": self.job,
+            "startedAt": self.started_at.isoformat(),
+            "finishedAt": finished_at.isoformat(),
+            "wallSeconds": round(time.perf_counter() - self.wall, 3),
+            "cpuSeconds": round(time.thread_time() - self.cpu, 3),
+            "peakTracedBytes": tracemalloc.get_traced_memory()[1] if self.traces_memory else None,
+            "maxRssBytes": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024 if resource else None,
+            "mongo": dict(self.mongo),
+            "phases": {
+                name: {**stats, "wallSeconds": round(stats["wallSeconds"], 3),
+                       "cpuSeconds": round(stats["cpuSeconds"], 3), "mongo": dict(stats["mongo"])}
+                for name, stats in self.phases.items()
+            },
+            "topAllocations": self.top_allocations,
+            "summary": summary,
+        }
+        self.close()
+        os.makedirs(JOB_PROFILE_DIR, exist_ok=True)
+        path = os.path.join(JOB_PROFILE_DIR, f"{self.job}-{finished_at.strftime('%Y%m%dT%H%M%S%f')}.json")
+        with open(path, "w") as f:
+            json.dump(report, f, indent=2, default=str)
+        peak = f"peak {report['peakTracedBytes'] / 1e6:.1f} MB traced" if report["peakTracedBytes"] is not None else "memory not traced"
+        print(f"🩺 Profile for {self.job}: {report['wallSeconds']}s wall, {report['cpuSeconds']}s CPU, {peak} -> {path}")
+        return path
+
+    def close(self):
+        """Detach from this thread and give back tracemalloc; safe to call more than once (finish() does)."""
+        if getattr(_active, "profiler", None) is self:
+            _active.profiler = None
+        if self.traces_memory:
+            if self.started_tracing:
+                tracemalloc.stop()
+            self.traces_memory = self.started_tracing = False
+            _memory_lock.release()
+
+def job_profiler(job: str, argv=None) -> JobProfiler:
+    """Profiler for one run, on with JOB_PROFILE=1 or a --profile argument (removed from argv)."""
+    enabled = JOB_PROFILE
+    if argv is not None and "--profile" in argv:
+        argv.remove("--profile")
+        enabled = True
+    return JobProfiler(job, enabled)
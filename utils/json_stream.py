@@ -0,0 +1,162 @@
+import json
+import re
+
+# Incremental reader/writer for files holding one large top-level JSON array
+# (e.g. output_deidentifiedBlock.json). Only one element is held in memory
+# at a time, so memory stays flat regardless of file size.
+
+_WHITESPACE = " \t\r\n"
+_STRUCTURE = re.compile(r'[\[\]{},"]')
+_STRING = re.compile(r'"(?:[^"\\]|\\.)*"', re.DOTALL)
+
+
+def iter_json_array(fp, object_hook=None, chunk_size=1 << 16):
+    """Yield the elements of a top-level JSON array one at a time."""
+    decoder = json.JSONDecoder(object_hook=object_hook)
+    buf = ""
+    pos = 0
+    eof = False
+    started = False
+
+    def fill():
+        nonlocal buf, pos, eof
+        chunk = fp.read(chunk_size)
+        if not chunk:
+            eof = True
+        buf = buf[pos:] + chunk
+        pos = 0
+
+    while True:
+        while pos < len(buf) and buf[pos] in _WHITESPACE:
+            pos += 1
+        if pos >= len(buf):
+            if eof:
+                raise ValueError("Unexpected end of JSON array")
+            fill()
+            continue
+
+        char = buf[pos]
+        if not started:
+            if char != "[":
+                raise ValueError(f"Expected '[' at start of JSON array, found {char!r}")
+            started = True
+            pos += 1
+            continue
+        if char == "]":
+            return
+        if char == ",":
+            pos += 1
+            continue
+
+        try:
+            item, end = decoder.raw_decode(buf, pos)
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            fill()
+            continue
+
+        # A number cut by the buffer edge can decode "successfully" (1 of 1.5,
+        # 3.5 of 3.5e10): only accept it when the next token ends the element
+        after = end
+        while after < len(buf) and buf[after] in _WHITESPACE:
+            after += 1
+        if after >= len(buf) or buf[after] not in ",]":
+            if eof:
+                raise ValueError(f"Expected ',' or ']' after array element at offset {after}")
+            fill()
+            continue
+
+        pos = end
+        yield item
+
+
+def iter_json_array_raw(fp, chunk_size=1 << 16):
+    """
+    Yield the source text of each element of a top-level JSON array without
+    decoding it, so the parsing can happen elsewhere (e.g. in worker
+    processes). Only brackets, commas and strings are scanned; the caller's
+    json.loads validates each element.
+    """
+    buf = ""
+    eof = False
+    start = scan = 0
+
+    def fill():
+        nonlocal buf, start, scan, eof
+        chunk = fp.read(chunk_size)
+        if not chunk:
+            eof = True
+        buf = buf[start:] + chunk
+        scan -= start
+        start = 0
+
+    while not buf.lstrip(_WHITESPACE):
+        if eof:
+            raise ValueError("Unexpected end of JSON array")
+        fill()
+    start = len(buf) - len(buf.lstrip(_WHITESPACE))
+    if buf[start] != "[":
+        raise ValueError(f"Expected '[' at start of JSON array, found {buf[start]!r}")
+    start = scan = start + 1
+
+    depth = 0
+    while True:
+        match = _STRUCTURE.search(buf, scan)
+        if match is None:
+            if eof:
+                raise ValueError("Unexpected end of JSON array")
+            fill()
+            continue
+
+        char = match.group()
+        if char == '"':
+            string = _STRING.match(buf, match.start())
+            if string is None:
+                if eof:
+                    raise ValueError("Unterminated string in JSON array")
+                fill()
+                continue
+            scan = string.end()
+        elif char in "[{":
+            depth += 1
+            scan = match.end()
+        elif char in "]}" and depth:
+            depth -= 1
+            scan = match.end()
+        elif char == "]":
+            text = buf[start:match.start()].strip(_WHITESPACE)
+            if text:
+                yield text
+            return
+        elif char == "," and not depth:
+            yield buf[start:match.start()].strip(_WHITESPACE)
+            start = scan = match.end()
+        else:
+            scan = match.end()
+
+
+class JsonArrayWriter:
+    """Write a JSON array element by element, one compact element per line."""
+
+    def __init__(self, fp):
+        self.fp = fp
+        self.count = 0
+
+    def __enter__(self):
+        self.fp.write("[\n")
+        return self
+
+    def write_raw(self, text: str):
+        """Append an already-serialised element."""
+        if self.count:
+            self.fp.write(",\n")
+        self.fp.write(text)
+        self.count += 1
+
+    def write(self, item, **dumps_kwargs):
+        self.write_raw(json.dumps(item, **dumps_kwargs))
+
+    def __exit__(self, exc_type, exc, tb):
+        self.fp.write("\n]\n")
+        return False
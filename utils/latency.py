@@ -0,0 +1,11 @@
+import statistics
+
+def percentiles(samples_ms) -> dict:
+    """p50/p95/p99/max/mean of latency samples in milliseconds (nearest rank)."""
+    if not samples_ms:
+        return {"p50": None, "p95": None, "p99": None, "max": None, "mean": None}
+    ordered = sorted(samples_ms)
+    def pct(p):
+        return round(ordered[min(len(ordered) - 1, int(p / 100 * len(ordered)))], 3)
+    return {"p50": pct(50), "p95": pct(95), "p99": pct(99), "max": round(ordered[-1], 3),
+            "mean": round(statistics.fmean(ordered), 3)}
@@ -0,0 +1,160 @@
+import os
+import threading
+import time
+from datetime import datetime
+from itertools import chain
+
+# Month partitions for cases and calendar. The base collections stay the hot
+# store that every writer uses; archive_partitions.py moves closed months out
+# of them into one zstd-compressed collection per month (cases_2024_01,
+# calendar_2024_01) recorded in partition_catalog. With
+# PARTITIONED_STORAGE=1, range reads go through find()/aggregate() here and
+# see the hot collection plus the archived partitions overlapping the range,
+# so the hot collections (and their indexes) only hold recent months.
+# A month is in both places while it is being archived or restored (and API
+# processes re-read the catalog only every PARTITION_CATALOG_TTL seconds),
+# so reads that span a partition drop documents already seen by _id, and
+# update_one() writes to whichever copy holds the document.
+
+PARTITIONED_STORAGE = os.getenv("PARTITIONED_STORAGE", "").lower() in ("1", "true", "yes")
+PARTITIONED_COLLECTIONS = ("cases", "calendar")
+PARTITION_CATALOG = "partition_catalog"
+PARTITION_CATALOG_TTL = float(os.getenv("PARTITION_CATALOG_TTL", "30"))
+ARCHIVE_COMPRESSOR = os.getenv("ARCHIVE_COMPRESSOR", "zstd")
+
+# Indexes each archived partition gets: only what the range readers use
+PARTITION_INDEXES = {
+    "cases": [[("procedureDate", 1)], [("startTime", 1), ("room", 1)]],
+    "calendar": [[("hospitalId", 1), ("unit", 1), ("date", 1)], [("date", 1)]],
+}
+
+def partition_name(base: str, month: str) -> str:
+    return f"{base}_{month.replace('-', '_')}"
+
+def to_month(value) -> str:
+    """YYYY-MM of a datetime or a YYYY-MM[-DD] string."""
+    if isinstance(value, datetime):
+        return value.strftime("%Y-%m")
+    return str(value)[:7]
+
+def shift_month(month: str, delta: int) -> str:
+    year, month_num = map(int, month.split("-"))
+    index = year * 12 + (month_num - 1) + delta
+    return f"{index // 12:04d}-{index % 12 + 1:02d}"
+
+def month_filter(base: str, month: str) -> dict:
+    """Documents of `base` that belong to `month`: calendar by date, cases by procedureDate."""
+    if base == "calendar":
+        return {"date": {"$gte": f"{month}-01", "$lt": f"{shift_month(month, 1)}-01"}}
+    start = datetime.strptime(f"{month}-01", "%Y-%m-%d")
+    end = datetime.strptime(f"{shift_month(month, 1)}-01", "%Y-%m-%d")
+    return {"procedureDate": {"$gte": start, "$lt": end}}
+
+class PartitionCatalog:
+    """Archived partitions per base collection, re-read at most every PARTITION_CATALOG_TTL seconds."""
+
+    def __init__(self, db, ttl: float = PARTITION_CATALOG_TTL):
+        self.collection = db[PARTITION_CATALOG]
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.loaded_at = None
+        self.partitions = {}
+
+    def archived(self, base: str) -> dict:
+        """month -> partition collection name."""
+        with self.lock:
+            if self.loaded_at is None or time.monotonic() - self.loaded_at >= self.ttl:
+                partitions = {}
+                for entry in self.collection.find({"status": "archived"}, {"base": 1, "month": 1, "collection": 1}):
+                    partitions.setdefault(entry["base"], {})[entry["month"]] = entry["collection"]
+                self.partitions = partitions
+                self.loaded_at = time.monotonic()
+            return dict(self.partitions.get(base, {}))
+
+    def record(self, base: str, month: str, count: int):
+        self.collection.replace_one({"_id": partition_name(base, month)}, {
+            "_id": partition_name(base, month),
+            "base": base,
+            "month": month,
+            "collection": partition_name(base, month),
+            "status": "archived",
+            "count": count,
+            "archivedAt": datetime.utcnow(),
+        }, upsert=True)
+        self.refresh()
+
+    def remove(self, base: str, month: str):
+        self.collection.delete_one({"_id": partition_name(base, month)})
+        self.refresh()
+
+    def refresh(self):
+        with self.lock:
+            self.loaded_at = None
+
+_catalogs = {}
+_catalogs_lock = threading.Lock()
+
+def partition_catalog(db) -> PartitionCatalog:
+    with _catalogs_lock:
+        if db.name not in _catalogs:
+            _catalogs[db.name] = PartitionCatalog(db)
+        return _catalogs[db.name]
+
+def partition_collections(db, base: str, start, end) -> list:
+    """The hot collection plus the archived partitions of base overlapping [start, end]."""
+    collections = [db[base]]
+    if not PARTITIONED_STORAGE:
+        return collections
+    start_month, end_month = to_month(start), to_month(end)
+    if base == "cases":
+        # Cases are partitioned by procedureDate; startTime (UTC) can fall in the next month
+        start_month, end_month = shift_month(start_month, -1), shift_month(end_month, 1)
+    archived = partition_catalog(db).archived(base)
+    collections.extend(db[archived[month]] for month in sorted(archived) if start_month <= month <= end_month)
+    return collections
+
+def _unique(docs):
+    seen = set()
+    for doc in docs:
+        doc_id = doc.get("_id")
+        if doc_id is not None:
+            if doc_id in seen:
+                continue
+            seen.add(doc_id)
+        yield doc
+
+def find(db, base: str, query: dict, start, end, projection=None):
+    """find() over every partition of the range, chained (hot collection first)."""
+    hot, *archived = partition_collections(db, base, start, end)
+    if not archived:
+        return hot.find(query, projection)
+    return _unique(chain.from_iterable(collection.find(query, projection) for collection in [hot, *archived]))
+
+def update_one(db, base: str, month: str, query: dict, update: dict):
+    """update_one() on the hot collection, else on the archived partition of `month` holding the document."""
+    result = db[base].update_one(query, update)
+    if result.matched_count or not PARTITIONED_STORAGE:
+        return result
+    archived = partition_catalog(db).archived(base)
+    if month not in archived:
+        return result
+    return db[archived[month]].update_one(query, update)
+
+def aggregate(db, base: str, pipeline: list, start, end, **kwargs):
+    """
+    aggregate() over every partition of the range: the archived ones are
+    $unionWith'd after the pipeline's leading $match and $project, which each
+    of them applies too, and deduplicated by _id on the projected rows, so
+    the later stages (grouping, $merge) see one stream. Pipelines must not
+    read the base collection again (no $unionWith/$lookup on it).
+    """
+    hot, *archived = partition_collections(db, base, start, end)
+    if not archived:
+        return hot.aggregate(pipeline, **kwargs)
+    if len(pipeline) < 2 or "$match" not in pipeline[0] or "$project" not in pipeline[1] \
+            or pipeline[1]["$project"].get("_id", 1) in (0, False):
+        raise ValueError("Partitioned aggregations must start with a $match and a $project that keeps _id")
+    head = pipeline[:2]
+    unions = [{"$unionWith": {"coll": collection.name, "pipeline": head}} for collection in archived]
+    unique = [{"$group": {"_id": "$_id", "row": {"$first": "$$ROOT"}}}, {"$replaceRoot": {"newRoot": "$row"}}]
+    return hot.aggregate([*head, *unions, *unique, *pipeline[2:]], **kwargs)
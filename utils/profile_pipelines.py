@@ -0,0 +1,219 @@
+from datetime import datetime
+
+# Aggregation-pipeline ("pushdown") versions of build_surgeon_profiles and
+# build_room_profiles: cases are grouped and summarised inside Mongo and the
+# profile documents are $merge'd straight into their collections, so only
+# the stage output ever leaves the server.
+
+CST_TZ = "America/Chicago"
+AVAILABLE_MINUTES = 510
+
+def _round(expr, places):
+    return {"$round": [expr, places]}
+
+def _dow_wom(date_field: str) -> dict:
+    """"<weekday>-<week of month>" (Monday=0, calendar-row weeks), as date_dimension.dow_wom_key."""
+    weekday = {"$toInt": {"$mod": [{"$add": [{"$dayOfWeek": date_field}, 5]}, 7]}}  # Sunday=1 -> Monday=0
+    day = {"$dayOfMonth": date_field}
+    first_weekday = {"$mod": [{"$add": [{"$subtract": [weekday, {"$mod": [{"$subtract": [day, 1]}, 7]}]}, 7]}, 7]}
+    week = {"$add": [{"$floor": {"$divide": [{"$add": [day, first_weekday, -1]}, 7]}}, 1]}
+    return {"$concat": [{"$toString": weekday}, "-", {"$toString": {"$toInt": week}}]}
+
+def _int_duration():
+    return {"$toInt": {"$ifNull": ["$duration", 0]}}
+
+def merge_stamp() -> datetime:
+    """A run's mergedAt value, at Mongo's millisecond precision so it can be matched back."""
+    now = datetime.utcnow()
+    return now.replace(microsecond=now.microsecond // 1000 * 1000)
+
+def _merge_stage(collection: str, on: list) -> dict:
+    return {"$merge": {"into": collection, "on": on, "whenMatched": "replace", "whenNotMatched": "insert"}}
+
+def _surgeon_procedure_stages(start: datetime, end: datetime) -> list:
+    """One row per valid primary procedure: npi, pid, providerName, leadTime, duration, dowWom."""
+    return [
+        {"$match": {
+            "procedureDate": {"$gte": start, "$lte": end},
+            "dateCreated": {"$ne": None}
+        }},
+        {"$project": {
+            "procedures": 1,
+            # timedelta.days: whole days, floored
+            "leadTime": {"$floor": {"$divide": [{"$subtract": ["$procedureDate", "$dateCreated"]}, 86400000]}},
+            "duration": _int_duration(),
+            "dowWom": _dow_wom("$procedureDate")
+        }},
+        {"$unwind": "$procedures"},
+        {"$match": {
+            "procedures.primary": True,
+            "procedures.primaryNpi": {"$nin": [None, ""]},
+            "procedures.procedureId": {"$nin": [None, ""]}
+        }},
+        {"$project": {
+            "_id": 0,
+            "npi": "$procedures.primaryNpi",
+            "pid": {"$toString": "$procedures.procedureId"},
+            "providerName": {"$ifNull": ["$procedures.providerName", "Unknown"]},
+            "leadTime": 1,
+            "duration": 1,
+            "dowWom": 1
+        }}
+    ]
+
+def surgeon_profile_pipeline(start: datetime, end: datetime, merged_at: datetime,
+                             collection: str = "surgeon_profiles") -> list:
+    """
+    Profiles for cases in [start, end], $merge'd into `collection` on
+    (surgeonId, profileMonth) and stamped with mergedAt.
+    """
+    # Each procedure row is counted twice, once per kind, in a single $group
+    # (no second read of cases, so archived partitions are covered too)
+    is_procedure = {"$eq": ["$kind", "procedure"]}
+
+    def stats(kind):
+        return {"$filter": {
+            "input": "$stats",
+            "cond": {"$and": [{"$eq": ["$$this.kind", kind]}, {"$gt": ["$$this.count", 1]}]}
+        }}
+
+    return _surgeon_procedure_stages(start, end) + [
+        {"$addFields": {"kind": ["procedure", "dowWom"]}},
+        {"$unwind": "$kind"},
+        {"$group": {
+            "_id": {"npi": "$npi", "kind": "$kind", "key": {"$cond": [is_procedure, "$pid", "$dowWom"]}},
+            "providerName": {"$first": {"$cond": [is_procedure, "$providerName", None]}},
+            "count": {"$sum": 1},
+            # Lead time per procedure, duration per weekday/week-of-month
+            "mean": {"$avg": {"$cond": [is_procedure, "$leadTime", "$duration"]}},
+            "std": {"$stdDevSamp": {"$cond": [is_procedure, "$leadTime", "$duration"]}},
+            "avgDuration": {"$avg": {"$cond": [is_procedure, "$duration", None]}}
+        }},
+        {"$addFields": {"kind": "$_id.kind"}},
+        {"$group": {
+            "_id": "$_id.npi",
+            "providerName": {"$max": "$providerName"},
+            "total": {"$sum": {"$cond": [{"$eq": ["$kind", "procedure"]}, "$count", 0]}},
+            "stats": {"$push": {"kind": "$kind", "key": "$_id.key", "count": "$count",
+                                "mean": "$mean", "std": "$std", "avgDuration": "$avgDuration"}}
+        }},
+        {"$project": {
+            "_id": 0,
+            "surgeonId": "$_id",
+            "providerName": {"$ifNull": ["$providerName", "Unknown"]},
+            "profileMonth": start.strftime("%Y-%m"),
+            "mergedAt": merged_at,
+            "leadTimeByProcedure": {"$arrayToObject": {"$map": {"input": stats("procedure"), "in": {
+                "k": "$$this.key",
+                "v": {
+                    "mean": _round("$$this.mean", 2),
+                    "std": _round("$$this.std", 2),
+                    "frequency": "$$this.count",
+                    "relativeFrequency": _round({"$divide": ["$$this.count", "$total"]}, 3),
+                    "avgDuration": _round("$$this.avgDuration", 2)
+                }
+            }}}},
+            "timeUsageByDayAndWeek": {"$arrayToObject": {"$map": {"input": stats("dowWom"), "in": {
+                "k": "$$this.key",
+                "v": {"meanMinutes": _round("$$this.mean", 2), "stdMinutes": _round("$$this.std", 2)}
+            }}}}
+        }},
+        # Same rule as build_surgeon_profiles: no stats, no profile
+        {"$match": {"$or": [{"leadTimeByProcedure": {"$ne": {}}}, {"timeUsageByDayAndWeek": {"$ne": {}}}]}},
+        _merge_stage(collection, ["surgeonId", "profileMonth"])
+    ]
+
+def _block_window_bound(hour: int, minute: int) -> dict:
+    """7:00 / 15:30 CST on the CST date the case starts."""
+    return {"$dateFromParts": {
+        "year": {"$year": {"date": "$startTime", "timezone": CST_TZ}},
+        "month": {"$month": {"date": "$startTime", "timezone": CST_TZ}},
+        "day": {"$dayOfMonth": {"date": "$startTime", "timezone": CST_TZ}},
+        "hour": hour,
+        "minute": minute,
+        "timezone": CST_TZ
+    }}
+
+def _counts_by_value(values_expr, total_expr) -> dict:
+    """{value: {count, relative}} for a flat array of values."""
+    return {"$arrayToObject": {"$map": {
+        "input": {"$setUnion": [values_expr, []]},
+        "as": "value",
+        "in": {
+            "k": {"$toString": "$$value"},
+            "v": {
+                "count": {"$size": {"$filter": {"input": values_expr, "cond": {"$eq": ["$$this", "$$value"]}}}},
+                "relative": _round({"$divide": [
+                    {"$size": {"$filter": {"input": values_expr, "cond": {"$eq": ["$$this", "$$value"]}}}},
+                    total_expr
+                ]}, 3)
+            }
+        }
+    }}}
+
+def _present(values_expr) -> dict:
+    """Drop null/empty-string values, as the `if npi:` / `if pid:` checks do."""
+    return {"$filter": {"input": values_expr, "cond": {"$and": [{"$ne": ["$$this", None]}, {"$ne": ["$$this", ""]}]}}}
+
+def _flatten(field: str) -> dict:
+    return {"$reduce": {"input": field, "initialValue": [], "in": {"$concatArrays": ["$$value", "$$this"]}}}
+
+def room_profile_pipeline(start: datetime, end: datetime, merged_at: datetime, collection: str = "room_profiles") -> list:
+    """
+    Room profiles for cases in [start, end], $merge'd into `collection` on
+    (room, profileMonth) and stamped with mergedAt.
+    """
+    window_start = _block_window_bound(7, 0)
+    window_end = _block_window_bound(15, 30)
+    overlap_ms = {"$subtract": [{"$min": ["$endTime", window_end]}, {"$max": ["$startTime", window_start]}]}
+    primary = {"$filter": {"input": {"$ifNull": ["$procedures", []]}, "cond": {"$eq": ["$$this.primary", True]}}}
+
+    return [
+        {"$match": {
+            "procedureDate": {"$gte": start, "$lte": end},
+            "room": {"$nin": [None, ""]},
+            "startTime": {"$ne": None},
+            "endTime": {"$ne": None}
+        }},
+        {"$project": {
+            "room": 1,
+            "dowWom": _dow_wom("$procedureDate"),
+            "duration": _int_duration(),
+            # Clipped to the standard 7:00–15:30 CST window, whole minutes
+            "utilizationMinutes": {"$max": [0, {"$trunc": {"$divide": [overlap_ms, 60000]}}]},
+            "npis": _present({"$map": {"input": primary, "in": "$$this.primaryNpi"}}),
+            "pids": _present({"$map": {"input": primary, "in": "$$this.procedureId"}})
+        }},
+        {"$group": {
+            "_id": {"room": "$room", "key": "$dowWom"},
+            "cases": {"$sum": 1},
+            "mean": {"$avg": "$duration"},
+            "std": {"$stdDevSamp": "$duration"},
+            "utilizationMinutes": {"$sum": "$utilizationMinutes"},
+            "npis": {"$push": "$npis"},
+            "pids": {"$push": "$pids"}
+        }},
+        {"$project": {
+            "room": "$_id.room",
+            "key": "$_id.key",
+            "entry": {
+                "meanMinutes": {"$cond": [{"$gt": ["$cases", 1]}, _round("$mean", 2), "$$REMOVE"]},
+                "stdMinutes": {"$cond": [{"$gt": ["$cases", 1]}, _round("$std", 2), "$$REMOVE"]},
+                "surgeonFrequency": _counts_by_value(_flatten("$npis"), "$cases"),
+                "procedureFrequency": _counts_by_value(_flatten("$pids"), "$cases"),
+                "utilizationRate": _round({"$divide": ["$utilizationMinutes", {"$multiply": ["$cases", AVAILABLE_MINUTES]}]}, 3)
+            }
+        }},
+        {"$group": {
+            "_id": "$room",
+            "usage": {"$push": {"k": "$key", "v": "$entry"}}
+        }},
+        {"$project": {
+            "_id": 0,
+            "room": "$_id",
+            "profileMonth": start.strftime("%Y-%m"),
+            "mergedAt": merged_at,
+            "usageByDayAndWeek": {"$arrayToObject": "$usage"}
+        }},
+        _merge_stage(collection, ["room", "profileMonth"])
+    ]
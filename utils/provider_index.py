@@ -0,0 +1,78 @@
+import threading
+import time
+from bisect import bisect_left
+
+class ProviderIndex:
+    """Sorted prefix index over provider names, name tokens and NPIs."""
+
+    def __init__(self, providers=()):
+        self.providers = []
+        self.keys = []
+        self.ids = []
+        self.build(providers)
+
+    def build(self, providers):
+        providers = list(providers)
+        entries = []
+        for i, provider in enumerate(providers):
+            name = (provider.get("providerName") or "").lower()
+            npi = str(provider.get("npi") or "").lower()
+            keys = {name, npi}
+            keys.update(name.replace(",", " ").split())
+            entries.extend((key, i) for key in keys if key)
+        entries.sort()
+        self.providers = providers
+        self.keys = [key for key, _ in entries]
+        self.ids = [i for _, i in entries]
+
+    def search(self, query: str, limit: int = 10):
+        """Providers whose name, any name token, or NPI starts with `query`."""
+        query = query.strip().lower()
+        if not query:
+            return []
+        results = []
+        seen = set()
+        pos = bisect_left(self.keys, query)
+        while pos < len(self.keys) and self.keys[pos].startswith(query):
+            i = self.ids[pos]
+            if i not in seen:
+                seen.add(i)
+                results.append(self.providers[i])
+                if len(results) >= limit:
+                    break
+            pos += 1
+        return results
+
+class ProviderIndexCache:
+    """Loads the index once and reloads it when the providers version in `meta` changes.
+    The version is checked at most every `check_interval` seconds."""
+
+    def __init__(self, providers_collection, meta_collection, check_interval: float = 30.0):
+        self.providers_collection = providers_collection
+        self.meta_collection = meta_collection
+        self.check_interval = check_interval
+        self.index = None
+        self.version = None
+        self.checked_at = 0.0
+        self.lock = threading.Lock()
+
+    def current_version(self):
+        doc = self.meta_collection.find_one({"_id": "providers"}, {"version": 1})
+        return doc.get("version") if doc else None
+
+    def get(self) -> ProviderIndex:
+        if self.index is not None and time.monotonic() - self.checked_at < self.check_interval:
+            return self.index
+        with self.lock:
+            if self.index is None or time.monotonic() - self.checked_at >= self.check_interval:
+                version = self.current_version()
+                if self.index is None or version != self.version:
+                    self.index = ProviderIndex(self.providers_collection.find({}, {"_id": 0}))
+                    self.version = version
+                self.checked_at = time.monotonic()
+        return self.index
+
+    def invalidate(self):
+        with self.lock:
+            self.checked_at = 0.0
+            self.version = object()
@@ -0,0 +1,136 @@
+import os
+import threading
+import time
+from contextlib import nullcontext
+
+from utils.single_flight import flight
+from utils.snapshot_serving import serving_snapshot
+
+# Encoded (JSON bytes) responses kept for RESPONSE_CACHE_TTL seconds, filled
+# by the warm-up job or the first request. Writes drop the entries they touch;
+# a generation token stops a fill that raced a write from being stored.
+# CACHE_BACKEND=shared keeps entries in a memory-mapped file shared by every
+# worker on the host (utils/shared_cache.py) instead of per process.
+# Invalidation only reaches the process that made the write with the local
+# backend, so its entries live a few seconds by default: other uvicorn
+# workers would otherwise serve the pre-write response until the TTL.
+
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "local").lower()
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", "600" if CACHE_BACKEND == "shared" else "5"))
+
+class LocalStore:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.entries = {}
+        self.generations = {}
+
+    def token(self, name: str, key):
+        with self.lock:
+            return self.generations.setdefault(name, 0)
+
+    def get(self, name: str, key, ttl: float):
+        with self.lock:
+            entry = self.entries.get((name, key))
+        if entry is not None and time.monotonic() - entry[0] < ttl:
+            return entry[1]
+        return None
+
+    def put(self, name: str, key, body: bytes, token) -> bool:
+        with self.lock:
+            if self.generations.get(name, 0) != token:
+                return False
+            self.entries[(name, key)] = (time.monotonic(), body)
+        return True
+
+    def invalidate(self, name: str = None, **fields) -> int:
+        with self.lock:
+            stale = [
+                entry_key for entry_key in self.entries
+                if (name is None or entry_key[0] == name)
+                and all(dict(entry_key[1][1]).get(field) == value for field, value in fields.items())
+            ]
+            for entry_key in stale:
+                del self.entries[entry_key]
+            for cache_name in [name] if name else list(self.generations):
+                self.generations[cache_name] = self.generations.get(cache_name, 0) + 1
+        return len(stale)
+
+    def exclusive(self, label: str):
+        return nullcontext()
+
+    def metrics(self) -> dict:
+        with self.lock:
+            sizes = {}
+            for cache_name, _ in self.entries:
+                sizes[cache_name] = sizes.get(cache_name, 0) + 1
+            return {
+                "backend": "local",
+                "entries": sizes,
+                "bytes": sum(len(body) for _, body in self.entries.values()),
+            }
+
+class ResponseCache:
+    def __init__(self, store, ttl: float = RESPONSE_CACHE_TTL):
+        self.store = store
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, name: str, key):
+        body = self.store.get(name, key, self.ttl)
+        if body is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return body
+
+    def cached(self, name: str, key, compute, refresh: bool = False) -> bytes:
+        """
+        Cached bytes for (name, key), else compute() once for all concurrent
+        callers. refresh=True recomputes and replaces the entry (warm-up after
+        a regeneration job) while readers keep getting the old one.
+        """
+        # Snapshot swaps change the data without a write, so the source is part of the key
+        snapshot = serving_snapshot()
+        key = (snapshot.root if snapshot is not None else None, key)
+        body = None if refresh else self.get(name, key)
+        if body is not None:
+            return body
+
+        def fill() -> bytes:
+            token = self.store.token(name, key)
+            body = compute()
+            self.store.put(name, key, body, token)
+            return body
+
+        return flight(name).do(key, fill)
+
+    def invalidate(self, name: str = None, **fields) -> int:
+        """Drop entries of `name` (every name if None) whose request key has all the given field values."""
+        return self.store.invalidate(name, **fields)
+
+    def exclusive(self, label: str):
+        """Cross-worker mutex with the shared backend; a no-op for the per-process one."""
+        return self.store.exclusive(label)
+
+    def metrics(self) -> dict:
+        return {
+            "ttlSeconds": self.ttl,
+            **self.store.metrics(),
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+def make_store():
+    if CACHE_BACKEND == "shared":
+        from utils.shared_cache import SharedStore
+        return SharedStore()
+    return LocalStore()
+
+response_cache = ResponseCache(make_store())
+
+def invalidate_calendar_responses(month=None, hospitalId=None, unit=None):
+    """Called after calendar writes, next to invalidate_availability."""
+    fields = {name: value for name, value in (("month", month), ("hospitalId", hospitalId), ("unit", unit)) if value is not None}
+    response_cache.invalidate("calendar_view", **fields)
+    response_cache.invalidate("calendar_qa", **fields)
@@ -0,0 +1,50 @@
+# Room-day procedure and utilization fields of a calendar document, shared by
+# generate_calendar.py (full month) and the incremental recompute service.
+
+from utils.content_hash import stable_hash
+
+AVAILABLE_MINUTES = 510
+
+def primary_procedures(case) -> list:
+    """Calendar procedure entries for the primary procedures of one case."""
+    start = case.get("startTime")
+    end = case.get("endTime")
+    procedures = []
+    for proc in case.get("procedures", []):
+        if not proc.get("primary"):
+            continue
+
+        # Prefer frequency.duration if available
+        duration = 0
+        if proc.get("frequencies"):
+            for freq in proc["frequencies"]:
+                duration = max(duration, freq.get("duration", 0))
+
+        if duration == 0:
+            # Fallback: compute from case start and end time
+            if start and end:
+                duration = int((end - start).total_seconds() / 60)
+
+        # Always store startTime and endTime from the case level
+        procedures.append({
+            **proc,
+            "duration": duration,
+            "startTime": start,
+            "endTime": end
+        })
+    return procedures
+
+def _procedure_order(proc):
+    # Cases arrive in cursor order; ties on startTime fall back to the content
+    return str(proc.get("startTime")), stable_hash(proc)
+
+def room_day_fields(procedures) -> dict:
+    """Stored fields of a room-day, procedures in a canonical order so procHash only changes with the content."""
+    procedures = sorted(procedures, key=_procedure_order)
+    total_minutes = sum(proc.get("duration", 0) for proc in procedures)
+    return {
+        "procedures": procedures,
+        "utilizationMinutes": total_minutes,
+        "availableMinutes": AVAILABLE_MINUTES,
+        "utilizationRate": round(total_minutes / AVAILABLE_MINUTES, 3)
+    }
@@ -0,0 +1,218 @@
+import fcntl
+import hashlib
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import time
+import zlib
+from contextlib import contextmanager
+
+# Response cache shared by every worker process on the host: one
+# memory-mapped file (in /dev/shm where available) holding a header, a
+# generation table, an open-addressing index and an append-only data area.
+# Writers serialise on flock; readers take no lock. Each index slot carries a
+# sequence number (odd while being written) that readers check before and
+# after copying the body, and the checksum covers the key hash and the body,
+# so a slot or body overwritten mid-read is a miss, never another key's body.
+# Invalidation bumps a generation instead of touching entries.
+
+SHARED_CACHE_DIR = os.getenv("SHARED_CACHE_DIR") or ("/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir())
+SHARED_CACHE_NAME = os.getenv("SHARED_CACHE_NAME", "surgical-analytics-response-cache")
+SHARED_CACHE_BYTES = int(os.getenv("SHARED_CACHE_BYTES", str(256 * 1024 * 1024)))
+SHARED_CACHE_SLOTS = int(os.getenv("SHARED_CACHE_SLOTS", "16384"))
+
+MAGIC = b"SACACHE2"
+HEADER = struct.Struct("<8sIIQQQ")        # magic, slots, generation slots, capacity, write offset, resets
+HEADER_SIZE = 64
+GENERATION_SLOTS = 4096
+GENERATION = struct.Struct("<Q")
+SEQUENCE = struct.Struct("<Q")
+SLOT = struct.Struct("<Q16sQIIdII")       # sequence, key hash, offset, length, crc32, stored at, name gen, scope gen
+PROBES = 8
+EMPTY_HASH = bytes(16)
+
+# Request-key fields that scope an invalidation to one unit-month
+SCOPE_FIELDS = ("hospitalId", "unit", "month")
+
+def _key_hash(name: str, key) -> bytes:
+    return hashlib.blake2b(repr((name, key)).encode("utf-8"), digest_size=16).digest()
+
+def _generation_slot(label: str) -> int:
+    digest = hashlib.blake2b(label.encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "little") % GENERATION_SLOTS
+
+def _scope_label(name: str, fields: dict):
+    if all(fields.get(field) is not None for field in SCOPE_FIELDS):
+        return "|".join([name, *(str(fields[field]) for field in SCOPE_FIELDS)])
+    return None
+
+def _key_fields(key) -> dict:
+    """Field values of a (source, request_key) cache key."""
+    try:
+        return dict(key[1])
+    except (TypeError, ValueError, IndexError):
+        return {}
+
+class SharedStore:
+    def __init__(self, path: str = None, capacity: int = SHARED_CACHE_BYTES, slots: int = SHARED_CACHE_SLOTS):
+        self.path = path or os.path.join(SHARED_CACHE_DIR, SHARED_CACHE_NAME)
+        self.lock = threading.Lock()
+        self.fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        with self._file_lock():
+            existing = os.fstat(self.fd).st_size
+            if existing >= HEADER_SIZE:
+                magic, slots_in_file, _, capacity_in_file, _, _ = HEADER.unpack(os.pread(self.fd, HEADER.size, 0))
+                if magic == MAGIC:
+                    slots, capacity = slots_in_file, capacity_in_file
+            self.slots = slots
+            self.capacity = capacity
+            self.index_start = HEADER_SIZE + GENERATION_SLOTS * GENERATION.size
+            self.data_start = self.index_start + slots * SLOT.size
+            size = self.data_start + capacity
+            if existing < size:
+                os.ftruncate(self.fd, size)
+            self.map = mmap.mmap(self.fd, size)
+            if self.map[:len(MAGIC)] != MAGIC:
+                self.map[:self.data_start] = bytes(self.data_start)
+                self.map[:HEADER.size] = HEADER.pack(MAGIC, slots, GENERATION_SLOTS, capacity, 0, 0)
+
+    @contextmanager
+    def _file_lock(self):
+        """Excludes other threads (the lock) and other worker processes (flock)."""
+        with self.lock:
+            fcntl.flock(self.fd, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(self.fd, fcntl.LOCK_UN)
+
+    def _header(self):
+        return HEADER.unpack_from(self.map, 0)
+
+    def _set_write_position(self, offset: int, resets: int):
+        self.map[:HEADER.size] = HEADER.pack(MAGIC, self.slots, GENERATION_SLOTS, self.capacity, offset, resets)
+
+    def _generation(self, label) -> int:
+        if label is None:
+            return 0
+        return GENERATION.unpack_from(self.map, HEADER_SIZE + _generation_slot(label) * GENERATION.size)[0] & 0xFFFFFFFF
+
+    def _bump(self, label):
+        position = HEADER_SIZE + _generation_slot(label) * GENERATION.size
+        GENERATION.pack_into(self.map, position, GENERATION.unpack_from(self.map, position)[0] + 1)
+
+    def _clear_index(self):
+        """Empty every slot, moving the sequences on (not back to 0) so in-flight reads notice."""
+        for index in range(self.slots):
+            self._write_slot(index, EMPTY_HASH, 0, 0, 0, 0.0, 0, 0)
+
+    def _slot(self, index: int):
+        """(key hash, offset, length, crc32, stored at, name gen, scope gen) of one index slot."""
+        return SLOT.unpack_from(self.map, self.index_start + index * SLOT.size)[1:]
+
+    def _write_slot(self, index: int, *fields):
+        position = self.index_start + index * SLOT.size
+        sequence = SEQUENCE.unpack_from(self.map, position)[0]
+        # Odd while the slot is inconsistent; readers seeing it (or a change) miss
+        SEQUENCE.pack_into(self.map, position, sequence | 1)
+        SLOT.pack_into(self.map, position, sequence | 1, *fields)
+        SEQUENCE.pack_into(self.map, position, (sequence | 1) + 1)
+
+    def _probe(self, key_hash: bytes):
+        start = int.from_bytes(key_hash[:8], "little") % self.slots
+        return [(start + i) % self.slots for i in range(PROBES)]
+
+    def token(self, name: str, key):
+        """Generations to pass to put(): a fill that raced an invalidation is not stored."""
+        return self._generation(name), self._generation(_scope_label(name, _key_fields(key)))
+
+    def get(self, name: str, key, ttl: float):
+        key_hash = _key_hash(name, key)
+        name_gen, scope_gen = self.token(name, key)
+        for index in self._probe(key_hash):
+            position = self.index_start + index * SLOT.size
+            slot = SLOT.unpack_from(self.map, position)
+            sequence, slot_hash, offset, length, crc, stored_at, slot_name_gen, slot_scope_gen = slot
+            if sequence & 1:
+                return None
+            if slot_hash == EMPTY_HASH:
+                return None
+            if slot_hash != key_hash:
+                continue
+            if time.time() - stored_at >= ttl or (slot_name_gen, slot_scope_gen) != (name_gen, scope_gen):
+                return None
+            if offset + length > self.capacity:
+                return None
+            start = self.data_start + offset
+            body = self.map[start:start + length]
+            if SLOT.unpack_from(self.map, position) != slot:
+                return None
+            return body if zlib.crc32(key_hash + body) == crc else None
+        return None
+
+    def put(self, name: str, key, body: bytes, token) -> bool:
+        if len(body) > self.capacity:
+            return False
+        key_hash = _key_hash(name, key)
+        with self._file_lock():
+            if self.token(name, key) != token:
+                return False
+            _, _, _, _, offset, resets = self._header()
+            if offset + len(body) > self.capacity:
+                # Full: start the data area over and forget every entry
+                self._clear_index()
+                offset, resets = 0, resets + 1
+            start = self.data_start + offset
+            self.map[start:start + len(body)] = body
+            self._set_write_position(offset + len(body), resets)
+
+            probes = self._probe(key_hash)
+            target = probes[0]
+            oldest = None
+            for index in probes:
+                slot = self._slot(index)
+                if slot[0] == key_hash or slot[0] == EMPTY_HASH:
+                    target = index
+                    break
+                if oldest is None or slot[4] < oldest:
+                    target, oldest = index, slot[4]
+            self._write_slot(target, key_hash, offset, len(body), zlib.crc32(key_hash + body), time.time(), *token)
+        return True
+
+    def invalidate(self, name: str = None, **fields) -> int:
+        """Bump the generation covering the entries; returns how many generations moved."""
+        with self._file_lock():
+            if name is None:
+                _, _, _, _, _, resets = self._header()
+                self._clear_index()
+                self._set_write_position(0, resets + 1)
+                return 1
+            scope = _scope_label(name, fields)
+            self._bump(scope if scope is not None else name)
+            return 1
+
+    @contextmanager
+    def exclusive(self, label: str):
+        """Held by one worker at a time, e.g. so only one of them runs the warm-up computations."""
+        fd = os.open(f"{self.path}.{label}.lock", os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            yield
+        finally:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+            os.close(fd)
+
+    def metrics(self) -> dict:
+        _, _, _, _, offset, resets = self._header()
+        used = sum(1 for index in range(self.slots) if self._slot(index)[2])
+        return {
+            "backend": "shared",
+            "path": self.path,
+            "capacityBytes": self.capacity,
+            "writeOffset": offset,
+            "resets": resets,
+            "indexSlots": self.slots,
+            "indexSlotsUsed": used,
+        }
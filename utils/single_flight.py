@@ -0,0 +1,79 @@
+import threading
+
+# Request coalescing: concurrent identical reads wait for one in-flight
+# computation and share its (immutable) result.
+
+class _Call:
+    __slots__ = ("event", "result", "error")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+class SingleFlight:
+    def __init__(self, name: str):
+        self.name = name
+        self.lock = threading.Lock()
+        self.calls = {}
+        self.executed = 0
+        self.coalesced = 0
+        self.errors = 0
+
+    def do(self, key, fn):
+        """Run fn() once per key at a time; concurrent callers with the same key get its result."""
+        with self.lock:
+            call = self.calls.get(key)
+            leader = call is None
+            if leader:
+                call = self.calls[key] = _Call()
+                self.executed += 1
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            with self.lock:
+                self.errors += 1
+            raise
+        finally:
+            with self.lock:
+                del self.calls[key]
+            call.event.set()
+        return call.result
+
+    def metrics(self) -> dict:
+        return {
+            "executed": self.executed,
+            "coalesced": self.coalesced,
+            "errors": self.errors,
+            "inFlight": len(self.calls),
+        }
+
+_flights = {}
+_flights_lock = threading.Lock()
+
+def flight(name: str) -> SingleFlight:
+    with _flights_lock:
+        if name not in _flights:
+            _flights[name] = SingleFlight(name)
+        return _flights[name]
+
+def request_key(**params) -> tuple:
+    """Normalised key: parameter order never matters, lists compare as sorted tuples."""
+    return tuple(sorted(
+        (name, tuple(sorted(value)) if isinstance(value, (list, tuple, set)) else value)
+        for name, value in params.items()
+    ))
+
+def coalescing_metrics() -> dict:
+    with _flights_lock:
+        return {name: single.metrics() for name, single in _flights.items()}
@@ -0,0 +1,334 @@
+import json
+import os
+import threading
+from datetime import datetime, timezone
+
+import pyarrow as pa
+import pyarrow.compute as pc
+
+# Columnar snapshots: one Arrow IPC file per collection and month
+# (<root>/<collection>/<YYYY-MM>.arrow) plus a manifest.json. Readers
+# memory-map the files, so analytics run without touching Mongo. Files are
+# uncompressed by default: their columns are then read straight from the
+# mapped pages, shared by every worker through the page cache. zstd
+# (archival copies only) makes each reader decompress whole files onto its heap.
+
+SNAPSHOT_COLLECTIONS = ("cases", "calendar", "block_utilization")
+SERVING_COLLECTIONS = ("calendar", "providers")
+
+# Small collections are written as a single "all" partition
+UNPARTITIONED = {"providers"}
+ALL_PARTITION = "all"
+
+CASE_PROCEDURE = pa.struct([
+    ("primary", pa.bool_()),
+    ("primaryNpi", pa.string()),
+    ("procedureId", pa.string()),
+    ("procedureName", pa.string()),
+    ("providerName", pa.string()),
+])
+
+CALENDAR_PROCEDURE = pa.struct([
+    ("primary", pa.bool_()),
+    ("primaryNpi", pa.string()),
+    ("procedureId", pa.string()),
+    ("providerName", pa.string()),
+    ("startTime", pa.timestamp("ms")),
+    ("endTime", pa.timestamp("ms")),
+    ("duration", pa.int64()),
+])
+
+CALENDAR_BLOCK = pa.struct([
+    ("blockId", pa.string()),
+    ("npi", pa.string()),
+    ("providerName", pa.string()),
+    ("date", pa.string()),
+    ("startTime", pa.string()),
+    ("endTime", pa.string()),
+    ("dow", pa.int8()),
+    ("wom", pa.int8()),
+    ("duration", pa.int64()),
+    ("inactive", pa.bool_()),
+    ("status", pa.string()),
+    ("source", pa.string()),
+    ("inRoomUtilization", pa.float64()),
+    ("anywhereUtilization", pa.float64()),
+    ("usedInRoomMinutes", pa.int64()),
+    ("usedAnywhereMinutes", pa.int64()),
+])
+
+SCHEMAS = {
+    "cases": pa.schema([
+        ("_id", pa.string()),
+        ("caseNumber", pa.string()),
+        ("hospitalId", pa.string()),
+        ("unit", pa.string()),
+        ("room", pa.string()),
+        ("procedureDate", pa.timestamp("ms")),
+        ("dateCreated", pa.timestamp("ms")),
+        ("startTime", pa.timestamp("ms")),
+        ("endTime", pa.timestamp("ms")),
+        ("duration", pa.int64()),
+        ("procedures", pa.list_(CASE_PROCEDURE)),
+    ]),
+    "calendar": pa.schema([
+        ("_id", pa.string()),
+        ("date", pa.string()),
+        ("hospitalId", pa.string()),
+        ("unit", pa.string()),
+        ("room", pa.string()),
+        ("utilizationMinutes", pa.int64()),
+        ("availableMinutes", pa.int64()),
+        ("utilizationRate", pa.float64()),
+        ("totalRooms", pa.int32()),
+        ("procedures", pa.list_(CALENDAR_PROCEDURE)),
+        ("blocks", pa.list_(CALENDAR_BLOCK)),
+    ]),
+    "block_utilization": pa.schema([
+        ("room", pa.string()),
+        ("date", pa.string()),
+        ("surgeons", pa.string()),  # JSON: owner entries vary in shape
+        ("dow", pa.int8()),
+        ("weekOfMonth", pa.int8()),
+        ("blockStartTime", pa.string()),
+        ("blockEndTime", pa.string()),
+        ("blockMinutes", pa.float64()),
+        ("usedInRoom", pa.float64()),
+        ("usedAnywhere", pa.float64()),
+        ("inRoomUtilization", pa.float64()),
+        ("anywhereUtilization", pa.float64()),
+    ]),
+    "providers": pa.schema([
+        ("npi", pa.string()),
+        ("providerName", pa.string()),
+    ]),
+}
+
+def _to_datetime(value):
+    if isinstance(value, dict) and "$date" in value:
+        value = value["$date"]
+    if isinstance(value, str):
+        try:
+            value = datetime.fromisoformat(value.replace("Z", "+00:00"))
+        except ValueError:
+            return None
+    if isinstance(value, datetime):
+        if value.tzinfo is not None:
+            value = value.astimezone(timezone.utc).replace(tzinfo=None)
+        return value
+    return None
+
+def _to_float(value):
+    try:
+        return float(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+def _to_str(value):
+    return str(value) if value is not None else None
+
+def _project(record: dict, struct: pa.StructType) -> dict:
+    """Coerce a dict onto a struct type's fields."""
+    out = {}
+    for field in struct:
+        value = record.get(field.name)
+        if pa.types.is_timestamp(field.type):
+            value = _to_datetime(value)
+        elif pa.types.is_floating(field.type):
+            value = _to_float(value)
+        elif pa.types.is_integer(field.type):
+            value = int(value) if isinstance(value, (int, float)) else None
+        elif pa.types.is_boolean(field.type):
+            value = bool(value) if value is not None else None
+        elif pa.types.is_string(field.type):
+            value = json.dumps(value, default=str) if isinstance(value, (list, dict)) else _to_str(value)
+        elif pa.types.is_list(field.type):
+            value = [_project(item, field.type.value_type) for item in value or [] if isinstance(item, dict)]
+        out[field.name] = value
+    return out
+
+def doc_to_row(collection: str, doc: dict) -> dict:
+    return _project(doc, SCHEMAS[collection])
+
+def _drop_nulls(value):
+    """Leave out null fields so readers see the same missing keys Mongo documents have."""
+    if isinstance(value, dict):
+        return {k: _drop_nulls(v) for k, v in value.items() if v is not None}
+    if isinstance(value, list):
+        return [_drop_nulls(v) for v in value]
+    return value
+
+def partition_month(collection: str, doc: dict):
+    if collection in UNPARTITIONED:
+        return ALL_PARTITION
+    if collection == "cases":
+        procedure_date = _to_datetime(doc.get("procedureDate"))
+        return procedure_date.strftime("%Y-%m") if procedure_date else None
+    date_str = doc.get("date")
+    return date_str[:7] if isinstance(date_str, str) and len(date_str) >= 7 else None
+
+class PartitionWriter:
+    """Streams rows into one Arrow IPC file in record batches (compression: None or "zstd")."""
+
+    def __init__(self, path: str, collection: str, batch_size: int = 5000, compression=None):
+        self.schema = SCHEMAS[collection]
+        self.collection = collection
+        self.batch_size = batch_size
+        self.rows = []
+        self.count = 0
+        self.sink = pa.OSFile(path, "wb")
+        self.writer = pa.ipc.new_file(self.sink, self.schema, options=pa.ipc.IpcWriteOptions(compression=compression))
+
+    def write(self, doc: dict):
+        self.rows.append(doc_to_row(self.collection, doc))
+        if len(self.rows) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if self.rows:
+            self.writer.write_batch(pa.RecordBatch.from_pylist(self.rows, schema=self.schema))
+            self.count += len(self.rows)
+            self.rows = []
+
+    def close(self):
+        self.flush()
+        self.writer.close()
+        self.sink.close()
+
+def month_key(value) -> str:
+    if isinstance(value, datetime):
+        return value.strftime("%Y-%m")
+    return str(value)[:7]
+
+class Snapshot:
+    """Read-only, memory-mapped view of an exported snapshot directory."""
+
+    def __init__(self, root: str):
+        self.root = root
+        with open(os.path.join(root, "manifest.json")) as f:
+            self.manifest = json.load(f)
+        self._tables = {}
+        self._unit_indexes = {}
+        self._providers = None
+        self._lock = threading.Lock()
+
+    def months(self, collection: str) -> list:
+        return sorted(self.manifest.get("collections", {}).get(collection, {}).get("months", {}))
+
+    def table(self, collection: str, month: str):
+        key = (collection, month)
+        if key not in self._tables:
+            with self._lock:
+                return self._load_table(collection, month)
+        return self._tables[key]
+
+    def _load_table(self, collection: str, month: str):
+        key = (collection, month)
+        if key not in self._tables:
+            path = os.path.join(self.root, collection, f"{month}.arrow")
+            if os.path.exists(path):
+                # Uncompressed files: zero-copy, the table's buffers point into the mapping
+                source = pa.memory_map(path, "r")
+                self._tables[key] = pa.ipc.open_file(source).read_all()
+            else:
+                self._tables[key] = None
+        return self._tables[key]
+
+    def _scan(self, collection: str, start_month: str, end_month: str, mask_fn=None):
+        for month in self.months(collection):
+            if month < start_month or month > end_month:
+                continue
+            table = self.table(collection, month)
+            if table is None or table.num_rows == 0:
+                continue
+            if mask_fn is not None:
+                table = table.filter(mask_fn(table))
+            for row in table.to_pylist():
+                yield _drop_nulls(row)
+
+    def cases(self, start: datetime, end: datetime):
+        """Case documents with procedureDate in [start, end]."""
+        start_ts = pa.scalar(start, type=pa.timestamp("ms"))
+        end_ts = pa.scalar(end, type=pa.timestamp("ms"))
+        return self._scan(
+            "cases", month_key(start), month_key(end),
+            lambda t: pc.and_(pc.greater_equal(t["procedureDate"], start_ts), pc.less_equal(t["procedureDate"], end_ts))
+        )
+
+    def calendar_docs(self, start_str: str, end_str: str, **equals):
+        """Calendar documents with date in [start_str, end_str], optionally filtered by field equality."""
+        def mask(t):
+            m = pc.and_(pc.greater_equal(t["date"], start_str), pc.less_equal(t["date"], end_str))
+            for field, value in equals.items():
+                if value is not None:
+                    m = pc.and_(m, pc.equal(t[field], value))
+            return m
+        return self._scan("calendar", start_str[:7], end_str[:7], mask)
+
+    def block_utilization(self, start_str: str, end_str: str):
+        for row in self._scan(
+            "block_utilization", start_str[:7], end_str[:7],
+            lambda t: pc.and_(pc.greater_equal(t["date"], start_str), pc.less_equal(t["date"], end_str))
+        ):
+            if "surgeons" in row:
+                row["surgeons"] = json.loads(row["surgeons"])
+            yield row
+
+    def _unit_index(self, month: str):
+        """
+        Row order of a calendar partition sorted by (hospitalId, unit, date,
+        room), with ranges of that order per unit. Only the indices are kept;
+        rows are taken from the mapped table per request.
+        """
+        if month not in self._unit_indexes:
+            table = self.table("calendar", month)
+            with self._lock:
+                if month not in self._unit_indexes:
+                    order = pa.array([], type=pa.uint64())
+                    ranges = {}
+                    if table is not None and table.num_rows:
+                        order = pc.sort_indices(table, sort_keys=[("hospitalId", "ascending"), ("unit", "ascending"),
+                                                                  ("date", "ascending"), ("room", "ascending")])
+                        keys = zip(table["hospitalId"].take(order).to_pylist(), table["unit"].take(order).to_pylist())
+                        for offset, key in enumerate(keys):
+                            start, length = ranges.get(key, (offset, 0))
+                            ranges[key] = (start, length + 1)
+                    self._unit_indexes[month] = (table, order, ranges)
+        return self._unit_indexes[month]
+
+    def unit_calendar_docs(self, hospitalId: str, unit: str, start_str: str, end_str: str) -> list:
+        """Calendar documents for one unit in [start_str, end_str], via the per-month unit index."""
+        docs = []
+        for month in self.months("calendar"):
+            if month < start_str[:7] or month > end_str[:7]:
+                continue
+            table, order, ranges = self._unit_index(month)
+            if (hospitalId, unit) not in ranges:
+                continue
+            offset, length = ranges[(hospitalId, unit)]
+            docs.extend(
+                _drop_nulls(row) for row in table.take(order.slice(offset, length)).to_pylist()
+                if start_str <= row["date"] <= end_str
+            )
+        return docs
+
+    def units(self, start_str: str, end_str: str) -> list:
+        """(hospitalId, unit) pairs with calendar documents in the date range."""
+        units = set()
+        for month in self.months("calendar"):
+            if start_str[:7] <= month <= end_str[:7]:
+                units.update(self._unit_index(month)[2])
+        return sorted(key for key in units if None not in key)
+
+    def hospital_units(self, hospitalId: str, start_str: str, end_str: str) -> list:
+        units = set()
+        for month in self.months("calendar"):
+            if start_str[:7] <= month <= end_str[:7]:
+                units.update(unit for hosp, unit in self._unit_index(month)[2] if hosp == hospitalId)
+        return sorted(unit for unit in units if unit is not None)
+
+    def providers(self) -> list:
+        if self._providers is None:
+            table = self.table("providers", ALL_PARTITION)
+            self._providers = [_drop_nulls(row) for row in table.to_pylist()] if table is not None else []
+        return self._providers
@@ -0,0 +1,98 @@
+import os
+import shutil
+import threading
+import time
+from datetime import datetime
+from typing import Optional
+
+from dotenv import load_dotenv
+from fastapi import HTTPException
+
+from utils.snapshot import Snapshot
+
+load_dotenv()
+
+# Read-only serving mode: with SNAPSHOT_MODE=1 the calendar and provider
+# endpoints read from the memory-mapped snapshot at $SNAPSHOT_DIR/current
+# instead of Mongo. `export_snapshot.py --serving` publishes new versions by
+# swapping the `current` symlink; servers pick them up without a restart.
+# Snapshots are served in place from the mapped (uncompressed) files, so a
+# swap costs each worker the new mappings, not a decoded copy.
+
+SNAPSHOT_MODE = os.getenv("SNAPSHOT_MODE", "").lower() in ("1", "true", "yes")
+SNAPSHOT_DIR = os.getenv("SNAPSHOT_DIR", "snapshots/serving")
+SNAPSHOT_CHECK_INTERVAL = float(os.getenv("SNAPSHOT_CHECK_INTERVAL", "5"))
+CURRENT_LINK = "current"
+
+def publish_snapshot(root: str, build_fn, keep: int = 2) -> str:
+    """Build a new version directory with build_fn(path), then atomically repoint `current`."""
+    os.makedirs(root, exist_ok=True)
+    version = datetime.utcnow().strftime("%Y%m%dT%H%M%S%f")
+    build_fn(os.path.join(root, version))
+
+    tmp_link = os.path.join(root, f".{CURRENT_LINK}-{os.getpid()}")
+    if os.path.lexists(tmp_link):
+        os.remove(tmp_link)
+    os.symlink(version, tmp_link)
+    os.replace(tmp_link, os.path.join(root, CURRENT_LINK))
+    print(f"🔁 {os.path.join(root, CURRENT_LINK)} -> {version}")
+
+    # Older versions can go: open memory maps keep their files alive
+    versions = sorted(name for name in os.listdir(root) if name[:1].isdigit() and os.path.isdir(os.path.join(root, name)))
+    for old in versions[:-keep]:
+        shutil.rmtree(os.path.join(root, old), ignore_errors=True)
+    return version
+
+class SnapshotHolder:
+    """Holds the live Snapshot and swaps in a new one when `current` changes."""
+
+    def __init__(self, root: str, check_interval: float):
+        self.root = root
+        self.check_interval = check_interval
+        self.snapshot: Optional[Snapshot] = None
+        self.path = None
+        self.rejected = None
+        self.checked_at = 0.0
+        self.lock = threading.Lock()
+
+    def get(self) -> Optional[Snapshot]:
+        if self.snapshot is not None and time.monotonic() - self.checked_at < self.check_interval:
+            return self.snapshot
+        with self.lock:
+            if self.snapshot is None or time.monotonic() - self.checked_at >= self.check_interval:
+                self.checked_at = time.monotonic()
+                current = os.path.join(self.root, CURRENT_LINK)
+                resolved = os.path.realpath(current) if os.path.exists(current) else None
+                if resolved and resolved not in (self.path, self.rejected):
+                    snapshot = Snapshot(resolved)
+                    if snapshot.manifest.get("format", "arrow-ipc") != "arrow-ipc":
+                        # Compressed files would be decompressed onto every worker's heap
+                        print(f"⚠️ {resolved} is {snapshot.manifest['format']}; serving needs an uncompressed snapshot")
+                        self.rejected = resolved
+                    else:
+                        self.snapshot = snapshot
+                        self.path = resolved
+        return self.snapshot
+
+    def status(self) -> dict:
+        snapshot = self.get()
+        return {
+            "mode": "snapshot",
+            "path": self.path,
+            "createdAt": snapshot.manifest.get("createdAt") if snapshot else None,
+        }
+
+serving = SnapshotHolder(SNAPSHOT_DIR, SNAPSHOT_CHECK_INTERVAL) if SNAPSHOT_MODE else None
+
+def serving_snapshot() -> Optional[Snapshot]:
+    """The snapshot to serve from, or None when reads should go to Mongo."""
+    if serving is None:
+        return None
+    snapshot = serving.get()
+    if snapshot is None:
+        raise HTTPException(status_code=503, detail=f"Snapshot mode is on but no snapshot exists at {SNAPSHOT_DIR}")
+    return snapshot
+
+def require_writable():
+    if serving is not None:
+        raise HTTPException(status_code=503, detail="Serving from a read-only snapshot; writes are disabled")
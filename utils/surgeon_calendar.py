@@ -0,0 +1,127 @@
+from collections import defaultdict
+
+from pymongo import ASCENDING, DeleteMany, ReplaceOne
+
+from utils import partitions
+from utils.date_dimension import date_dimension
+from utils.utilization_cube import CUBE_MEASURES, cube_cells_for_calendar_doc
+
+# One document per (npi, date): the surgeon's blocks and primary cases across
+# every room and hospital that day, with the day's utilization totals, so a
+# surgeon's month is one indexed read on (npi, month). Rebuilt from the
+# room-day calendar docs by sync_surgeon_calendar() whenever a writer
+# (generate_calendar.py, update_calendar_with_blocks.py,
+# generate_block_utilization.py, the incremental recompute) touches a date.
+
+SURGEON_CALENDAR = "surgeon_calendar"
+
+BLOCK_FIELDS = ("blockId", "startTime", "endTime", "duration", "providerName", "inactive", "status", "source",
+                "usedInRoomMinutes", "usedAnywhereMinutes", "inRoomUtilization", "anywhereUtilization")
+CASE_EXCLUDED_FIELDS = ("frequencies",)
+
+CALENDAR_PROJECTION = {"date": 1, "hospitalId": 1, "unit": 1, "room": 1, "blocks": 1, "procedures": 1}
+
+def surgeon_day_id(npi, date_str) -> str:
+    return f"{npi}|{date_str}"
+
+def _block_npi(block):
+    return block.get("npi") or block.get("primaryNpi")
+
+def _location(doc) -> dict:
+    return {"hospitalId": doc.get("hospitalId"), "unit": doc.get("unit"), "room": doc.get("room")}
+
+def surgeon_days_for_calendar_docs(docs, npis=None) -> list:
+    """Surgeon-day documents for every NPI (or only `npis`) with a block or primary case in `docs`."""
+    days = {}
+
+    def day(npi, date_str):
+        key = (npi, date_str)
+        if key not in days:
+            days[key] = {
+                "_id": surgeon_day_id(npi, date_str),
+                "npi": npi,
+                "date": date_str,
+                "month": date_str[:7],
+                "dow": date_dimension.weekday(date_str),
+                "wom": date_dimension.week_of_month(date_str),
+                "providerName": None,
+                "blocks": [],
+                "cases": [],
+                **{measure: 0 for measure in CUBE_MEASURES}
+            }
+        return days[key]
+
+    for doc in docs:
+        date_str = doc.get("date")
+        if not (date_str and doc.get("hospitalId") and doc.get("unit") and doc.get("room")):
+            continue
+        location = _location(doc)
+
+        for block in doc.get("blocks", []) or []:
+            npi = _block_npi(block)
+            if not npi or (npis and npi not in npis):
+                continue
+            entry = day(npi, date_str)
+            entry["providerName"] = entry["providerName"] or block.get("providerName")
+            entry["blocks"].append({**location, **{field: block[field] for field in BLOCK_FIELDS if field in block}})
+
+        for proc in doc.get("procedures", []) or []:
+            npi = proc.get("primaryNpi")
+            if not npi or proc.get("primary") is False or (npis and npi not in npis):
+                continue
+            entry = day(npi, date_str)
+            entry["providerName"] = entry["providerName"] or proc.get("providerName")
+            entry["cases"].append({**location, **{k: v for k, v in proc.items() if k not in CASE_EXCLUDED_FIELDS}})
+
+        # Same measures as the utilization cube, summed over the surgeon's rooms
+        for cell in cube_cells_for_calendar_doc(doc):
+            if (cell["npi"], date_str) in days:
+                entry = days[(cell["npi"], date_str)]
+                for measure in CUBE_MEASURES:
+                    entry[measure] += cell[measure]
+
+    for entry in days.values():
+        block_minutes = entry["blockMinutes"]
+        entry["inRoomUtilization"] = round(entry["usedInRoomMinutes"] / block_minutes, 3) if block_minutes else 0
+        entry["anywhereUtilization"] = round(entry["usedAnywhereMinutes"] / block_minutes, 3) if block_minutes else 0
+        entry["blocks"].sort(key=lambda block: str(block.get("startTime")))
+        entry["cases"].sort(key=lambda case: str(case.get("startTime")))
+    return list(days.values())
+
+def ensure_surgeon_calendar_indexes(collection):
+    collection.create_index([("npi", ASCENDING), ("month", ASCENDING), ("date", ASCENDING)])
+    collection.create_index([("date", ASCENDING)])
+
+def sync_surgeon_calendar(db, dates, npis=None) -> int:
+    """
+    Rebuild the surgeon-days of `dates` (only `npis`' when given) from the
+    calendar collection, dropping surgeon-days that no longer have a block or
+    case. Returns surgeon-days written.
+    """
+    dates = sorted({date_str for date_str in dates if date_str})
+    npis = sorted({npi for npi in npis if npi}) if npis is not None else None
+    if not dates or npis == []:
+        return 0
+
+    query = {"date": {"$in": dates}}
+    if npis:
+        query["$or"] = [{"blocks.npi": {"$in": npis}}, {"blocks.primaryNpi": {"$in": npis}},
+                        {"procedures.primaryNpi": {"$in": npis}}]
+    calendar_docs = partitions.find(db, "calendar", query, dates[0], dates[-1], CALENDAR_PROJECTION)
+    days = surgeon_days_for_calendar_docs(calendar_docs, set(npis or []))
+
+    ids_by_date = defaultdict(list)
+    for entry in days:
+        ids_by_date[entry["date"]].append(entry["_id"])
+    stale = [
+        DeleteMany({"date": date_str, "_id": {"$nin": ids_by_date[date_str]},
+                    **({"npi": {"$in": npis}} if npis else {})})
+        for date_str in dates
+    ]
+
+    collection = db[SURGEON_CALENDAR]
+    ensure_surgeon_calendar_indexes(collection)
+    ops = stale + [ReplaceOne({"_id": entry["_id"]}, entry, upsert=True) for entry in days]
+    for i in range(0, len(ops), 1000):
+        collection.bulk_write(ops[i:i + 1000], ordered=False)
+    return len(days)
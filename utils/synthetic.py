@@ -0,0 +1,101 @@
+import calendar
+import random
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+
+from utils.date_dimension import date_dimension
+from utils.room_day import room_day_fields
+
+# Synthetic calendar documents shaped like generate_calendar.py +
+# update_calendar_with_blocks.py output, for benchmarks and load tests.
+
+FULL_DAY = [(7 * 60, 15 * 60 + 30)]
+HALF_DAYS = [(7 * 60, 11 * 60 + 30), (11 * 60 + 30, 15 * 60 + 30)]
+
+def synthetic_npis(surgeons: int) -> list:
+    return [f"9{n:09d}" for n in range(1, surgeons + 1)]
+
+def _local_iso(date_str: str, minute: int) -> str:
+    return f"{date_str}T{minute // 60:02d}:{minute % 60:02d}:00{date_dimension.cst_offset(date_str)}"
+
+def _utc(date_str: str, minute: int) -> datetime:
+    # Stored like pymongo reads case times back: naive UTC
+    local = datetime.fromisoformat(date_str) + timedelta(minutes=minute)
+    return local - timedelta(minutes=date_dimension.cst_offset_minutes(date_str))
+
+def synthetic_calendar_docs(month: str = "2025-04", hospitalId: str = "SYN-H1", unit: str = "SYN-UNIT",
+                            rooms: int = 40, surgeons: int = 150, seed: int = 7,
+                            block_rate: float = 0.8, inactive_rate: float = 0.05, cases_per_day=(1, 5)) -> list:
+    """One calendar document per business day and room, with blocks and primary procedures."""
+    rng = random.Random(seed)
+    npis = synthetic_npis(surgeons)
+    room_names = [f"OR{n:02d}" for n in range(1, rooms + 1)]
+    # Surgeons keep "their" rooms, like real block schedules
+    room_owners = {room: rng.sample(npis, k=min(3, len(npis))) for room in room_names}
+
+    year, month_num = map(int, month.split("-"))
+    docs = []
+    for day in range(1, calendar.monthrange(year, month_num)[1] + 1):
+        date_str = f"{month}-{day:02d}"
+        if not date_dimension.is_business_day(date_str):
+            continue
+        for room in room_names:
+            blocks = []
+            if rng.random() < block_rate:
+                for start, end in FULL_DAY if rng.random() < 0.5 else HALF_DAYS:
+                    npi = rng.choice(room_owners[room])
+                    blocks.append({
+                        "startTime": _local_iso(date_str, start),
+                        "endTime": _local_iso(date_str, end),
+                        "providerName": f"Surgeon {npi[-4:]}",
+                        "npi": npi,
+                        "date": date_str,
+                        "dow": date_dimension.weekday(date_str),
+                        "wom": date_dimension.week_of_month(date_str),
+                        "duration": end - start,
+                        "blockId": str(ObjectId()),
+                        "status": "unknown",
+                        "source": "synthetic",
+                        "inactive": rng.random() < inactive_rate,
+                    })
+
+            procedures = []
+            cursor = 7 * 60 + rng.choice([0, 15, 30])
+            for _ in range(rng.randint(*cases_per_day)):
+                length = rng.choice([45, 60, 90, 120, 180, 240])
+                if cursor + length > 17 * 60:
+                    break
+                owner = next((b["npi"] for b in blocks if not b["inactive"]), None)
+                npi = owner if owner and rng.random() < 0.8 else rng.choice(npis)
+                procedures.append({
+                    "primary": True,
+                    "primaryNpi": npi,
+                    "procedureId": f"P{rng.randint(1, 400):04d}",
+                    "duration": length,
+                    "startTime": _utc(date_str, cursor),
+                    "endTime": _utc(date_str, cursor + length),
+                })
+                cursor += length + rng.choice([15, 30, 45, 90])
+
+            docs.append({
+                "_id": ObjectId(),
+                "date": date_str,
+                "hospitalId": hospitalId,
+                "unit": unit,
+                "room": room,
+                "blocks": blocks,
+                **room_day_fields(procedures),
+                "totalRooms": rooms,
+            })
+    return docs
+
+def synthetic_loader(docs):
+    """An AvailabilityEngine loader over in-memory documents."""
+    def load(start_date, end_date, hospitalId, unit):
+        start_str, end_str = start_date.strftime("%Y-%m-%d"), end_date.strftime("%Y-%m-%d")
+        return [
+            doc for doc in docs
+            if doc["hospitalId"] == hospitalId and doc["unit"] == unit and start_str <= doc["date"] <= end_str
+        ]
+    return load
@@ -1,4 +1,5 @@
 from datetime import datetime, time, timedelta
+from dateutil import parser
 import pytz
 
 UTC = pytz.UTC
@@ -29,6 +30,15 @@ def to_cst(dt_raw) -> datetime:
 
 
 
+# Standard block window used for room utilization (7:00–15:30 CST, 510 minutes)
+def standard_block_window(day):
+    """Timezone-aware CST start and end of the standard block window on `day`."""
+    return (
+        CST.localize(datetime.combine(day, time(7, 0))),
+        CST.localize(datetime.combine(day, time(15, 30))),
+    )
+
+
 # Returns overlap in minutes between a case and the standard block window (7:00–15:30 CST)
 def minutes_within_block_window(start, end, block_start, block_end):
     """Return the number of minutes a case overlaps with the block window."""
@@ -36,3 +46,24 @@ def minutes_within_block_window(start, end, block_start, block_end):
     earliest_end = min(end, block_end)
     overlap = (earliest_end - latest_start).total_seconds() / 60
     return max(0, int(overlap))
+
+
+def to_cst_safe(dt):
+    """Convert datetime or string to US/Central timezone-aware datetime (naive values are UTC)."""
+    if isinstance(dt, str):
+        dt = parser.isoparse(dt)
+    if dt.tzinfo is None:
+        dt = pytz.utc.localize(dt)
+    return dt.astimezone(CST)
+
+
+def merge_intervals(intervals):
+    """Merge overlapping time intervals."""
+    intervals.sort()
+    merged = []
+    for start, end in intervals:
+        if not merged or start > merged[-1][1]:
+            merged.append((start, end))
+        else:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+    return merged
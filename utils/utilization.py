@@ -0,0 +1,166 @@
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+import pytz
+from dateutil import parser
+
+from utils import partitions
+from utils.availability import invalidate_availability
+from utils.conflicts import refresh_conflict_dates
+from utils.content_hash import stable_hash
+from utils.response_cache import invalidate_calendar_responses
+from utils.case_index import CaseIntervalIndex, CASE_INDEX_PROJECTION, case_index_query
+from utils.room_day import primary_procedures, room_day_fields
+from utils.surgeon_calendar import sync_surgeon_calendar
+from utils.utilization_cube import cube_cells_for_calendar_doc, write_cube_for_calendar_docs
+
+# Block utilization for one calendar doc, plus incremental recompute of just
+# the block-days and room-days touched by a block toggle or a case change.
+
+cst_tz = pytz.timezone("US/Central")
+
+def compute_doc_utilization(doc, case_index, test_npi=None, verbose=True):
+    """Set in-room/anywhere utilization on each active block of one calendar doc."""
+    calendar_id = str(doc["_id"])
+    date_str = doc.get("date")
+    room = doc.get("room")
+    blocks = doc.get("blocks", [])
+
+    for i, block in enumerate(blocks):
+        npi = block.get("npi") or block.get("primaryNpi")
+        if not npi or block.get("inactive") == True:
+            if verbose:
+                print(f"⚠️ Skipping block {i} in doc {calendar_id} due to missing NPI or inactive")
+            continue
+        if test_npi and npi != test_npi:
+            continue
+
+        block_start = parser.isoparse(block["startTime"])
+        block_end = parser.isoparse(block["endTime"])
+        block_minutes = block.get("duration", 0)
+
+        if verbose:
+            print(f"\n📅 {date_str} | Room: {room} | Block: {block_start.strftime('%H:%M')}–{block_end.strftime('%H:%M')} | NPI: {npi}")
+            for case_start, case_end, case_room in case_index.intervals(date_str, npi):
+                print(f"   📌 Procedure from {case_start.strftime('%H:%M')} to {case_end.strftime('%H:%M')} | Room: {case_room}")
+
+        # Merged once per (date, NPI); clip to the block window
+        minutes_in_room = case_index.overlap_minutes(date_str, npi, block_start, block_end, room)
+        minutes_anywhere = case_index.overlap_minutes(date_str, npi, block_start, block_end)
+
+        block["usedInRoomMinutes"] = minutes_in_room
+        block["usedAnywhereMinutes"] = minutes_anywhere
+        block["inRoomUtilization"] = round(minutes_in_room / block_minutes, 3) if block_minutes else 0
+        block["anywhereUtilization"] = round(minutes_anywhere / block_minutes, 3) if block_minutes else 0
+
+        if verbose:
+            print(f"📊 In-room: {minutes_in_room} mins, Anywhere: {minutes_anywhere} mins")
+            print(f"📈 Utilization → In-room: {block['inRoomUtilization']*100:.1f}%, Anywhere: {block['anywhereUtilization']*100:.1f}%")
+
+    return blocks
+
+def _block_npi(block):
+    return block.get("npi") or block.get("primaryNpi")
+
+def recompute_blocks(db, calendar_filter: dict, date_str: str, npi=None) -> int:
+    """
+    Recompute block utilization for the calendar docs matching `calendar_filter`
+    on one date (only `npi`'s blocks when given). Returns docs rewritten.
+    """
+    calendar_collection = db["calendar"]
+    docs = list(calendar_collection.find(calendar_filter))
+    npis = {npi} if npi else {_block_npi(b) for doc in docs for b in doc.get("blocks", []) if _block_npi(b)}
+    if not docs or not npis:
+        return 0
+
+    # Only that day's cases for the surgeons involved
+    case_query = {**case_index_query(date_str, date_str), "procedures.primaryNpi": {"$in": sorted(npis)}}
+    case_index = CaseIntervalIndex.from_cursor(
+        partitions.find(db, "cases", case_query, date_str, date_str, CASE_INDEX_PROJECTION)
+    )
+
+    for doc in docs:
+        blocks = compute_doc_utilization(doc, case_index, npi, verbose=False)
+        # cubeHash tracks the cells written below (see generate_block_utilization.py)
+        calendar_collection.update_one({"_id": doc["_id"]}, {"$set": {
+            "blocks": blocks,
+            "cubeHash": stable_hash(cube_cells_for_calendar_doc(doc))
+        }})
+
+    write_cube_for_calendar_docs(db["utilization_cube"], docs)
+    sync_surgeon_calendar(db, [date_str], npis)
+    for hospitalId, unit in {(doc.get("hospitalId"), doc.get("unit")) for doc in docs}:
+        invalidate_calendar_responses(date_str[:7], hospitalId, unit)
+    return len(docs)
+
+def recompute_block_day(db, block_id: str, date_str: str) -> dict:
+    """After a block toggle: every calendar doc holding the block that day."""
+    updated = recompute_blocks(db, {"date": date_str, "blocks.blockId": block_id}, date_str)
+    return {"blockId": block_id, "date": date_str, "blockDocsUpdated": updated}
+
+def recompute_room_day(db, date_str: str, room: str, hospitalId=None, unit=None) -> int:
+    """Rebuild a room-day's procedures and utilization from the cases collection."""
+    day_start = cst_tz.localize(datetime.fromisoformat(date_str))
+    match = {
+        "room": room,
+        "procedures.primary": True,
+        "startTime": {"$gte": day_start, "$lt": day_start + timedelta(days=1)},
+        "endTime": {"$exists": True}
+    }
+    if hospitalId:
+        match["hospitalId"] = hospitalId
+    if unit:
+        match["unit"] = unit
+
+    grouped = defaultdict(list)
+    for case in partitions.find(db, "cases", match, date_str, date_str):
+        if case.get("hospitalId") and case.get("unit"):
+            grouped[(case["hospitalId"], case["unit"])].extend(primary_procedures(case))
+
+    # Existing room-days that lost all their cases are reset too
+    calendar_collection = db["calendar"]
+    existing = {"date": date_str, "room": room}
+    if hospitalId:
+        existing["hospitalId"] = hospitalId
+    if unit:
+        existing["unit"] = unit
+    # Surgeons whose cases left the room-day lose them from their surgeon-day too
+    npis = set()
+    for doc in calendar_collection.find(existing, {"hospitalId": 1, "unit": 1, "procedures.primaryNpi": 1}):
+        grouped.setdefault((doc.get("hospitalId"), doc.get("unit")), [])
+        npis.update(proc.get("primaryNpi") for proc in doc.get("procedures", []))
+
+    for (hosp, unit_key), procedures in grouped.items():
+        calendar_collection.update_one(
+            {"date": date_str, "hospitalId": hosp, "unit": unit_key, "room": room},
+            # The next generate_calendar.py run must rewrite this room-day in full
+            {"$set": room_day_fields(procedures), "$unset": {"procHash": ""}},
+            upsert=bool(procedures)
+        )
+        # caseOutsideBlock flags depend on the room-day's procedures
+        refresh_conflict_dates(db, hosp, unit_key, [date_str])
+        invalidate_availability(date_str[:7], hosp, unit_key)
+        invalidate_calendar_responses(date_str[:7], hosp, unit_key)
+        npis.update(proc.get("primaryNpi") for proc in procedures)
+
+    # caseCount/caseMinutes of the cube cells come from the procedures just written
+    rewritten = list(calendar_collection.find(existing))
+    for doc in rewritten:
+        calendar_collection.update_one({"_id": doc["_id"]}, {"$set": {"cubeHash": stable_hash(cube_cells_for_calendar_doc(doc))}})
+    write_cube_for_calendar_docs(db["utilization_cube"], rewritten)
+    sync_surgeon_calendar(db, [date_str], npis)
+    return len(grouped)
+
+def recompute_for_case(db, npi: str, date_str: str, room: str, hospitalId=None, unit=None) -> dict:
+    """
+    After a case is added, moved or changed: the room-day it lands in and the
+    surgeon's blocks that day in every room (anywhere utilization spans rooms).
+    """
+    rooms_updated = recompute_room_day(db, date_str, room, hospitalId, unit)
+    blocks_updated = recompute_blocks(
+        db,
+        {"date": date_str, "$or": [{"blocks.npi": npi}, {"blocks.primaryNpi": npi}]},
+        date_str,
+        npi
+    )
+    return {"npi": npi, "date": date_str, "room": room, "roomDaysUpdated": rooms_updated, "blockDocsUpdated": blocks_updated}
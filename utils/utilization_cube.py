@@ -0,0 +1,106 @@
+from collections import defaultdict
+
+from pymongo import ASCENDING, DeleteMany, ReplaceOne
+
+from utils.date_dimension import date_dimension
+
+# Finest grain of the cube: one cell per (hospitalId, unit, room, npi, date).
+# month/dow/wom are stored alongside so any of them can be rolled up directly.
+CUBE_DIMENSIONS = ("hospitalId", "unit", "room", "npi", "date", "month", "dow", "wom")
+CUBE_MEASURES = ("blockMinutes", "usedInRoomMinutes", "usedAnywhereMinutes", "caseMinutes", "caseCount", "blockCount")
+
+def cell_id(hospitalId, unit, room, npi, date_str) -> str:
+    return "|".join(str(part) for part in (hospitalId, unit, room, npi, date_str))
+
+def cube_cells_for_calendar_doc(doc) -> list:
+    """Cube cells for one room-day calendar document (active blocks and primary cases)."""
+    date_str = doc.get("date")
+    hospitalId = doc.get("hospitalId")
+    unit = doc.get("unit")
+    room = doc.get("room")
+    if not (date_str and hospitalId and unit and room):
+        return []
+
+    cells = defaultdict(lambda: {measure: 0 for measure in CUBE_MEASURES})
+
+    for block in doc.get("blocks", []) or []:
+        npi = block.get("npi") or block.get("primaryNpi")
+        if not npi or block.get("inactive"):
+            continue
+        minutes = block.get("duration", 0) or 0
+        cell = cells[npi]
+        cell["blockMinutes"] += minutes
+        cell["blockCount"] += 1
+        cell["usedInRoomMinutes"] += block.get("usedInRoomMinutes", round((block.get("inRoomUtilization") or 0) * minutes))
+        cell["usedAnywhereMinutes"] += block.get("usedAnywhereMinutes", round((block.get("anywhereUtilization") or 0) * minutes))
+
+    for proc in doc.get("procedures", []) or []:
+        npi = proc.get("primaryNpi")
+        if not npi or proc.get("primary") is False:
+            continue
+        cell = cells[npi]
+        cell["caseCount"] += 1
+        cell["caseMinutes"] += proc.get("duration", 0) or 0
+
+    return [
+        {
+            "_id": cell_id(hospitalId, unit, room, npi, date_str),
+            "hospitalId": hospitalId,
+            "unit": unit,
+            "room": room,
+            "npi": npi,
+            "date": date_str,
+            "month": date_str[:7],
+            "dow": date_dimension.weekday(date_str),
+            "wom": date_dimension.week_of_month(date_str),
+            **measures
+        }
+        for npi, measures in cells.items()
+    ]
+
+def ensure_cube_indexes(cube_collection):
+    cube_collection.create_index([("hospitalId", ASCENDING), ("unit", ASCENDING), ("month", ASCENDING)])
+    cube_collection.create_index([("npi", ASCENDING), ("month", ASCENDING)])
+    cube_collection.create_index([("month", ASCENDING), ("dow", ASCENDING), ("wom", ASCENDING)])
+
+def cube_writes_for_calendar_doc(doc) -> list:
+    """Bulk operations replacing every cell of this room-day, dropping cells that disappeared."""
+    cells = cube_cells_for_calendar_doc(doc)
+    if not cells and not (doc.get("hospitalId") and doc.get("unit") and doc.get("room") and doc.get("date")):
+        return []
+    ops = [DeleteMany({
+        "hospitalId": doc.get("hospitalId"),
+        "unit": doc.get("unit"),
+        "room": doc.get("room"),
+        "date": doc.get("date"),
+        "_id": {"$nin": [cell["_id"] for cell in cells]}
+    })]
+    ops.extend(ReplaceOne({"_id": cell["_id"]}, cell, upsert=True) for cell in cells)
+    return ops
+
+def write_cube_for_calendar_docs(cube_collection, docs) -> int:
+    ops = []
+    for doc in docs:
+        ops.extend(cube_writes_for_calendar_doc(doc))
+    if ops:
+        cube_collection.bulk_write(ops, ordered=False)
+    return len(ops)
+
+def rollup_pipeline(match: dict, group_by: list) -> list:
+    """Sum measures over `match`, grouped by any subset of CUBE_DIMENSIONS."""
+    return [
+        {"$match": match},
+        {"$group": {
+            "_id": {dim: f"${dim}" for dim in group_by},
+            **{measure: {"$sum": f"${measure}"} for measure in CUBE_MEASURES}
+        }},
+        {"$sort": {"_id": 1}}
+    ]
+
+def finalize_rollup_row(row: dict, group_by: list) -> dict:
+    block_minutes = row.get("blockMinutes", 0)
+    result = {dim: row["_id"].get(dim) for dim in group_by}
+    result.update({measure: row.get(measure, 0) for measure in CUBE_MEASURES})
+    result["inRoomUtilization"] = round(row.get("usedInRoomMinutes", 0) / block_minutes, 3) if block_minutes else 0
+    result["anywhereUtilization"] = round(row.get("usedAnywhereMinutes", 0) / block_minutes, 3) if block_minutes else 0
+    return result
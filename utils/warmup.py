@@ -0,0 +1,134 @@
+import os
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import date, datetime
+
+from utils.response_cache import CACHE_BACKEND
+
+# Warm-up: precompute the hot responses (calendar views, QA summaries,
+# providers, block catalog) into the response cache with bounded concurrency.
+# Runs in the background on startup and when a regeneration job POSTs to
+# /admin/warmup (WARMUP_URL); /ready reports its progress.
+# Only with CACHE_BACKEND=shared: per-process entries live a few seconds and
+# miss writes made by other workers, so warming them would gate /ready on
+# entries that are gone by the time traffic arrives.
+
+WARMUP_ENABLED = CACHE_BACKEND == "shared"
+WARMUP_CONCURRENCY = int(os.getenv("WARMUP_CONCURRENCY", "4"))
+WARMUP_ON_STARTUP = WARMUP_ENABLED and os.getenv("WARMUP_ON_STARTUP", "1").lower() in ("1", "true", "yes")
+MAX_RECORDED_ERRORS = 20
+
+def warmup_months(today: date = None) -> list:
+    """Current and next month as YYYY-MM."""
+    today = today or date.today()
+    next_month = date(today.year + today.month // 12, today.month % 12 + 1, 1)
+    return [today.strftime("%Y-%m"), next_month.strftime("%Y-%m")]
+
+class WarmupJob:
+    def __init__(self, plan, concurrency: int = WARMUP_CONCURRENCY, guard=None):
+        """
+        plan(months, refresh) -> list of (label, fn) tasks; each fn fills one
+        cache entry (recomputing it when refresh is set). guard(), if given, is
+        held for the whole run.
+        """
+        self.plan = plan
+        self.concurrency = max(1, concurrency)
+        self.guard = guard
+        self.lock = threading.Lock()
+        self.thread = None
+        self.runs = 0
+        self.state = {"status": "idle"}
+
+    def start(self, trigger: str, months=None) -> bool:
+        """Run in a background thread; False if a warm-up is already running."""
+        with self.lock:
+            if self.thread is not None and self.thread.is_alive():
+                return False
+            self.state = {"status": "starting", "trigger": trigger}
+            self.thread = threading.Thread(target=self.run, args=(trigger, months), name="warmup", daemon=True)
+            self.thread.start()
+        return True
+
+    def run(self, trigger: str, months=None) -> dict:
+        if self.guard is None:
+            return self._run(trigger, months)
+        with self.guard():
+            return self._run(trigger, months)
+
+    def _run(self, trigger: str, months=None) -> dict:
+        months = months or warmup_months()
+        started = time.perf_counter()
+        state = {
+            "status": "running",
+            "trigger": trigger,
+            "months": months,
+            "startedAt": datetime.utcnow().isoformat(),
+            "total": 0,
+            "completed": 0,
+            "failed": 0,
+            "errors": [],
+        }
+        with self.lock:
+            self.state = state
+
+        try:
+            # On startup only missing entries are filled; afterwards the data has changed
+            tasks = self.plan(months, trigger != "startup")
+        except Exception as e:
+            with self.lock:
+                state.update(status="failed", errors=[f"plan: {e}"], finishedAt=datetime.utcnow().isoformat())
+                self.runs += 1
+            print(f"❌ Warm-up could not be planned: {e}")
+            return self.status()
+
+        with self.lock:
+            state["total"] = len(tasks)
+        print(f"🔥 Warm-up ({trigger}): {len(tasks)} responses for {', '.join(months)}")
+
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="warmup") as pool:
+            futures = {pool.submit(fn): label for label, fn in tasks}
+            for future in as_completed(futures):
+                error = future.exception()
+                with self.lock:
+                    if error is None:
+                        state["completed"] += 1
+                    else:
+                        state["failed"] += 1
+                        if len(state["errors"]) < MAX_RECORDED_ERRORS:
+                            state["errors"].append(f"{futures[future]}: {error}")
+
+        with self.lock:
+            state["status"] = "done"
+            state["finishedAt"] = datetime.utcnow().isoformat()
+            state["seconds"] = round(time.perf_counter() - started, 3)
+            self.runs += 1
+        print(f"✅ Warm-up finished: {state['completed']} cached, {state['failed']} failed in {state['seconds']}s")
+        return self.status()
+
+    def status(self) -> dict:
+        with self.lock:
+            state = {**self.state, "errors": list(self.state.get("errors", []))}
+            runs = self.runs
+        state["runs"] = runs
+        state["concurrency"] = self.concurrency
+        # Ready once the first warm-up has finished; later runs serve from the old entries meanwhile
+        state["enabled"] = WARMUP_ENABLED
+        state["ready"] = runs > 0 or (state["status"] == "idle" and not WARMUP_ON_STARTUP)
+        return state
+
+def notify_warmup():
+    """POST to $WARMUP_URL (the API's /admin/warmup) after a regeneration job; best effort."""
+    url = os.getenv("WARMUP_URL")
+    if not url:
+        return
+    headers = {}
+    if os.getenv("WARMUP_TOKEN"):
+        headers["x-warmup-token"] = os.getenv("WARMUP_TOKEN")
+    try:
+        request = urllib.request.Request(url, data=b"", headers=headers, method="POST")
+        with urllib.request.urlopen(request, timeout=10) as response:
+            print(f"🔥 Warm-up requested ({response.status})")
+    except Exception as e:
+        print(f"⚠️ Could not request warm-up at {url}: {e}")